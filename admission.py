@@ -0,0 +1,192 @@
+"""
+National Highways Management System - Admission Control
+Bulkheads per route class: each class (auth, crud, report, validation, stream)
+has its own concurrency limit and its own database connection sub-pool, so a
+burst of slow reports cannot take the connections interactive edits need.
+
+Requests over a class's limit wait in a bounded queue until a slot frees up
+or their deadline passes; when the queue is full, or the deadline passes, the
+request is shed with 503 and a Retry-After estimate.
+
+Queued requests wait inside a worker thread, so every class's limit plus
+queue must fit in the server's threads together, with threads left over for
+the exempt paths (static files, health check); otherwise a burst in one class
+could occupy every thread before auth and crud requests reach their
+bulkheads. Open change streams hold a thread each for as long as the client
+listens, so the stream class has its own, larger limit and no queue.
+"""
+
+from typing import Optional, Dict
+import math
+import os
+import threading
+import time
+
+
+# class -> (concurrency limit, max queued requests, queue timeout seconds)
+# The database sub-pool of each class has `limit` connections. Together the
+# defaults hold at most 77 worker threads (Procfile: --threads 128).
+DEFAULT_CLASSES = {
+    'auth': (4, 8, 5.0),
+    'crud': (6, 12, 5.0),
+    'report': (3, 6, 15.0),
+    'validation': (2, 4, 10.0),
+    'stream': (32, 0, 0.0)  # long-lived SSE connections, each holds a worker thread
+}
+
+# Classes whose requests never touch the database get no sub-pool
+NO_POOL_CLASSES = ('stream',)
+
+# Always admitted (monitoring must work under load); so are static files,
+# which are served without the database in a few milliseconds
+EXEMPT_PATHS = ('/api/health',)
+
+# Analytics endpoints outside /api/reports that run report-sized queries
+REPORT_PATH_SUFFIXES = ('/range', '/config-query')
+
+
+def classify(path: str) -> Optional[str]:
+    """
+    Map a request path to its route class
+
+    Returns:
+        Route class name, or None for exempt paths
+    """
+    if path in EXEMPT_PATHS or not path.startswith('/api'):
+        return None
+    if path.startswith('/api/auth/'):
+        return 'auth'
+    if path == '/api/changes/stream':
+        return 'stream'
+    if path.startswith('/api/reports/') or (path.startswith('/api/nh/')
+                                            and path.endswith(REPORT_PATH_SUFFIXES)):
+        return 'report'
+    if path.startswith('/api/validation/'):
+        return 'validation'
+    return 'crud'
+
+
+def load_classes() -> Dict[str, tuple]:
+    """
+    Route class settings, overridable per class via the environment, e.g.
+    ADMISSION_REPORT=3,6,15 (limit, max queued, queue timeout in seconds)
+    """
+    classes = {}
+    for name, default in DEFAULT_CLASSES.items():
+        value = os.getenv(f"ADMISSION_{name.upper()}")
+        if value:
+            limit, max_queue, timeout = value.split(',')
+            classes[name] = (int(limit), int(max_queue), float(timeout))
+        else:
+            classes[name] = default
+    return classes
+
+
+class Bulkhead:
+    """Concurrency limit with a bounded FIFO wait queue for one route class"""
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = []  # tickets in arrival order
+        self._service_time = 0.1  # EWMA of seconds a request holds a slot
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def acquire(self) -> bool:
+        """Take a slot, waiting up to queue_timeout; False if shed"""
+        with self._cond:
+            if self._active < self.limit and not self._waiting:
+                self._active += 1
+                self.admitted += 1
+                return True
+            if len(self._waiting) >= self.max_queue:
+                self.rejected += 1
+                return False
+
+            ticket = object()
+            self._waiting.append(ticket)
+            started = time.monotonic()
+            deadline = started + self.queue_timeout
+            while not (self._active < self.limit and self._waiting[0] is ticket):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(ticket)
+                    self.timed_out += 1
+                    self._cond.notify_all()
+                    return False
+                self._cond.wait(remaining)
+
+            self._waiting.pop(0)
+            self._active += 1
+            self.admitted += 1
+            waited = time.monotonic() - started
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            self._cond.notify_all()
+            return True
+
+    def release(self, held: float):
+        """Free a slot held for `held` seconds"""
+        with self._cond:
+            self._active -= 1
+            self._service_time = 0.8 * self._service_time + 0.2 * held
+            self._cond.notify_all()
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue is expected to drain"""
+        with self._cond:
+            backlog = len(self._waiting) + 1
+            return max(1, math.ceil(self._service_time * backlog / self.limit))
+
+    def metrics(self) -> Dict:
+        with self._cond:
+            return {
+                'limit': self.limit,
+                'active': self._active,
+                'queued': len(self._waiting),
+                'max_queue': self.max_queue,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'avg_wait_ms': round(1000 * self.total_wait / self.admitted, 1) if self.admitted else 0.0,
+                'max_wait_ms': round(1000 * self.max_wait, 1),
+                'avg_service_ms': round(1000 * self._service_time, 1)
+            }
+
+
+class AdmissionController:
+    """Bulkheads for all route classes"""
+
+    def __init__(self, classes: Dict[str, tuple], worker_threads: int = 128):
+        """
+        Args:
+            classes: class -> (limit, max queued, queue timeout seconds)
+            worker_threads: Request threads of the server process
+
+        Raises:
+            ValueError: The classes can hold more threads than the server has
+        """
+        held = sum(limit + max_queue for limit, max_queue, _ in classes.values())
+        if held > worker_threads - 1:
+            raise ValueError(f"Admission classes can hold {held} requests but only "
+                             f"{worker_threads - 1} of {worker_threads} worker threads are "
+                             f"available; lower ADMISSION_<CLASS> or raise WEB_THREADS")
+        self.worker_threads = worker_threads
+        self.bulkheads = {name: Bulkhead(name, *settings) for name, settings in classes.items()}
+
+    def pool_sizes(self) -> Dict[str, int]:
+        """Connection sub-pool size per route class (one connection per slot)"""
+        return {name: bulkhead.limit for name, bulkhead in self.bulkheads.items()
+                if name not in NO_POOL_CLASSES}
+
+    def metrics(self) -> Dict[str, Dict]:
+        return {name: bulkhead.metrics() for name, bulkhead in self.bulkheads.items()}
@@ -0,0 +1,49 @@
+"""
+Partition maintenance and archival for audit_log (audit_partitioning.sql)
+
+Adds monthly partitions ahead of time and moves months older than
+AUDIT_HOT_MONTHS into compressed files under AUDIT_ARCHIVE_DIR, dropping
+their partitions. Safe to run repeatedly; schedule it daily.
+Usage: python archive_audit.py
+"""
+
+import os
+from dotenv import load_dotenv
+from nh_management import NHDatabase
+from audit_archive import AuditArchive
+
+
+def archive_audit():
+    """Run partition maintenance and print what was added and archived"""
+    load_dotenv()
+    db = NHDatabase(
+        host=os.getenv('DB_HOST', 'localhost'),
+        database=os.getenv('DB_NAME', 'nh_management'),
+        user=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', ''),
+        port=int(os.getenv('DB_PORT', '3306'))
+    )
+    if not db.connect():
+        print("❌ Failed to connect to database")
+        return False
+
+    archive = AuditArchive(db, hot_months=int(os.getenv('AUDIT_HOT_MONTHS', '3')))
+    if not archive.partitions():
+        print("❌ audit_log is not partitioned - run audit_partitioning.sql first")
+        return False
+
+    print("📋 Maintaining audit_log partitions...")
+    result = archive.run_maintenance()
+    for name in result['added']:
+        print(f"   ✓ Added partition {name}")
+    for entry in result['archived']:
+        print(f"   ✓ Archived {entry['month']}: {entry['rows']} rows -> {entry['file']}")
+
+    status = archive.status()
+    print(f"\n✅ {status['archived_months']} months archived ({status['archived_rows']} rows, "
+          f"{status['codec']}) in {archive.directory}")
+    return True
+
+
+if __name__ == "__main__":
+    archive_audit()
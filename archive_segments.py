@@ -0,0 +1,45 @@
+"""
+Move archived segments to the archive tables (segment_archive.sql)
+
+The API moves a segment as soon as its status is set to 'archived'; this
+moves any left behind by manual SQL or a failed move. Safe to run
+repeatedly; schedule it daily.
+Usage: python archive_segments.py
+"""
+
+import os
+from dotenv import load_dotenv
+from nh_management import NHDatabase, SegmentManager
+
+
+def archive_segments():
+    """Move every segment with status 'archived' and print how many were moved"""
+    load_dotenv()
+    db = NHDatabase(
+        host=os.getenv('DB_HOST', 'localhost'),
+        database=os.getenv('DB_NAME', 'nh_management'),
+        user=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', ''),
+        port=int(os.getenv('DB_PORT', '3306'))
+    )
+    if not db.connect():
+        print("❌ Failed to connect to database")
+        return False
+
+    segment_mgr = SegmentManager(db)
+    if not segment_mgr.has_archive():
+        print("❌ Archive tables not installed - run segment_archive.sql first")
+        return False
+
+    print("📋 Moving archived segments...")
+    moved = segment_mgr.archive_segments()
+    for segment_id in moved:
+        print(f"   ✓ Archived segment {segment_id}")
+
+    rows = db.execute_query("SELECT COUNT(*) AS row_count FROM nh_segments_archive")
+    print(f"\n✅ {len(moved)} segments moved, {rows[0]['row_count'] if rows else '?'} in the archive")
+    return True
+
+
+if __name__ == "__main__":
+    archive_segments()
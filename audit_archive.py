@@ -0,0 +1,351 @@
+"""
+National Highways Management System - Audit Log Archive
+audit_log is range-partitioned by month (audit_partitioning.sql). Months
+older than the hot window are exported to compressed NDJSON files (zstd if
+the zstandard package is installed, gzip otherwise) listed in a small JSON
+index, and their partitions are dropped, so the table and its indexes only
+hold recent entries.
+
+AuditArchive.query() reads the hot table and the archive files as one
+log_id-ordered stream.
+"""
+
+from typing import Optional, List, Dict, Iterable, Iterator
+from datetime import datetime, date
+import gzip
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import os
+import re
+
+try:
+    import zstandard
+except ImportError:  # Optional - archives are gzip-compressed without it
+    zstandard = None
+
+from nh_management import NHDatabase
+
+
+INDEX_VERSION = 1
+
+AUDIT_COLUMNS = ('log_id', 'user_id', 'table_name', 'record_id', 'action',
+                 'old_values', 'new_values', 'ip_address', 'created_at')
+
+# Monthly partitions are named pYYYYMM; p_future (MAXVALUE) catches the rest
+PARTITION_RE = re.compile(r'^p(\d{4})(\d{2})$')
+
+
+def _month_start(value: date, offset: int = 0) -> date:
+    """First day of the month `offset` months after value's month"""
+    months = value.year * 12 + value.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def _json_value(value):
+    """JSON column value (str or bytes from the connector) as a Python object"""
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode('utf-8')
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+def _normalize(row: Dict) -> Dict:
+    row = dict(row)
+    row['old_values'] = _json_value(row.get('old_values'))
+    row['new_values'] = _json_value(row.get('new_values'))
+    return row
+
+
+def _segment_of(row: Dict) -> Optional[int]:
+    """Segment of an entry, as audit_log's generated segment_id column (audit_indexes.sql)"""
+    if row['table_name'] == 'nh_segments':
+        return row['record_id']
+    if row['table_name'] == 'nh_road_details':
+        for values in (row.get('new_values'), row.get('old_values')):
+            if values and values.get('segment_id') is not None:
+                return int(values['segment_id'])
+    return None
+
+
+def _open_archive(path: str, codec: str, mode: str):
+    """Text stream over an archive file ('r' or 'w')"""
+    if codec == 'gzip':
+        return gzip.open(path, mode + 't', encoding='utf-8', compresslevel=9)
+    if zstandard is None:
+        raise RuntimeError(f"{os.path.basename(path)} is zstd-compressed; "
+                           f"install the zstandard package to read it")
+    raw = open(path, mode + 'b')
+    if mode == 'w':
+        stream = zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=True)
+    else:
+        stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return io.TextIOWrapper(stream, encoding='utf-8')
+
+
+class AuditArchive:
+    """Partition maintenance, cold storage and spanning queries for audit_log"""
+
+    def __init__(self, db: NHDatabase, directory: Optional[str] = None, hot_months: int = 3):
+        """
+        Args:
+            db: Database handle
+            directory: Where archive files and index.json are kept
+                       (default: AUDIT_ARCHIVE_DIR or archive/audit_log)
+            hot_months: Months kept in the table, including the current one
+        """
+        self.db = db
+        self.directory = directory or os.getenv('AUDIT_ARCHIVE_DIR',
+                                                os.path.join('archive', 'audit_log'))
+        self.hot_months = hot_months
+        self.codec = 'zstd' if zstandard is not None else 'gzip'
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, 'index.json')
+
+    def archives(self) -> List[Dict]:
+        """Archived months, oldest first"""
+        try:
+            with open(self._index_path()) as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return []
+        return sorted(index['archives'], key=lambda entry: entry['month'])
+
+    def _write_index(self, archives: List[Dict]):
+        tmp_path = f"{self._index_path()}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': INDEX_VERSION, 'archives': archives}, f, indent=1)
+        os.replace(tmp_path, self._index_path())
+
+    # ------------------------------------------------------------------
+    # Partition maintenance
+    # ------------------------------------------------------------------
+
+    def partitions(self) -> List[Dict]:
+        """Partitions of audit_log in order (empty if it is not partitioned)"""
+        return self.db.execute_query("""
+            SELECT PARTITION_NAME AS name, PARTITION_DESCRIPTION AS bound, TABLE_ROWS AS row_estimate
+            FROM information_schema.partitions
+            WHERE table_schema = DATABASE() AND table_name = 'audit_log'
+              AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+        """, raise_on_error=True) or []
+
+    def ensure_partitions(self, months_ahead: int = 2) -> List[str]:
+        """
+        Split p_future so every month up to months_ahead has its own partition
+
+        Returns:
+            Names of the partitions added
+        """
+        names = [p['name'] for p in self.partitions()]
+        if 'p_future' not in names:
+            return []
+        months = [date(int(m.group(1)), int(m.group(2)), 1)
+                  for m in map(PARTITION_RE.match, names) if m]
+
+        today = self.db.execute_query("SELECT CURDATE() AS today", raise_on_error=True)[0]['today']
+        last = _month_start(today, months_ahead)
+        if months:
+            first = _month_start(max(months), 1)
+        else:
+            # First split: start at the oldest row already in p_future
+            oldest = self.db.execute_query(
+                "SELECT MIN(created_at) AS oldest FROM audit_log", raise_on_error=True)[0]['oldest']
+            first = _month_start(oldest.date() if oldest else today)
+        if first > last:
+            return []
+
+        added = []
+        month = first
+        while month <= last:
+            added.append(month)
+            month = _month_start(month, 1)
+        definitions = ', '.join(
+            f"PARTITION p{m.strftime('%Y%m')} VALUES LESS THAN "
+            f"(UNIX_TIMESTAMP('{_month_start(m, 1).isoformat()}'))" for m in added)
+        self.db.execute_query(
+            f"ALTER TABLE audit_log REORGANIZE PARTITION p_future INTO "
+            f"({definitions}, PARTITION p_future VALUES LESS THAN MAXVALUE)",
+            fetch=False, raise_on_error=True)
+        return [f"p{m.strftime('%Y%m')}" for m in added]
+
+    def due_partitions(self) -> List[str]:
+        """Monthly partitions older than the hot window"""
+        rows = self.db.execute_query("SELECT CURDATE() AS today", raise_on_error=True)
+        cutoff = _month_start(rows[0]['today'], 1 - self.hot_months)
+        due = []
+        for partition in self.partitions():
+            match = PARTITION_RE.match(partition['name'])
+            if match and date(int(match.group(1)), int(match.group(2)), 1) < cutoff:
+                due.append(partition['name'])
+        return due
+
+    def archive_partition(self, name: str) -> Dict:
+        """
+        Export one monthly partition to an archive file, then drop it
+
+        The partition is only dropped after the file has been read back and
+        its row count matches the partition's.
+
+        Returns:
+            Index entry of the archive
+        """
+        match = PARTITION_RE.match(name)
+        if not match:
+            raise ValueError(f"Not a monthly audit_log partition: {name}")
+        month = f"{match.group(1)}-{match.group(2)}"
+        extension = 'zst' if self.codec == 'zstd' else 'gz'
+        filename = f"audit_log-{month}.ndjson.{extension}"
+        path = os.path.join(self.directory, filename)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(self.directory, exist_ok=True)
+
+        entry = {'month': month, 'partition': name, 'file': filename, 'codec': self.codec,
+                 'rows': 0, 'min_log_id': None, 'max_log_id': None,
+                 'min_created_at': None, 'max_created_at': None, 'tables': {}}
+        rows = self.db.stream_query(
+            f"SELECT {', '.join(AUDIT_COLUMNS)} FROM audit_log PARTITION ({name}) ORDER BY log_id")
+        try:
+            with _open_archive(tmp_path, self.codec, 'w') as out:
+                for row in rows:
+                    row = _normalize(row)
+                    out.write(json.dumps(row, default=str, separators=(',', ':')) + '\n')
+                    created_at = row['created_at'].isoformat() if row['created_at'] else None
+                    entry['rows'] += 1
+                    entry['min_log_id'] = entry['min_log_id'] or row['log_id']
+                    entry['max_log_id'] = row['log_id']
+                    if created_at:
+                        entry['min_created_at'] = min(entry['min_created_at'] or created_at, created_at)
+                        entry['max_created_at'] = max(entry['max_created_at'] or created_at, created_at)
+                    entry['tables'][row['table_name']] = entry['tables'].get(row['table_name'], 0) + 1
+
+            counted = self.db.execute_query(
+                f"SELECT COUNT(*) AS row_count FROM audit_log PARTITION ({name})",
+                raise_on_error=True)[0]['row_count']
+            read_back = sum(1 for _ in self._read_file(tmp_path, self.codec))
+            if not entry['rows'] == read_back == counted:
+                raise RuntimeError(f"Archive of {name} is incomplete "
+                                   f"(wrote {entry['rows']}, read {read_back}, table has {counted})")
+
+            with open(tmp_path, 'rb') as f:
+                entry['sha256'] = hashlib.file_digest(f, 'sha256').hexdigest()
+            entry['archived_at'] = datetime.now().isoformat()
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        # Re-archiving a month (e.g. after a failed DROP) replaces its entry
+        archives = [a for a in self.archives() if a['month'] != month] + [entry]
+        self._write_index(sorted(archives, key=lambda a: a['month']))
+        self.db.execute_query(f"ALTER TABLE audit_log DROP PARTITION {name}",
+                              fetch=False, raise_on_error=True)
+        return entry
+
+    def run_maintenance(self, months_ahead: int = 2) -> Dict:
+        """Create upcoming partitions and archive the ones past the hot window"""
+        added = self.ensure_partitions(months_ahead)
+        archived = [self.archive_partition(name) for name in self.due_partitions()]
+        return {'added': added, 'archived': archived}
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _read_file(self, path: str, codec: str) -> Iterator[Dict]:
+        with _open_archive(path, codec, 'r') as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    if row['created_at']:
+                        row['created_at'] = datetime.fromisoformat(row['created_at'])
+                    yield row
+
+    def _archived_rows(self, entry: Dict, since: Optional[datetime], until: Optional[datetime],
+                       after_log_id: Optional[int]) -> Optional[Iterator[Dict]]:
+        """Rows of one archive file, or None if its ranges rule it out"""
+        if not entry['rows']:
+            return None
+        if after_log_id is not None and entry['max_log_id'] <= after_log_id:
+            return None
+        if since is not None and entry['max_created_at'] < since.isoformat():
+            return None
+        if until is not None and entry['min_created_at'] > until.isoformat():
+            return None
+        return self._read_file(os.path.join(self.directory, entry['file']), entry['codec'])
+
+    def query(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+              after_log_id: Optional[int] = None, table_names: Optional[Iterable[str]] = None,
+              record_id: Optional[int] = None, user_id: Optional[int] = None,
+              segment_id: Optional[int] = None, limit: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Audit entries from the hot table and the archives, in log_id order
+
+        Archive files whose log_id / created_at ranges cannot match are not
+        opened. old_values and new_values are returned as dicts.
+
+        Args:
+            since: Entries created at or after this time
+            until: Entries created at or before this time
+            after_log_id: Entries with a larger log_id
+            table_names: Only these tables
+            record_id: Only this record
+            user_id: Only changes by this user
+            segment_id: Only changes to this segment and its road details
+            limit: Maximum entries returned
+        """
+        table_names = tuple(table_names) if table_names else None
+
+        def matches(row: Dict) -> bool:
+            return ((since is None or row['created_at'] >= since)
+                    and (until is None or row['created_at'] <= until)
+                    and (after_log_id is None or row['log_id'] > after_log_id)
+                    and (table_names is None or row['table_name'] in table_names)
+                    and (record_id is None or row['record_id'] == record_id)
+                    and (user_id is None or row['user_id'] == user_id)
+                    and (segment_id is None or _segment_of(row) == segment_id))
+
+        sources = []
+        for entry in self.archives():
+            rows = self._archived_rows(entry, since, until, after_log_id)
+            if rows is not None:
+                sources.append(filter(matches, rows))
+
+        query = f"SELECT {', '.join(AUDIT_COLUMNS)} FROM audit_log WHERE 1=1"
+        params = []
+        for clause, value in (("created_at >= %s", since), ("created_at <= %s", until),
+                              ("log_id > %s", after_log_id), ("record_id = %s", record_id),
+                              ("user_id = %s", user_id), ("segment_id = %s", segment_id)):
+            if value is not None:
+                query += f" AND {clause}"
+                params.append(value)
+        if table_names:
+            query += f" AND table_name IN ({', '.join(['%s'] * len(table_names))})"
+            params.extend(table_names)
+        query += " ORDER BY log_id"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        sources.append(map(_normalize, self.db.stream_query(query, tuple(params))))
+
+        merged = heapq.merge(*sources, key=lambda row: row['log_id'])
+        return itertools.islice(merged, limit) if limit is not None else merged
+
+    def status(self) -> Dict:
+        archives = self.archives()
+        return {
+            'archived_months': len(archives),
+            'archived_rows': sum(a['rows'] for a in archives),
+            'oldest_month': archives[0]['month'] if archives else None,
+            'newest_month': archives[-1]['month'] if archives else None,
+            'codec': self.codec
+        }
@@ -0,0 +1,190 @@
+-- Batched audit writing (AUDIT_MODE=batched) for existing NH Management databases
+-- database_schema.sql and triggers.sql already include this for new installations.
+-- Run once: mysql -u root -p nh_management < audit_batching.sql
+--
+-- The segment and road detail audit triggers are recreated so that they do
+-- nothing on connections that set @nh_app_audit; the application then writes
+-- those entries itself (audit_writer.py). Writes from other clients (mysql,
+-- scripts) are still audited by the triggers.
+
+-- ============================================================================
+-- WRITER PROGRESS
+-- Last spool sequence number each writer has committed; updated in the same
+-- transaction as its audit_log batch so spool replay after a crash neither
+-- loses nor repeats entries
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS audit_writer_state (
+    writer_id VARCHAR(100) PRIMARY KEY,
+    last_seq BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- ============================================================================
+-- AUDIT TRIGGERS
+-- ============================================================================
+
+DELIMITER //
+
+DROP TRIGGER IF EXISTS trg_audit_nh_segments_insert //
+-- Audit trigger for NH_SEGMENTS insert
+CREATE TRIGGER trg_audit_nh_segments_insert
+AFTER INSERT ON nh_segments
+FOR EACH ROW
+BEGIN
+    IF @nh_app_audit IS NULL THEN
+        INSERT INTO audit_log (user_id, table_name, record_id, action, new_values)
+        VALUES (
+            NEW.created_by,
+            'nh_segments',
+            NEW.segment_id,
+            'INSERT',
+            JSON_OBJECT(
+                'nh_id', NEW.nh_id,
+                'division_office_id', NEW.division_office_id,
+                'start_chainage', NEW.start_chainage,
+                'end_chainage', NEW.end_chainage,
+                'segment_name', NEW.segment_name,
+                'status', NEW.status
+            )
+        );
+    END IF;
+END //
+
+DROP TRIGGER IF EXISTS trg_audit_nh_segments_update //
+-- Audit trigger for NH_SEGMENTS update
+CREATE TRIGGER trg_audit_nh_segments_update
+AFTER UPDATE ON nh_segments
+FOR EACH ROW
+BEGIN
+    IF @nh_app_audit IS NULL THEN
+        INSERT INTO audit_log (user_id, table_name, record_id, action, old_values, new_values)
+        VALUES (
+            NEW.created_by,
+            'nh_segments',
+            NEW.segment_id,
+            'UPDATE',
+            JSON_OBJECT(
+                'nh_id', OLD.nh_id,
+                'division_office_id', OLD.division_office_id,
+                'start_chainage', OLD.start_chainage,
+                'end_chainage', OLD.end_chainage,
+                'segment_name', OLD.segment_name,
+                'status', OLD.status
+            ),
+            JSON_OBJECT(
+                'nh_id', NEW.nh_id,
+                'division_office_id', NEW.division_office_id,
+                'start_chainage', NEW.start_chainage,
+                'end_chainage', NEW.end_chainage,
+                'segment_name', NEW.segment_name,
+                'status', NEW.status
+            )
+        );
+    END IF;
+END //
+
+DROP TRIGGER IF EXISTS trg_audit_nh_segments_delete //
+-- Audit trigger for NH_SEGMENTS delete
+CREATE TRIGGER trg_audit_nh_segments_delete
+BEFORE DELETE ON nh_segments
+FOR EACH ROW
+BEGIN
+    IF @nh_app_audit IS NULL THEN
+        INSERT INTO audit_log (user_id, table_name, record_id, action, old_values)
+        VALUES (
+            OLD.created_by,
+            'nh_segments',
+            OLD.segment_id,
+            'DELETE',
+            JSON_OBJECT(
+                'nh_id', OLD.nh_id,
+                'division_office_id', OLD.division_office_id,
+                'start_chainage', OLD.start_chainage,
+                'end_chainage', OLD.end_chainage,
+                'segment_name', OLD.segment_name,
+                'status', OLD.status
+            )
+        );
+    END IF;
+END //
+
+DROP TRIGGER IF EXISTS trg_audit_nh_road_details_insert //
+-- Audit trigger for NH_ROAD_DETAILS insert
+CREATE TRIGGER trg_audit_nh_road_details_insert
+AFTER INSERT ON nh_road_details
+FOR EACH ROW
+BEGIN
+    IF @nh_app_audit IS NULL THEN
+        INSERT INTO audit_log (user_id, table_name, record_id, action, new_values)
+        VALUES (
+            NEW.created_by,
+            'nh_road_details',
+            NEW.detail_id,
+            'INSERT',
+            JSON_OBJECT(
+                'segment_id', NEW.segment_id,
+                'config_id', NEW.config_id,
+                'start_chainage', NEW.start_chainage,
+                'end_chainage', NEW.end_chainage,
+                'remarks', NEW.remarks
+            )
+        );
+    END IF;
+END //
+
+DROP TRIGGER IF EXISTS trg_audit_nh_road_details_update //
+-- Audit trigger for NH_ROAD_DETAILS update
+CREATE TRIGGER trg_audit_nh_road_details_update
+AFTER UPDATE ON nh_road_details
+FOR EACH ROW
+BEGIN
+    IF @nh_app_audit IS NULL THEN
+        INSERT INTO audit_log (user_id, table_name, record_id, action, old_values, new_values)
+        VALUES (
+            NEW.created_by,
+            'nh_road_details',
+            NEW.detail_id,
+            'UPDATE',
+            JSON_OBJECT(
+                'segment_id', OLD.segment_id,
+                'config_id', OLD.config_id,
+                'start_chainage', OLD.start_chainage,
+                'end_chainage', OLD.end_chainage,
+                'remarks', OLD.remarks
+            ),
+            JSON_OBJECT(
+                'segment_id', NEW.segment_id,
+                'config_id', NEW.config_id,
+                'start_chainage', NEW.start_chainage,
+                'end_chainage', NEW.end_chainage,
+                'remarks', NEW.remarks
+            )
+        );
+    END IF;
+END //
+
+DROP TRIGGER IF EXISTS trg_audit_nh_road_details_delete //
+-- Audit trigger for NH_ROAD_DETAILS delete
+CREATE TRIGGER trg_audit_nh_road_details_delete
+BEFORE DELETE ON nh_road_details
+FOR EACH ROW
+BEGIN
+    IF @nh_app_audit IS NULL THEN
+        INSERT INTO audit_log (user_id, table_name, record_id, action, old_values)
+        VALUES (
+            OLD.created_by,
+            'nh_road_details',
+            OLD.detail_id,
+            'DELETE',
+            JSON_OBJECT(
+                'segment_id', OLD.segment_id,
+                'config_id', OLD.config_id,
+                'start_chainage', OLD.start_chainage,
+                'end_chainage', OLD.end_chainage,
+                'remarks', OLD.remarks
+            )
+        );
+    END IF;
+END //
+
+DELIMITER ;
@@ -0,0 +1,39 @@
+-- Audit log access paths for existing NH Management databases
+-- database_schema.sql already creates these for new installations.
+-- Run once, after audit_partitioning.sql:
+--   mysql -u root -p nh_management < audit_indexes.sql
+--
+-- Used by AuditManager (/api/audit). Every index ends in (created_at, log_id)
+-- so a filtered, newest-first page is one ordered range scan that stops
+-- after the page size, however deep the cursor is.
+-- Adding the stored column rebuilds the table; run it in a quiet period.
+
+-- ============================================================================
+-- SEGMENT OF EACH ENTRY
+-- The segment itself for nh_segments entries, the detail's segment for
+-- nh_road_details entries (taken from the logged values, so deleted details
+-- are still found). Serves the history of a segment with all its details.
+-- ============================================================================
+ALTER TABLE audit_log
+    ADD COLUMN segment_id INT GENERATED ALWAYS AS (
+        CASE table_name
+            WHEN 'nh_segments' THEN record_id
+            WHEN 'nh_road_details' THEN CAST(COALESCE(new_values->>'$.segment_id',
+                                                      old_values->>'$.segment_id') AS UNSIGNED)
+        END
+    ) STORED;
+
+-- ============================================================================
+-- KEYSET PAGINATION INDEXES
+-- Replace idx_audit_user / idx_audit_table, which end in the primary key
+-- (log_id, created_at) and so cannot return entries in created_at order
+-- ============================================================================
+DROP INDEX idx_audit_user ON audit_log;
+DROP INDEX idx_audit_table ON audit_log;
+
+CREATE INDEX idx_audit_user_time ON audit_log(user_id, created_at, log_id);
+CREATE INDEX idx_audit_record_time ON audit_log(table_name, record_id, created_at, log_id);
+CREATE INDEX idx_audit_table_time ON audit_log(table_name, created_at, log_id);
+CREATE INDEX idx_audit_segment_time ON audit_log(segment_id, created_at, log_id);
+-- idx_audit_created (created_at) already serves unfiltered pages: InnoDB
+-- appends the primary key, making it (created_at, log_id)
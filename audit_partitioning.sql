@@ -0,0 +1,30 @@
+-- Monthly partitioning of audit_log for existing NH Management databases
+-- database_schema.sql already creates audit_log partitioned for new installations.
+-- Run once: mysql -u root -p nh_management < audit_partitioning.sql
+-- Then create the monthly partitions and archive old months:
+--   python archive_audit.py        (schedule it, e.g. daily from cron)
+--
+-- MySQL requires the partitioning column in every unique key and does not
+-- support foreign keys on partitioned tables, so the primary key becomes
+-- (log_id, created_at) and the user_id foreign key is dropped (entries keep
+-- the user_id of users deleted later).
+
+-- Name of the foreign key created by database_schema.sql; check with
+-- SHOW CREATE TABLE audit_log if it was renamed
+ALTER TABLE audit_log DROP FOREIGN KEY audit_log_ibfk_1;
+
+ALTER TABLE audit_log
+    MODIFY created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (log_id, created_at);
+
+-- Everything starts in p_future; archive_audit.py splits it into pYYYYMM
+-- partitions (from the oldest existing entry up to two months ahead)
+ALTER TABLE audit_log
+PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) (
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
+
+SELECT PARTITION_NAME, TABLE_ROWS
+FROM information_schema.partitions
+WHERE table_schema = DATABASE() AND table_name = 'audit_log';
@@ -0,0 +1,311 @@
+"""
+National Highways Management System - Batched Audit Writer
+Optional replacement for the segment and road detail audit triggers
+(AUDIT_MODE=batched). Writes made through NHDatabase.execute_audited() skip
+the triggers and hand their audit entries to this writer, which inserts them
+in multi-row batches from a background thread, off the request's transaction.
+
+Durability: with a spool directory every entry is appended to a local
+write-ahead spool file (and fsync'd, unless disabled) before the write call
+returns. Each batch insert records the last spooled sequence number it
+contains in audit_writer_state in the same transaction, so after a crash the
+spool is replayed from exactly where the database left off: entries are
+neither lost nor duplicated. What remains unprotected is a crash between the
+data commit and the spool append (a few microseconds), and the spool file
+itself: keep it on a local, persistent disk.
+"""
+
+from typing import Optional, List, Dict
+from collections import deque
+from datetime import datetime
+from decimal import Decimal
+import itertools
+import json
+import os
+import socket
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows - spool files cannot be locked (run one process)
+    fcntl = None
+
+from nh_management import NHDatabase
+
+
+SPOOL_SUFFIX = '.wal'
+
+AUDIT_INSERT_COLUMNS = ('user_id', 'table_name', 'record_id', 'action',
+                        'old_values', 'new_values', 'ip_address', 'created_at')
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _lock(handle) -> bool:
+    """Take an exclusive lock on an open spool file (False if another process holds it)"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+class AuditWriter:
+    """Queues audit entries and writes them to audit_log in batches"""
+
+    def __init__(self, db: NHDatabase, spool_dir: Optional[str] = None, batch_size: int = 500,
+                 flush_interval: float = 0.2, fsync: bool = True, pool: Optional[str] = None):
+        """
+        Args:
+            db: Database handle
+            spool_dir: Directory for write-ahead spool files (None keeps
+                       queued entries in memory only)
+            batch_size: Maximum entries per INSERT
+            flush_interval: Seconds between flushes (a full batch flushes at once)
+            fsync: Force each spool append to disk before the write call returns
+            pool: Database sub-pool the writer draws connections from
+        """
+        self.db = db
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.pool = pool
+        self.writer_id = f"{socket.gethostname()}-{os.getpid()}"
+
+        self._queue = deque()  # (seq, entry)
+        self._seq = 0
+        self._synced_seq = 0
+        self._spool = None
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.written = 0
+        self.recovered = 0
+        self.last_flush_error = None
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def record(self, entries: List[Dict]):
+        """
+        Queue audit entries (audit_log columns; old/new values as dicts)
+
+        Returns once the entries are in the spool file, so an entry is only
+        lost if the process dies before its write call returns.
+        """
+        if not entries:
+            return
+        with self._lock:
+            lines = []
+            for entry in entries:
+                self._seq += 1
+                self._queue.append((self._seq, entry))
+                lines.append(json.dumps(dict(entry, seq=self._seq), default=_json_default))
+            if self._spool is not None:
+                self._spool.write('\n'.join(lines) + '\n')
+                self._spool.flush()
+            seq = self._seq
+            queued = len(self._queue)
+
+        if self._spool is not None and self.fsync:
+            # Group commit: one fsync covers every entry appended before it
+            with self._sync_lock:
+                if self._synced_seq < seq:
+                    with self._lock:
+                        target = self._seq
+                        spool = self._spool
+                    if spool is not None:
+                        os.fsync(spool.fileno())
+                    self._synced_seq = target
+        if queued >= self.batch_size:
+            self._wake.set()
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def _insert(self, batch: List[tuple], writer_id: str):
+        """Insert (seq, entry) pairs and record the last seq, in one transaction"""
+        rows = []
+        for _, entry in batch:
+            row = dict(entry)
+            for column in ('old_values', 'new_values'):
+                if row.get(column) is not None and not isinstance(row[column], str):
+                    row[column] = json.dumps(row[column], default=_json_default)
+            if isinstance(row.get('created_at'), str):
+                row['created_at'] = datetime.fromisoformat(row['created_at'])
+            rows.append(tuple(row.get(column) for column in AUDIT_INSERT_COLUMNS))
+
+        placeholders = f"({', '.join(['%s'] * len(AUDIT_INSERT_COLUMNS))})"
+        with self.db.transaction() as cursor:
+            cursor.execute(f"""
+                INSERT INTO audit_log ({', '.join(AUDIT_INSERT_COLUMNS)})
+                VALUES {', '.join([placeholders] * len(rows))}
+            """, tuple(itertools.chain.from_iterable(rows)))
+            cursor.execute("""
+                INSERT INTO audit_writer_state (writer_id, last_seq) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE last_seq = VALUES(last_seq)
+            """, (writer_id, batch[-1][0]))
+
+    def flush(self) -> int:
+        """Write one batch of queued entries; returns the number written"""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(itertools.islice(self._queue, self.batch_size))
+            if not batch:
+                return 0
+            self._insert(batch, self.writer_id)
+            with self._lock:
+                for _ in batch:
+                    self._queue.popleft()
+                if not self._queue and self._spool is not None:
+                    # Everything spooled is in the database
+                    self._spool.truncate(0)
+            self.written += len(batch)
+        self.db.notify_change('audit_log', 'INSERT')
+        return len(batch)
+
+    def flush_all(self) -> int:
+        """Write everything queued"""
+        total = 0
+        while True:
+            written = self.flush()
+            if not written:
+                return total
+            total += written
+
+    # ------------------------------------------------------------------
+    # Spool files
+    # ------------------------------------------------------------------
+
+    def recover(self) -> int:
+        """
+        Replay the spool files of writers that are no longer running
+
+        Must run before this writer flushes anything, so that recovered
+        entries keep their place in log_id order.
+
+        Returns:
+            Number of entries written
+        """
+        if not self.spool_dir or not os.path.isdir(self.spool_dir):
+            return 0
+        total = 0
+        for name in sorted(os.listdir(self.spool_dir)):
+            if not name.endswith(SPOOL_SUFFIX):
+                continue
+            path = os.path.join(self.spool_dir, name)
+            writer_id = name[:-len(SPOOL_SUFFIX)]
+            with open(path, 'r+', encoding='utf-8') as handle:
+                if not _lock(handle):
+                    continue  # A live writer's spool
+                rows = self.db.execute_query(
+                    "SELECT last_seq FROM audit_writer_state WHERE writer_id = %s",
+                    (writer_id,), raise_on_error=True)
+                last_seq = rows[0]['last_seq'] if rows else 0
+
+                pending = []
+                for line in handle:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # Torn final line: its write call never returned
+                    seq = entry.pop('seq')
+                    if seq > last_seq:
+                        pending.append((seq, entry))
+                for start in range(0, len(pending), self.batch_size):
+                    self._insert(pending[start:start + self.batch_size], writer_id)
+                total += len(pending)
+
+            os.remove(path)
+            self.db.execute_query("DELETE FROM audit_writer_state WHERE writer_id = %s",
+                                  (writer_id,), fetch=False, raise_on_error=True)
+            if pending:
+                print(f"Recovered {len(pending)} audit entries from {name}")
+        self.recovered += total
+        if total:
+            self.db.notify_change('audit_log', 'INSERT')
+        return total
+
+    def _open_spool(self):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        spool = open(os.path.join(self.spool_dir, self.writer_id + SPOOL_SUFFIX),
+                     'a', encoding='utf-8')
+        if not _lock(spool):
+            spool.close()
+            raise RuntimeError(f"Audit spool {self.writer_id} is in use by another process")
+        with self._lock:
+            self._spool = spool
+
+    # ------------------------------------------------------------------
+    # Background writing
+    # ------------------------------------------------------------------
+
+    def status(self) -> Dict:
+        with self._lock:
+            queued = len(self._queue)
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'queued': queued,
+            'written': self.written,
+            'recovered': self.recovered,
+            'spool': self._spool.name if self._spool is not None else None,
+            'last_flush_error': self.last_flush_error
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                with self.db.use_pool(self.pool):
+                    self.flush_all()
+                self.last_flush_error = None
+            except Exception as e:
+                self.last_flush_error = str(e)
+                print(f"Error writing audit entries: {e}")
+
+    def start(self):
+        """Replay orphaned spool files, then start the background writer"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self.db.use_pool(self.pool):
+            self.recover()
+        if self.spool_dir and self._spool is None:
+            self._open_spool()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the writer after writing everything queued"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        try:
+            with self.db.use_pool(self.pool):
+                self.flush_all()
+        except Exception as e:
+            print(f"Error writing audit entries on shutdown: {e}")
+            return  # The spool file is replayed on the next start
+        with self._lock:
+            spool, self._spool = self._spool, None
+        if spool is not None:
+            spool.close()
+            os.remove(spool.name)
+            self.db.execute_query("DELETE FROM audit_writer_state WHERE writer_id = %s",
+                                  (self.writer_id,), fetch=False)
@@ -0,0 +1,571 @@
+"""
+National Highways Management System - Configuration Bitmap Index
+Per-NH, per-configuration bitmaps over fixed chainage bins (default 10 m) for
+boolean queries such as "4L AND NOT 4L-PS".
+
+Bitmaps are held run-length encoded (sorted [start_bin, end_bin) runs),
+persisted to disk as compressed .npz files and patched per segment when road
+details change.
+
+Change notifications only record which segments of which NH are stale; the
+patch (or rebuild) runs on the next query of that NH, and patched NHs are
+written back to disk by a background thread, so writes never wait on the
+index.
+"""
+
+from typing import Optional, List, Dict
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+from nh_management import NHDatabase
+
+
+INDEX_FORMAT_VERSION = 1
+
+# Pending change marking a whole NH for rebuild
+REBUILD = None
+
+
+class RunBitmap:
+    """Run-length encoded bitmap of sorted, disjoint [start, end) bin runs"""
+
+    __slots__ = ('runs',)
+
+    def __init__(self, runs: Optional[np.ndarray] = None):
+        self.runs = runs if runs is not None else np.empty((0, 2), dtype=np.int32)
+
+    @classmethod
+    def from_bool(cls, bits: np.ndarray) -> 'RunBitmap':
+        """Encode a dense boolean array"""
+        padded = np.concatenate(([False], bits, [False])).astype(np.int8)
+        edges = np.flatnonzero(np.diff(padded))
+        return cls(edges.reshape(-1, 2).astype(np.int32))
+
+    def to_bool(self, n_bins: int) -> np.ndarray:
+        """Decode to a dense boolean array of n_bins"""
+        delta = np.zeros(n_bins + 1, dtype=np.int32)
+        np.add.at(delta, np.minimum(self.runs[:, 0], n_bins), 1)
+        np.add.at(delta, np.minimum(self.runs[:, 1], n_bins), -1)
+        return np.cumsum(delta[:-1]) > 0
+
+    @property
+    def count(self) -> int:
+        """Number of set bins"""
+        return int((self.runs[:, 1] - self.runs[:, 0]).sum())
+
+
+class NHBitmaps:
+    """All configuration bitmaps for one NH"""
+
+    def __init__(self, nh_id: int, nh_number: str, resolution_m: int, n_bins: int,
+                 universe: RunBitmap, configs: Dict[int, RunBitmap], log_id: int):
+        self.nh_id = nh_id
+        self.nh_number = nh_number
+        self.resolution_m = resolution_m
+        self.n_bins = n_bins
+        self.universe = universe   # Bins covered by any segment
+        self.configs = configs     # config_id -> RunBitmap
+        self.log_id = log_id       # audit_log high-water mark the bitmaps reflect
+
+    def get_bits(self, config_id: int) -> np.ndarray:
+        bitmap = self.configs.get(config_id)
+        if bitmap is None:
+            return np.zeros(self.n_bins, dtype=bool)
+        return bitmap.to_bool(self.n_bins)
+
+
+class _ExpressionParser:
+    """
+    Recursive descent parser for configuration expressions
+
+    Grammar:
+        expr   := term (OR term)*
+        term   := factor (AND factor)*
+        factor := NOT factor | '(' expr ')' | CONFIG
+    """
+
+    TOKEN_RE = re.compile(r'\s*(\(|\)|[A-Za-z0-9_\-]+)')
+
+    def __init__(self, expression: str, resolve, universe: np.ndarray):
+        self.tokens = self._tokenize(expression)
+        self.pos = 0
+        self.resolve = resolve
+        self.universe = universe
+
+    def _tokenize(self, expression: str) -> List[str]:
+        tokens = []
+        pos = 0
+        expression = expression.strip()
+        while pos < len(expression):
+            match = self.TOKEN_RE.match(expression, pos)
+            if not match:
+                raise ValueError(f"Unexpected character in expression at position {pos}")
+            tokens.append(match.group(1))
+            pos = match.end()
+        return tokens
+
+    def _peek(self) -> Optional[str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _take(self) -> str:
+        token = self._peek()
+        if token is None:
+            raise ValueError("Unexpected end of expression")
+        self.pos += 1
+        return token
+
+    def parse(self) -> np.ndarray:
+        if not self.tokens:
+            raise ValueError("Expression is empty")
+        result = self._expr()
+        if self._peek() is not None:
+            raise ValueError(f"Unexpected token '{self._peek()}'")
+        return result
+
+    def _expr(self) -> np.ndarray:
+        result = self._term()
+        while (self._peek() or '').upper() == 'OR':
+            self._take()
+            result = result | self._term()
+        return result
+
+    def _term(self) -> np.ndarray:
+        result = self._factor()
+        while (self._peek() or '').upper() == 'AND':
+            self._take()
+            result = result & self._factor()
+        return result
+
+    def _factor(self) -> np.ndarray:
+        token = self._take()
+        if token.upper() == 'NOT':
+            # Complement within the NH's segments, not over gaps in the network
+            return self.universe & ~self._factor()
+        if token == '(':
+            result = self._expr()
+            if self._take() != ')':
+                raise ValueError("Missing closing parenthesis")
+            return result
+        if token == ')' or token.upper() in ('AND', 'OR'):
+            raise ValueError(f"Unexpected token '{token}'")
+        return self.resolve(token)
+
+
+class BitmapIndex:
+    """Persisted per-NH configuration bitmaps with boolean query support"""
+
+    def __init__(self, db: NHDatabase, resolution_m: int = 10,
+                 directory: Optional[str] = None, save_interval: float = 5.0):
+        """
+        Args:
+            db: Database handle
+            resolution_m: Bin size in metres
+            directory: Where .npz index files are stored
+                       (default: BITMAP_INDEX_DIR or cache/bitmap_index)
+            save_interval: Seconds between writes of patched NHs to disk
+        """
+        self.db = db
+        self.resolution_m = resolution_m
+        self.directory = directory or os.getenv('BITMAP_INDEX_DIR',
+                                                os.path.join('cache', 'bitmap_index'))
+        self._lock = threading.RLock()
+        self._indexes = {}        # nh_number -> NHBitmaps
+        self._segments = {}       # segment_id -> (nh_number, start_m, end_m)
+        self._detail_segment = {}  # detail_id -> segment_id
+        self._configs = None      # config code/name (upper) -> config_id
+        self._nh_numbers = {}     # nh_id -> nh_number, for NHs seen so far
+        self._pending = {}        # nh_number -> segment_ids to patch, or REBUILD
+        self._pending_lock = threading.Lock()
+        self._dirty = set()       # nh_numbers patched since they were saved
+        self.save_interval = save_interval
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_save_error = None
+        db.add_change_listener(self._on_change)
+
+    # ------------------------------------------------------------------
+    # Building and persistence
+    # ------------------------------------------------------------------
+
+    def _to_bins(self, start_km, end_km):
+        """Map a km interval to the [start_bin, end_bin) range it touches"""
+        start_m = int(round(float(start_km) * 1000))
+        end_m = int(round(float(end_km) * 1000))
+        return start_m // self.resolution_m, -(-end_m // self.resolution_m)
+
+    def _current_log_id(self) -> int:
+        rows = self.db.execute_query(
+            "SELECT COALESCE(MAX(log_id), 0) AS log_id FROM audit_log", raise_on_error=True)
+        return int(rows[0]['log_id'])
+
+    def _changed_since(self, nh_id: int, log_id: int) -> bool:
+        """Check audit_log for segment/detail changes on an NH after log_id"""
+        rows = self.db.execute_query("""
+            SELECT COUNT(*) AS changes
+            FROM audit_log al
+            WHERE al.log_id > %s
+              AND (
+                  (al.table_name = 'nh_segments'
+                   AND %s IN (JSON_EXTRACT(al.new_values, '$.nh_id'),
+                              JSON_EXTRACT(al.old_values, '$.nh_id')))
+                  OR
+                  (al.table_name = 'nh_road_details'
+                   AND COALESCE(JSON_EXTRACT(al.new_values, '$.segment_id'),
+                                JSON_EXTRACT(al.old_values, '$.segment_id'))
+                       IN (SELECT segment_id FROM nh_segments WHERE nh_id = %s))
+              )
+        """, (log_id, nh_id, nh_id), raise_on_error=True)
+        return rows[0]['changes'] > 0
+
+    def _path(self, nh_number: str) -> str:
+        safe_name = re.sub(r'[^A-Za-z0-9_\-]', '_', nh_number)
+        return os.path.join(self.directory, f"{safe_name}.npz")
+
+    def _load_segments(self, nh_id: int, nh_number: str) -> List[Dict]:
+        self._nh_numbers[nh_id] = nh_number
+        segments = self.db.execute_query("""
+            SELECT segment_id, start_chainage, end_chainage
+            FROM nh_segments WHERE nh_id = %s ORDER BY start_chainage
+        """, (nh_id,), raise_on_error=True)
+        for seg in segments:
+            self._segments[seg['segment_id']] = (
+                nh_number,
+                int(round(float(seg['start_chainage']) * 1000)),
+                int(round(float(seg['end_chainage']) * 1000))
+            )
+        return segments
+
+    def _load_details(self, nh_id: int, from_m: Optional[int] = None,
+                      to_m: Optional[int] = None) -> List[Dict]:
+        query = """
+            SELECT rd.detail_id, rd.segment_id, rd.config_id,
+                   rd.start_chainage, rd.end_chainage
+            FROM nh_road_details rd
+            JOIN nh_segments ns ON rd.segment_id = ns.segment_id
+            WHERE ns.nh_id = %s
+        """
+        params = [nh_id]
+        if from_m is not None:
+            query += " AND rd.start_chainage < %s AND rd.end_chainage > %s"
+            params += [to_m / 1000, from_m / 1000]
+        details = self.db.execute_query(query, tuple(params), raise_on_error=True)
+        for det in details:
+            self._detail_segment[det['detail_id']] = det['segment_id']
+        return details
+
+    def build(self, nh_number: str) -> Optional[NHBitmaps]:
+        """Build the bitmaps for an NH from nh_road_details and save them"""
+        nh_rows = self.db.execute_query(
+            "SELECT nh_id FROM nh_master WHERE nh_number = %s", (nh_number,))
+        if not nh_rows:
+            return None
+        nh_id = nh_rows[0]['nh_id']
+
+        log_id = self._current_log_id()
+        segments = self._load_segments(nh_id, nh_number)
+        details = self._load_details(nh_id)
+
+        n_bins = max([self._to_bins(0, s['end_chainage'])[1] for s in segments] or [0])
+        universe = np.zeros(n_bins, dtype=bool)
+        for seg in segments:
+            start_bin, end_bin = self._to_bins(seg['start_chainage'], seg['end_chainage'])
+            universe[start_bin:end_bin] = True
+
+        dense = {}
+        for det in details:
+            bits = dense.setdefault(det['config_id'], np.zeros(n_bins, dtype=bool))
+            start_bin, end_bin = self._to_bins(det['start_chainage'], det['end_chainage'])
+            bits[start_bin:end_bin] = True
+
+        index = NHBitmaps(
+            nh_id, nh_number, self.resolution_m, n_bins,
+            RunBitmap.from_bool(universe),
+            {config_id: RunBitmap.from_bool(bits) for config_id, bits in dense.items()},
+            log_id
+        )
+        self._save(index)
+        return index
+
+    def _save(self, index: NHBitmaps) -> bool:
+        """Write an NH's bitmaps to disk (atomic replace)"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            meta = json.dumps({
+                'version': INDEX_FORMAT_VERSION,
+                'nh_id': index.nh_id,
+                'nh_number': index.nh_number,
+                'resolution_m': index.resolution_m,
+                'n_bins': index.n_bins,
+                'log_id': index.log_id
+            })
+            arrays = {f"config_{cid}": bm.runs for cid, bm in index.configs.items()}
+            path = self._path(index.nh_number)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.savez_compressed(f, meta=np.array(meta), universe=index.universe.runs,
+                                    **arrays)
+            os.replace(tmp_path, path)
+            return True
+        except OSError as e:
+            self.last_save_error = str(e)
+            print(f"Error saving bitmap index for {index.nh_number}: {e}")
+            return False
+
+    def _load_file(self, nh_number: str) -> Optional[NHBitmaps]:
+        """Load an NH's bitmaps from disk if present, compatible and current"""
+        path = self._path(nh_number)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                if (meta['version'] != INDEX_FORMAT_VERSION
+                        or meta['resolution_m'] != self.resolution_m
+                        or self._changed_since(meta['nh_id'], meta['log_id'])):
+                    return None
+                configs = {
+                    int(name[len('config_'):]): RunBitmap(data[name])
+                    for name in data.files if name.startswith('config_')
+                }
+                index = NHBitmaps(meta['nh_id'], meta['nh_number'], meta['resolution_m'],
+                                  meta['n_bins'], RunBitmap(data['universe']), configs,
+                                  meta['log_id'])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable bitmap index {path}: {e}")
+            return None
+
+        # Patching needs segment/detail ownership, which the file does not store
+        self._load_segments(index.nh_id, nh_number)
+        self._load_details(index.nh_id)
+        return index
+
+    def get(self, nh_number: str) -> Optional[NHBitmaps]:
+        """
+        Get the bitmaps for an NH, loading from disk or building as needed
+
+        Changes recorded for the NH since the last call are applied first.
+        """
+        with self._lock:
+            with self._pending_lock:
+                pending = self._pending.pop(nh_number, ())
+            index = self._indexes.get(nh_number)
+            if pending is REBUILD:
+                self._drop(nh_number)
+                index = None
+            elif index is not None and pending:
+                try:
+                    for segment_id in pending:
+                        self._patch(index, segment_id)
+                except Exception:
+                    # Start over on the next call rather than serve a half-patched NH
+                    self._drop(nh_number)
+                    raise
+                self._dirty.add(nh_number)
+
+            if index is None:
+                index = self._load_file(nh_number) or self.build(nh_number)
+                if index is not None:
+                    self._indexes[nh_number] = index
+            return index
+
+    # ------------------------------------------------------------------
+    # Incremental maintenance
+    # ------------------------------------------------------------------
+
+    def _patch(self, index: NHBitmaps, segment_id: int):
+        """Recompute the bins of one segment from its road details (under _lock)"""
+        owner = self._segments.get(segment_id)
+        if owner is None or owner[0] != index.nh_number:
+            return
+        _, start_m, end_m = owner
+        start_bin, end_bin = self._to_bins(start_m / 1000, end_m / 1000)
+
+        # Boundary bins may be shared with a neighbouring segment's details
+        details = self._load_details(index.nh_id, start_bin * self.resolution_m,
+                                     end_bin * self.resolution_m)
+
+        config_ids = set(index.configs) | {d['config_id'] for d in details}
+        for config_id in config_ids:
+            bits = index.get_bits(config_id)
+            bits[start_bin:end_bin] = False
+            for det in details:
+                if det['config_id'] == config_id:
+                    d_start, d_end = self._to_bins(det['start_chainage'],
+                                                   det['end_chainage'])
+                    bits[max(d_start, start_bin):min(d_end, end_bin)] = True
+            index.configs[config_id] = RunBitmap.from_bool(bits)
+        # index.log_id stays at the mark of the last full build: the saved file
+        # must still be checked against changes made by other processes
+
+    def _drop(self, nh_number: str):
+        """Forget an NH's bitmaps in memory and on disk (under _lock)"""
+        self._indexes.pop(nh_number, None)
+        self._dirty.discard(nh_number)
+        try:
+            os.remove(self._path(nh_number))
+        except OSError:
+            pass
+
+    def invalidate(self, nh_number: Optional[str] = None):
+        """Drop in-memory and on-disk bitmaps for one NH, or for all NHs"""
+        with self._lock:
+            names = [nh_number] if nh_number else list(self._indexes)
+            for name in names:
+                self._drop(name)
+            with self._pending_lock:
+                for name in names:
+                    self._pending.pop(name, None)
+
+    def _mark(self, nh_number: Optional[str], segment_id: Optional[int] = None):
+        """Record a pending patch of a segment, or a rebuild of the NH"""
+        if nh_number is None:
+            return
+        with self._pending_lock:
+            pending = self._pending.get(nh_number, set())
+            if segment_id is None or pending is REBUILD:
+                self._pending[nh_number] = REBUILD
+            else:
+                pending.add(segment_id)
+                self._pending[nh_number] = pending
+
+    def _on_change(self, table_name: str, action: str,
+                   record_id: Optional[int], values: Dict):
+        """
+        Record which NH a write affects; runs inside the write request, so it
+        does no I/O
+
+        Changes to NHs this process has not loaded need no record: their
+        files are checked against audit_log when loaded.
+        """
+        if table_name == 'nh_road_details':
+            segment_ids = {self._detail_segment.get(record_id), values.get('segment_id')}
+            for segment_id in segment_ids - {None}:
+                owner = self._segments.get(int(segment_id))
+                if owner is not None:
+                    self._mark(owner[0], int(segment_id))
+            if action == 'DELETE':
+                self._detail_segment.pop(record_id, None)
+            elif record_id is not None and values.get('segment_id') is not None:
+                self._detail_segment[record_id] = int(values['segment_id'])
+        elif table_name == 'nh_segments':
+            # The segment's NH, and its new NH if it was moved or created
+            owner = self._segments.get(record_id)
+            if owner is not None:
+                self._mark(owner[0])
+            if values.get('nh_id') is not None:
+                self._mark(self._nh_numbers.get(int(values['nh_id'])))
+        elif table_name == 'road_configurations':
+            with self._lock:
+                self._configs = None
+
+    # ------------------------------------------------------------------
+    # Background saving
+    # ------------------------------------------------------------------
+
+    def save_dirty(self):
+        """Write the NHs patched since their last save to disk"""
+        with self._lock:
+            # Copies, so patches made while writing do not tear the file
+            copies = [NHBitmaps(index.nh_id, index.nh_number, index.resolution_m,
+                                index.n_bins, index.universe, dict(index.configs), index.log_id)
+                      for index in map(self._indexes.get, self._dirty) if index is not None]
+            self._dirty.clear()
+        failed = [index.nh_number for index in copies if not self._save(index)]
+        if failed:
+            with self._lock:
+                self._dirty.update(name for name in failed if name in self._indexes)
+        else:
+            self.last_save_error = None
+
+    def status(self) -> Dict:
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'loaded': len(self._indexes),
+            'pending': pending,
+            'unsaved': len(self._dirty),
+            'last_save_error': self.last_save_error
+        }
+
+    def _run(self):
+        while not self._stop.wait(self.save_interval):
+            self.save_dirty()
+
+    def start(self):
+        """Start writing patched NHs to disk every save_interval seconds"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='bitmap-index-saver', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the save thread and write any unsaved NHs"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.save_dirty()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _resolve_config(self, token: str) -> int:
+        with self._lock:
+            if self._configs is None:
+                rows = self.db.execute_query(
+                    "SELECT config_id, config_code, config_name FROM road_configurations",
+                    raise_on_error=True)
+                configs = {}
+                for row in rows:
+                    configs[str(row['config_id'])] = row['config_id']
+                    configs[row['config_name'].upper()] = row['config_id']
+                    configs[row['config_code'].upper()] = row['config_id']
+                self._configs = configs
+            config_id = self._configs.get(token.upper())
+        if config_id is None:
+            raise ValueError(f"Unknown configuration '{token}'")
+        return config_id
+
+    def query(self, nh_number: str, expression: str) -> Optional[Dict]:
+        """
+        Evaluate a boolean configuration expression over an NH
+
+        Args:
+            nh_number: NH number, e.g. 'NH44'
+            expression: Config codes, names or ids combined with AND, OR, NOT
+                        and parentheses, e.g. "4L AND NOT (4L-PS OR 6L)"
+
+        Returns:
+            Dict with matching chainage intervals (km) and total length,
+            or None if the NH does not exist
+
+        Raises:
+            ValueError: Invalid expression or unknown configuration
+        """
+        index = self.get(nh_number)
+        if index is None:
+            return None
+
+        universe = index.universe.to_bool(index.n_bins)
+        parser = _ExpressionParser(
+            expression,
+            lambda token: index.get_bits(self._resolve_config(token)),
+            universe
+        )
+        result = RunBitmap.from_bool(parser.parse())
+
+        bin_km = self.resolution_m / 1000
+        return {
+            'nh_number': nh_number,
+            'expression': expression,
+            'resolution_m': self.resolution_m,
+            'intervals': [[round(int(s) * bin_km, 3), round(int(e) * bin_km, 3)]
+                          for s, e in result.runs],
+            'total_length': round(result.count * bin_km, 3)
+        }
@@ -0,0 +1,234 @@
+"""
+National Highways Management System - Chainage Index
+Linear referencing lookups: answers "what is at km X on NH Y" from
+per-NH sorted boundary arrays searched with binary search
+
+Loaded indexes are stamped with the database change mark they reflect, so
+warm_cache.WarmCache can keep them across restarts while nothing has changed.
+"""
+
+from bisect import bisect_right
+from typing import Optional, List, Dict
+import threading
+
+from nh_management import NHDatabase
+from warm_cache import change_mark, unchanged_since
+
+
+class NHChainageIndex:
+    """Sorted segment and road detail boundaries for a single NH"""
+
+    def __init__(self, nh: Dict, segments: List[Dict], details: List[Dict]):
+        """
+        Build the index from rows ordered by start chainage
+
+        Args:
+            nh: nh_master row
+            segments: Segment rows for the NH, ordered by start_chainage
+            details: Road detail rows for the NH, ordered by start_chainage
+        """
+        self.nh_id = nh['nh_id']
+        self.nh_number = nh['nh_number']
+        self.nh_name = nh.get('nh_name')
+
+        self.segments = segments
+        self.segment_starts = [float(s['start_chainage']) for s in segments]
+        self.segment_ends = [float(s['end_chainage']) for s in segments]
+
+        self.details = details
+        self.detail_starts = [float(d['start_chainage']) for d in details]
+        self.detail_ends = [float(d['end_chainage']) for d in details]
+
+    @staticmethod
+    def _find(starts: List[float], ends: List[float], chainage: float) -> int:
+        """
+        Binary search for the interval containing a chainage
+
+        Intervals are half-open [start, end) so a shared boundary belongs to
+        the interval that starts there; the end of the last interval in a
+        run is still matched.
+
+        Returns:
+            Index of the matching interval, or -1 if the chainage is in a gap
+        """
+        i = bisect_right(starts, chainage) - 1
+        if i >= 0 and chainage <= ends[i]:
+            return i
+        return -1
+
+    def lookup(self, chainage: float) -> Dict:
+        """Get the segment and road configuration at a chainage"""
+        result = {
+            'nh_number': self.nh_number,
+            'chainage': chainage,
+            'segment': None,
+            'configuration': None
+        }
+
+        i = self._find(self.segment_starts, self.segment_ends, chainage)
+        if i >= 0:
+            result['segment'] = self.segments[i]
+
+        j = self._find(self.detail_starts, self.detail_ends, chainage)
+        if j >= 0:
+            result['configuration'] = self.details[j]
+
+        return result
+
+
+class ChainageIndex:
+    """Cache of per-NH chainage indexes, invalidated on segment/detail writes"""
+
+    def __init__(self, db: NHDatabase):
+        self.db = db
+        self._lock = threading.Lock()
+        self._indexes = {}       # nh_number -> NHChainageIndex
+        self._segment_nh = {}    # segment_id -> nh_number
+        self._detail_nh = {}     # detail_id -> nh_number
+        self._marks = {}         # nh_number -> change mark the index was loaded at
+        self._nh_numbers = {}    # nh_id -> nh_number, for loaded NHs
+        self._load_locks = {}    # nh_number -> lock held while that NH loads
+        self._version = 0        # Incremented by every invalidation
+        db.add_change_listener(self._on_change)
+
+    def _load(self, nh_number: str) -> Optional[NHChainageIndex]:
+        """Load segments and details for an NH from the database"""
+        nh_rows = self.db.execute_query(
+            "SELECT nh_id, nh_number, nh_name FROM nh_master WHERE nh_number = %s",
+            (nh_number,)
+        )
+        if not nh_rows:
+            return None
+        nh = nh_rows[0]
+
+        segment_query = """
+            SELECT ns.segment_id, ns.segment_name, ns.start_chainage, ns.end_chainage,
+                   ns.status, ns.division_office_id, d.division_name, d.office_name
+            FROM nh_segments ns
+            JOIN divisions d ON ns.division_office_id = d.division_id
+            WHERE ns.nh_id = %s
+            ORDER BY ns.start_chainage
+        """
+        detail_query = """
+            SELECT rd.detail_id, rd.segment_id, rd.config_id, rc.config_name, rc.config_code,
+                   rd.start_chainage, rd.end_chainage, rd.remarks
+            FROM nh_road_details rd
+            JOIN nh_segments ns ON rd.segment_id = ns.segment_id
+            JOIN road_configurations rc ON rd.config_id = rc.config_id
+            WHERE ns.nh_id = %s
+            ORDER BY rd.start_chainage
+        """
+        segments = self.db.execute_query(segment_query, (nh['nh_id'],), raise_on_error=True)
+        details = self.db.execute_query(detail_query, (nh['nh_id'],), raise_on_error=True)
+
+        for row in segments + details:
+            row['start_chainage'] = float(row['start_chainage'])
+            row['end_chainage'] = float(row['end_chainage'])
+
+        return NHChainageIndex(nh, segments, details)
+
+    def get_index(self, nh_number: str) -> Optional[NHChainageIndex]:
+        """Get the index for an NH, loading it on first use"""
+        index = self._indexes.get(nh_number)
+        if index is not None:
+            return index
+
+        # Load outside _lock: a cold NH must not hold up lookups on the others
+        with self._lock:
+            load_lock = self._load_locks.setdefault(nh_number, threading.Lock())
+        with load_lock:
+            index = self._indexes.get(nh_number)
+            if index is not None:
+                return index
+            version = self._version
+            mark = change_mark(self.db)
+            index = self._load(nh_number)
+            if index is None:
+                return None
+            with self._lock:
+                # Not cached if a write invalidated indexes while it loaded
+                if self._version == version:
+                    self._add(nh_number, index, mark)
+        return index
+
+    def _add(self, nh_number: str, index: NHChainageIndex, mark: Dict):
+        self._indexes[nh_number] = index
+        self._marks[nh_number] = mark
+        self._nh_numbers[index.nh_id] = nh_number
+        for seg in index.segments:
+            self._segment_nh[seg['segment_id']] = nh_number
+        for det in index.details:
+            self._detail_nh[det['detail_id']] = nh_number
+
+    def lookup(self, nh_number: str, chainage: float) -> Optional[Dict]:
+        """
+        Find the segment, division and configuration at a chainage
+
+        Returns:
+            Lookup result dict, or None if the NH does not exist
+        """
+        index = self.get_index(nh_number)
+        if index is None:
+            return None
+        return index.lookup(chainage)
+
+    def lookup_many(self, nh_number: str, chainages: List[float]) -> Optional[List[Dict]]:
+        """Batch variant of lookup() for many chainages on the same NH"""
+        index = self.get_index(nh_number)
+        if index is None:
+            return None
+        return [index.lookup(c) for c in chainages]
+
+    def invalidate(self, nh_number: Optional[str] = None):
+        """Drop the cached index for one NH, or for all NHs"""
+        with self._lock:
+            self._version += 1
+            if nh_number is None:
+                self._indexes.clear()
+                self._segment_nh.clear()
+                self._detail_nh.clear()
+            else:
+                self._indexes.pop(nh_number, None)
+
+    def export_state(self) -> Optional[List[tuple]]:
+        """(nh_number, change mark, index) for each loaded NH, for warm_cache.WarmCache"""
+        with self._lock:
+            return [(nh_number, self._marks[nh_number], index)
+                    for nh_number, index in self._indexes.items()] or None
+
+    def import_state(self, state: List[tuple], current: Dict) -> bool:
+        """Take over the saved indexes of NHs unchanged since they were loaded"""
+        restored = 0
+        with self._lock:
+            for nh_number, mark, index in state:
+                if unchanged_since(mark, current) and nh_number not in self._indexes:
+                    self._add(nh_number, index, mark)
+                    restored += 1
+        return restored > 0
+
+    def _on_change(self, table_name: str, action: str,
+                   record_id: Optional[int], values: Dict):
+        """
+        Invalidate affected NHs when segments or details are modified
+
+        Only loaded NHs are affected; division, configuration and NH names are
+        copied into every index, so changes to those tables drop them all.
+        """
+        if table_name in ('divisions', 'road_configurations', 'nh_master'):
+            self.invalidate()
+            return
+
+        if table_name == 'nh_segments':
+            # The segment's current NH, and its new one on creation or re-assignment
+            affected = {self._segment_nh.get(record_id)}
+            if values.get('nh_id') is not None:
+                affected.add(self._nh_numbers.get(int(values['nh_id'])))
+        elif table_name == 'nh_road_details':
+            affected = {self._detail_nh.get(record_id)}
+            if values.get('segment_id') is not None:
+                affected.add(self._segment_nh.get(int(values['segment_id'])))
+        else:
+            return
+
+        for nh_number in affected - {None}:
+            self.invalidate(nh_number)
@@ -0,0 +1,279 @@
+"""
+National Highways Management System - Change Feed
+Tails audit_log by log_id and fans compact change events out to Server-Sent
+Events subscribers (/api/changes/stream), so pages can apply deltas instead
+of reloading everything.
+
+Writes made through this process wake the tailer immediately; writes from
+other processes are picked up on the next poll. Recent events are kept in a
+ring buffer so a reconnecting client (Last-Event-ID) receives what it missed.
+"""
+
+from typing import Optional, List, Dict, Iterator
+from collections import deque
+import json
+import threading
+import time
+
+from nh_management import NHDatabase
+
+
+# Entries this far below the high-water mark are re-read, so changes from
+# transactions that commit after a later log_id was seen are still sent
+TAIL_LOOKBACK = 200
+
+FEED_TABLES = ('nh_segments', 'nh_road_details')
+
+
+def _values(value) -> Dict:
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode('utf-8')
+    if isinstance(value, str):
+        return json.loads(value)
+    return value or {}
+
+
+def compact_event(entry: Dict) -> Dict:
+    """
+    Compact change event for an audit entry
+
+    INSERT events carry all fields, UPDATE events only the fields that
+    changed, DELETE events none (deleting a segment also deletes its details).
+    """
+    old = _values(entry.get('old_values'))
+    new = _values(entry.get('new_values'))
+    if entry['action'] == 'INSERT':
+        changes = new
+    elif entry['action'] == 'UPDATE':
+        changes = {key: value for key, value in new.items() if old.get(key) != value}
+    else:
+        changes = {}
+    created_at = entry.get('created_at')
+    return {
+        'id': entry['log_id'],
+        'table': entry['table_name'],
+        'record_id': entry['record_id'],
+        'action': entry['action'],
+        'changes': changes,
+        'at': created_at.isoformat() if hasattr(created_at, 'isoformat') else created_at
+    }
+
+
+def format_sse(event: Optional[Dict] = None, event_type: Optional[str] = None,
+               comment: Optional[str] = None, retry_ms: Optional[int] = None) -> str:
+    """One Server-Sent Events message"""
+    lines = []
+    if comment is not None:
+        lines.append(f": {comment}")
+    if retry_ms is not None:
+        lines.append(f"retry: {retry_ms}")
+    if event is not None:
+        if 'id' in event:
+            lines.append(f"id: {event['id']}")
+        if event_type:
+            lines.append(f"event: {event_type}")
+        lines.append(f"data: {json.dumps(event, separators=(',', ':'), default=str)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+class ChangeFeed:
+    """Audit log tailer with a replay buffer and filtered subscriptions"""
+
+    def __init__(self, db: NHDatabase, poll_interval: float = 1.0, buffer_size: int = 2000,
+                 pool: Optional[str] = None):
+        """
+        Args:
+            db: Database handle
+            poll_interval: Seconds between audit_log polls while anyone is subscribed
+            buffer_size: Recent events kept for reconnecting clients
+            pool: Database sub-pool the tailer draws connections from
+        """
+        self.db = db
+        self.poll_interval = poll_interval
+        self.pool = pool
+
+        self._events = deque(maxlen=buffer_size)  # (seq, event, nh_id, division_id)
+        self._seq = 0
+        self._seen = set()  # log_ids within TAIL_LOOKBACK of the high-water mark
+        self._high_water = None
+        self._segments = {}  # segment_id -> (nh_id, division_id)
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._subscribers = 0
+        self._thread = None
+        self.last_poll_error = None
+
+        db.add_change_listener(self._on_change)
+
+    def _on_change(self, table_name: str, action: str,
+                   record_id: Optional[int], values: Dict):
+        # audit_log: entries written after the change by the batched audit writer
+        if table_name in FEED_TABLES or table_name == 'audit_log':
+            self._wake.set()
+
+    # ------------------------------------------------------------------
+    # Tailing
+    # ------------------------------------------------------------------
+
+    def _locate(self, entries: List[Dict]) -> List[tuple]:
+        """(nh_id, division_id) of the segment each entry belongs to"""
+        for entry in entries:
+            if entry['table_name'] == 'nh_segments':
+                values = _values(entry.get('new_values')) or _values(entry.get('old_values'))
+                self._segments[entry['record_id']] = (values.get('nh_id'),
+                                                      values.get('division_office_id'))
+
+        def segment_of(entry):
+            if entry['table_name'] == 'nh_segments':
+                return entry['record_id']
+            values = _values(entry.get('new_values')) or _values(entry.get('old_values'))
+            return values.get('segment_id')
+
+        missing = {segment_of(e) for e in entries} - set(self._segments) - {None}
+        if missing:
+            rows = self.db.execute_query(f"""
+                SELECT segment_id, nh_id, division_office_id FROM nh_segments
+                WHERE segment_id IN ({', '.join(['%s'] * len(missing))})
+            """, tuple(missing), raise_on_error=True)
+            for row in rows:
+                self._segments[row['segment_id']] = (row['nh_id'], row['division_office_id'])
+        return [self._segments.get(segment_of(e), (None, None)) for e in entries]
+
+    def poll(self) -> int:
+        """Read new audit entries into the buffer; returns the number added"""
+        if self._high_water is None:
+            rows = self.db.execute_query(
+                "SELECT COALESCE(MAX(log_id), 0) AS log_id FROM audit_log", raise_on_error=True)
+            high_water = int(rows[0]['log_id'])
+            # Entries already committed below the mark are not news
+            rows = self.db.execute_query(
+                "SELECT log_id FROM audit_log WHERE log_id > %s AND log_id <= %s",
+                (high_water - TAIL_LOOKBACK, high_water), raise_on_error=True)
+            with self._cond:
+                self._high_water = high_water
+                self._seen = {row['log_id'] for row in rows}
+                self._cond.notify_all()
+            return 0
+
+        entries = self.db.execute_query(f"""
+            SELECT log_id, table_name, record_id, action, old_values, new_values, created_at
+            FROM audit_log
+            WHERE log_id > %s AND table_name IN ({', '.join(['%s'] * len(FEED_TABLES))})
+            ORDER BY log_id
+        """, (self._high_water - TAIL_LOOKBACK,) + FEED_TABLES, raise_on_error=True)
+        entries = [e for e in entries if e['log_id'] not in self._seen]
+        if not entries:
+            return 0
+
+        locations = self._locate(entries)
+        with self._cond:
+            for entry, (nh_id, division_id) in zip(entries, locations):
+                self._seq += 1
+                self._events.append((self._seq, compact_event(entry), nh_id, division_id))
+                self._seen.add(entry['log_id'])
+            self._high_water = max(self._high_water, entries[-1]['log_id'])
+            self._seen = {i for i in self._seen if i > self._high_water - TAIL_LOOKBACK}
+            self._cond.notify_all()
+        return len(entries)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._subscribers == 0:
+                    # Idle: changes are not followed, so nothing buffered can
+                    # be resumed from; the next subscriber starts afresh
+                    self._thread = None
+                    self._high_water = None
+                    self._events.clear()
+                    self._seen.clear()
+                    return
+            try:
+                with self.db.use_pool(self.pool):
+                    self.poll()
+                self.last_poll_error = None
+            except Exception as e:
+                self.last_poll_error = str(e)
+                print(f"Error polling change feed: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    # ------------------------------------------------------------------
+    # Subscriptions
+    # ------------------------------------------------------------------
+
+    def _position(self, last_event_id: Optional[int]) -> Optional[int]:
+        """Buffer sequence number to resume after (None if it has been dropped)"""
+        if last_event_id is None:
+            return self._seq
+        for seq, event, _, _ in self._events:
+            if event['id'] == last_event_id:
+                return seq
+        if self._high_water is not None and last_event_id >= self._high_water:
+            return self._seq
+        return None
+
+    def stream(self, nh_id: Optional[int] = None, division_id: Optional[int] = None,
+               last_event_id: Optional[int] = None, max_duration: float = 300,
+               keepalive: float = 15) -> Iterator[str]:
+        """
+        Yield SSE messages for changes matching the filters
+
+        Ends after max_duration (clients reconnect with Last-Event-ID). A
+        'reset' event is sent when the missed changes are no longer buffered;
+        the client should then reload its data.
+
+        Args:
+            nh_id: Only changes to segments (and their details) on this NH
+            division_id: Only changes to segments (and their details) in this division
+            last_event_id: id of the last event the client received
+            max_duration: Seconds before the stream is closed
+            keepalive: Seconds between keep-alive comments
+        """
+        with self._cond:
+            self._subscribers += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+                self._thread.start()
+        try:
+            yield format_sse(comment='connected', retry_ms=3000)
+            with self._cond:
+                if self._high_water is None:
+                    self._cond.wait(timeout=5)  # First poll
+                position = self._position(last_event_id)
+            if position is None:
+                yield format_sse({'reason': 'missed changes are no longer buffered'},
+                                 event_type='reset')
+                position = self._seq
+
+            deadline = time.monotonic() + max_duration
+            while time.monotonic() < deadline:
+                with self._cond:
+                    if not self._events or self._events[-1][0] <= position:
+                        self._cond.wait(timeout=min(keepalive, deadline - time.monotonic()))
+                    if self._events and self._events[0][0] > position + 1:
+                        position = None  # Fell behind the buffer
+                    else:
+                        pending = [item for item in self._events if item[0] > position]
+                if position is None:
+                    yield format_sse({'reason': 'too many changes to replay'}, event_type='reset')
+                    position = self._seq
+                    continue
+                messages = [format_sse(event, event_type='change')
+                            for seq, event, event_nh, event_division in pending
+                            if (nh_id is None or event_nh == nh_id)
+                            and (division_id is None or event_division == division_id)]
+                if pending:
+                    position = pending[-1][0]
+                yield ''.join(messages) if messages else format_sse(comment='keep-alive')
+        finally:
+            with self._cond:
+                self._subscribers -= 1
+
+    def status(self) -> Dict:
+        with self._cond:
+            return {
+                'subscribers': self._subscribers,
+                'buffered_events': len(self._events),
+                'high_water_log_id': self._high_water,
+                'last_poll_error': self.last_poll_error
+            }
@@ -0,0 +1,755 @@
+"""
+National Highways Management System - Columnar Snapshot
+Keeps nh_master, divisions, road_configurations, nh_segments and
+nh_road_details as typed NumPy column arrays (strings dictionary-encoded),
+persisted as .npy files that worker processes memory-map read-only.
+
+The snapshot is built once from the tables and then brought up to date by
+replaying audit_log (the audit triggers record full row images). The small
+dimension tables are not audited and are simply re-read on each refresh.
+ColumnarReportManager answers the standard reports from the snapshot with
+vectorised group-bys instead of joins on the OLTP database.
+"""
+
+from typing import Optional, List, Dict, Iterable
+from datetime import datetime
+from decimal import Decimal
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from nh_management import NHDatabase, ReportManager
+
+
+STORE_FORMAT_VERSION = 1
+
+# Chainages are DECIMAL(10, 3) km, so integer metres are exact
+METRES_PER_KM = 1000
+
+# Audit entries this far below the high-water mark are re-read, so rows from
+# transactions that committed after a later log_id was seen are not missed
+REPLAY_LOOKBACK = 1000
+
+# table -> [(column, source key, kind)]; kind is 'id', 'int', 'metres' or 'str'
+TABLES = {
+    'nh': [('nh_id', 'nh_id', 'id'),
+           ('nh_number', 'nh_number', 'str'),
+           ('nh_name', 'nh_name', 'str')],
+    'divisions': [('division_id', 'division_id', 'id'),
+                  ('division_name', 'division_name', 'str'),
+                  ('office_name', 'office_name', 'str')],
+    'configs': [('config_id', 'config_id', 'id'),
+                ('config_name', 'config_name', 'str'),
+                ('config_code', 'config_code', 'str'),
+                ('display_order', 'display_order', 'int')],
+    'segments': [('segment_id', 'segment_id', 'id'),
+                 ('nh_id', 'nh_id', 'id'),
+                 ('division_id', 'division_office_id', 'id'),
+                 ('start_m', 'start_chainage', 'metres'),
+                 ('end_m', 'end_chainage', 'metres'),
+                 ('segment_name', 'segment_name', 'str'),
+                 ('status', 'status', 'str')],
+    'details': [('detail_id', 'detail_id', 'id'),
+                ('segment_id', 'segment_id', 'id'),
+                ('config_id', 'config_id', 'id'),
+                ('start_m', 'start_chainage', 'metres'),
+                ('end_m', 'end_chainage', 'metres'),
+                ('remarks', 'remarks', 'str')]
+}
+
+DIMENSION_QUERIES = {
+    'nh': "SELECT nh_id, nh_number, nh_name FROM nh_master",
+    'divisions': "SELECT division_id, division_name, office_name FROM divisions",
+    'configs': "SELECT config_id, config_name, config_code, display_order FROM road_configurations"
+}
+
+FACT_QUERIES = {
+    'segments': """
+        SELECT segment_id, nh_id, division_office_id, start_chainage, end_chainage,
+               segment_name, status
+        FROM nh_segments
+    """,
+    'details': """
+        SELECT detail_id, segment_id, config_id, start_chainage, end_chainage, remarks
+        FROM nh_road_details
+    """
+}
+
+# Audited table -> (snapshot table, source key of the record id)
+AUDITED_TABLES = {
+    'nh_segments': ('segments', 'segment_id'),
+    'nh_road_details': ('details', 'detail_id')
+}
+
+
+def _km(metres: int) -> Decimal:
+    """Metres as a DECIMAL(10, 3)-style km value, as the database returns it"""
+    return Decimal(int(metres)).scaleb(-3)
+
+
+def _km_list(metres: np.ndarray) -> List[Decimal]:
+    return [Decimal(m).scaleb(-3) for m in metres.tolist()]
+
+
+def _round_metres(values: np.ndarray) -> np.ndarray:
+    """Round non-negative metre values half up, like ROUND(x, 3) on km"""
+    return np.floor(values + 0.5).astype(np.int64)
+
+
+def _sort_text(value: Optional[str]) -> str:
+    """Sort key approximating the case-insensitive collation"""
+    return (value or '').lower()
+
+
+def _lookup(keys: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Row position of each id within keys, or -1 where it is missing"""
+    if len(keys) == 0:
+        return np.full(len(ids), -1, dtype=np.int64)
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    idx = np.minimum(np.searchsorted(sorted_keys, ids), len(keys) - 1)
+    return np.where(sorted_keys[idx] == ids, order[idx], -1)
+
+
+def _rank(keys: List) -> np.ndarray:
+    """Rank of each entry when sorted by its key"""
+    ranks = np.empty(len(keys), dtype=np.int64)
+    ranks[sorted(range(len(keys)), key=lambda i: keys[i])] = np.arange(len(keys))
+    return ranks
+
+
+class StringDictionary:
+    """Append-only dictionary encoding strings as int32 codes (-1 for NULL)"""
+
+    def __init__(self, values: Optional[List[str]] = None):
+        self.values = list(values or [])
+        self._codes = {value: code for code, value in enumerate(self.values)}
+        self._decode_table = None
+
+    def copy(self) -> 'StringDictionary':
+        return StringDictionary(self.values)
+
+    def encode(self, items: Iterable) -> np.ndarray:
+        codes = []
+        for item in items:
+            if item is None:
+                codes.append(-1)
+                continue
+            item = str(item)
+            code = self._codes.get(item)
+            if code is None:
+                code = len(self.values)
+                self.values.append(item)
+                self._codes[item] = code
+            codes.append(code)
+        self._decode_table = None
+        return np.array(codes, dtype=np.int32)
+
+    def decode(self, codes: np.ndarray) -> List[Optional[str]]:
+        if self._decode_table is None:
+            self._decode_table = np.array(self.values + [None], dtype=object)
+        codes = np.asarray(codes)
+        return self._decode_table[np.where(codes < 0, len(self.values), codes)].tolist()
+
+
+def _encode_rows(rows: Iterable[Dict], table: str, strings: StringDictionary) -> Dict[str, np.ndarray]:
+    """Turn row dicts into the typed columns of a snapshot table"""
+    spec = TABLES[table]
+    values = {column: [] for column, _, _ in spec}
+    for row in rows:
+        for column, key, _ in spec:
+            values[column].append(row.get(key))
+
+    columns = {}
+    for column, _, kind in spec:
+        if kind == 'str':
+            columns[column] = strings.encode(values[column])
+        elif kind == 'metres':
+            columns[column] = np.rint(np.asarray(values[column], dtype=np.float64)
+                                      * METRES_PER_KM).astype(np.int64)
+        else:
+            dtype = np.int32 if kind == 'id' else np.int64
+            columns[column] = np.array([v or 0 for v in values[column]], dtype=dtype)
+    return columns
+
+
+class ColumnarSnapshot:
+    """One immutable version of the columnar tables"""
+
+    def __init__(self, tables: Dict[str, Dict[str, np.ndarray]], strings: StringDictionary,
+                 log_id: int, recent_log_ids: Iterable[int], dims_hash: str, built_at: str):
+        """
+        Args:
+            tables: table -> column -> array
+            strings: Dictionary for all string columns
+            log_id: audit_log high-water mark the snapshot reflects
+            recent_log_ids: Applied log_ids within REPLAY_LOOKBACK of log_id
+            dims_hash: Hash of the dimension rows the snapshot was built from
+            built_at: When this version was produced
+        """
+        self.tables = tables
+        self.strings = strings
+        self.log_id = log_id
+        self.recent_log_ids = set(recent_log_ids)
+        self.dims_hash = dims_hash
+        self.built_at = built_at
+        self._joins = None
+        self._lock = threading.Lock()
+
+    def column(self, table: str, column: str) -> np.ndarray:
+        return self.tables[table][column]
+
+    def decode(self, table: str, column: str, positions: Optional[np.ndarray] = None) -> List:
+        codes = self.tables[table][column]
+        return self.strings.decode(codes if positions is None else codes[positions])
+
+    def joins(self) -> Dict[str, np.ndarray]:
+        """Foreign keys resolved to row positions (-1 if unmatched), computed once"""
+        with self._lock:
+            if self._joins is None:
+                seg = self.tables['segments']
+                det = self.tables['details']
+                seg_nh = _lookup(self.column('nh', 'nh_id'), seg['nh_id'])
+                seg_div = _lookup(self.column('divisions', 'division_id'), seg['division_id'])
+                det_seg = _lookup(seg['segment_id'], det['segment_id'])
+                safe_seg = np.maximum(det_seg, 0)
+                self._joins = {
+                    'seg_nh': seg_nh,
+                    'seg_div': seg_div,
+                    'det_seg': det_seg,
+                    'det_nh': np.where(det_seg >= 0, seg_nh[safe_seg] if len(seg_nh) else -1, -1),
+                    'det_div': np.where(det_seg >= 0, seg_div[safe_seg] if len(seg_div) else -1, -1),
+                    'det_cfg': _lookup(self.column('configs', 'config_id'), det['config_id'])
+                }
+            return self._joins
+
+
+def write_snapshot(snapshot: ColumnarSnapshot, path: str, extra_meta: Optional[Dict] = None):
+    """
+    Write a snapshot as a directory of .npy column files
+
+    The directory appears atomically (written as path.tmp, then renamed).
+
+    Args:
+        snapshot: Snapshot to write
+        path: Target directory (must not exist)
+        extra_meta: Additional fields for meta.json
+    """
+    tmp_path = path + '.tmp'
+    try:
+        os.makedirs(tmp_path)
+        for table, columns in snapshot.tables.items():
+            for column, array in columns.items():
+                np.save(os.path.join(tmp_path, f"{table}.{column}.npy"),
+                        np.ascontiguousarray(array))
+        with open(os.path.join(tmp_path, 'strings.json'), 'w', encoding='utf-8') as f:
+            json.dump(snapshot.strings.values, f)
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump(dict(extra_meta or {},
+                           version=STORE_FORMAT_VERSION,
+                           log_id=snapshot.log_id,
+                           recent_log_ids=sorted(snapshot.recent_log_ids),
+                           dims_hash=snapshot.dims_hash,
+                           built_at=snapshot.built_at), f)
+        os.rename(tmp_path, path)
+    except OSError:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+
+def read_snapshot_meta(path: str) -> Optional[Dict]:
+    """meta.json of a written snapshot, or None if its format is outdated"""
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    return meta if meta.get('version') == STORE_FORMAT_VERSION else None
+
+
+def read_snapshot(path: str) -> Optional[ColumnarSnapshot]:
+    """Memory-map a snapshot written by write_snapshot() (read-only)"""
+    meta = read_snapshot_meta(path)
+    if meta is None:
+        return None
+    with open(os.path.join(path, 'strings.json'), encoding='utf-8') as f:
+        strings = StringDictionary(json.load(f))
+    tables = {
+        table: {column: np.load(os.path.join(path, f"{table}.{column}.npy"),
+                                mmap_mode='r', allow_pickle=False)
+                for column, _, _ in spec}
+        for table, spec in TABLES.items()
+    }
+    return ColumnarSnapshot(tables, strings, meta['log_id'], meta['recent_log_ids'],
+                            meta['dims_hash'], meta['built_at'])
+
+
+class ColumnarStore:
+    """Builds, refreshes, persists and memory-maps the columnar snapshot"""
+
+    # audit_log: entries written after the change by the batched audit writer
+    WATCHED_TABLES = ('nh_segments', 'nh_road_details', 'nh_master',
+                      'divisions', 'road_configurations', 'audit_log')
+
+    def __init__(self, db: NHDatabase, directory: Optional[str] = None,
+                 max_staleness: float = 5.0):
+        """
+        Args:
+            db: Database handle
+            directory: Where snapshot versions are stored
+                       (default: COLUMNAR_SNAPSHOT_DIR or cache/columnar)
+            max_staleness: Seconds a snapshot is served before audit_log is
+                           checked again (local writes force an earlier check)
+        """
+        self.db = db
+        self.directory = directory or os.getenv('COLUMNAR_SNAPSHOT_DIR',
+                                                os.path.join('cache', 'columnar'))
+        self.max_staleness = max_staleness
+        self._snapshot = None
+        self._checked = 0.0
+        self._dirty = False
+        self._lock = threading.Lock()
+        db.add_change_listener(self._on_change)
+
+    # ------------------------------------------------------------------
+    # Access
+    # ------------------------------------------------------------------
+
+    def get(self) -> Optional[ColumnarSnapshot]:
+        """Get the current snapshot, refreshing it first if it may be stale"""
+        with self._lock:
+            if (self._snapshot is None or self._dirty
+                    or time.monotonic() - self._checked >= self.max_staleness):
+                try:
+                    self._refresh()
+                except Exception as e:
+                    print(f"Error refreshing columnar snapshot: {e}")
+            return self._snapshot
+
+    def _on_change(self, table_name: str, action: str,
+                   record_id: Optional[int], values: Dict):
+        if table_name in self.WATCHED_TABLES:
+            self._dirty = True
+
+    # ------------------------------------------------------------------
+    # Building and refreshing
+    # ------------------------------------------------------------------
+
+    def _load_dimensions(self):
+        dims = {table: self.db.execute_query(query, raise_on_error=True)
+                for table, query in DIMENSION_QUERIES.items()}
+        dims_hash = hashlib.sha1(json.dumps(dims, default=str, sort_keys=True)
+                                 .encode('utf-8')).hexdigest()
+        return dims, dims_hash
+
+    def load_events(self, after_log_id: int, until: Optional[datetime] = None) -> List[Dict]:
+        """
+        Segment and detail audit entries after a log_id, in log_id order
+
+        Args:
+            after_log_id: Exclusive lower bound
+            until: Only entries created at or before this time
+        """
+        query = """
+            SELECT log_id, table_name, record_id, action, new_values
+            FROM audit_log
+            WHERE log_id > %s AND table_name IN ('nh_segments', 'nh_road_details')
+        """
+        params = [max(after_log_id, 0)]
+        if until is not None:
+            query += " AND created_at <= %s"
+            params.append(until)
+        query += " ORDER BY log_id"
+        return self.db.execute_query(query, tuple(params), raise_on_error=True)
+
+    def build(self) -> ColumnarSnapshot:
+        """Build a full snapshot from the tables"""
+        rows = self.db.execute_query(
+            "SELECT COALESCE(MAX(log_id), 0) AS log_id FROM audit_log", raise_on_error=True)
+        log_id = int(rows[0]['log_id'])
+        # Entries already visible are reflected by the table reads below;
+        # any that commit later below log_id are picked up by the lookback
+        seen = [e['log_id'] for e in self.load_events(log_id - REPLAY_LOOKBACK)
+                if e['log_id'] <= log_id]
+
+        strings = StringDictionary()
+        dims, dims_hash = self._load_dimensions()
+        tables = {table: _encode_rows(rows, table, strings) for table, rows in dims.items()}
+        for table, query in FACT_QUERIES.items():
+            tables[table] = _encode_rows(self.db.stream_query(query), table, strings)
+        return ColumnarSnapshot(tables, strings, log_id, seen, dims_hash,
+                                datetime.now().isoformat())
+
+    def apply_events(self, base: ColumnarSnapshot, events: List[Dict],
+                     dims: Optional[Dict] = None, dims_hash: Optional[str] = None) -> ColumnarSnapshot:
+        """Derive a new snapshot with audit events (and new dimensions) applied"""
+        strings = base.strings.copy()
+        tables = dict(base.tables)
+
+        # Last image per record wins; None marks a deletion
+        changes = {'segments': {}, 'details': {}}
+        for event in events:
+            table, id_key = AUDITED_TABLES[event['table_name']]
+            if event['action'] == 'DELETE':
+                changes[table][event['record_id']] = None
+            else:
+                values = event['new_values']
+                if isinstance(values, (str, bytes)):
+                    values = json.loads(values)
+                changes[table][event['record_id']] = dict(values, **{id_key: event['record_id']})
+
+        # ON DELETE CASCADE removes details without firing their audit triggers
+        deleted_segments = np.array([sid for sid, row in changes['segments'].items()
+                                     if row is None], dtype=np.int64)
+
+        for table, id_key in (('segments', 'segment_id'), ('details', 'detail_id')):
+            table_changes = changes[table]
+            if not table_changes and not (table == 'details' and len(deleted_segments)):
+                continue
+            columns = tables[table]
+            keep = ~np.isin(columns[id_key], np.fromiter(table_changes, dtype=np.int64,
+                                                          count=len(table_changes)))
+            added = _encode_rows([row for row in table_changes.values() if row is not None],
+                                 table, strings)
+            columns = {name: np.concatenate([array[keep], added[name]])
+                       for name, array in columns.items()}
+            if table == 'details' and len(deleted_segments):
+                # After appending: a detail added in this batch may belong to
+                # a segment deleted later in it
+                keep = ~np.isin(columns['segment_id'], deleted_segments)
+                columns = {name: array[keep] for name, array in columns.items()}
+            tables[table] = columns
+
+        if dims is not None:
+            for table, rows in dims.items():
+                tables[table] = _encode_rows(rows, table, strings)
+
+        log_id = max([base.log_id] + [e['log_id'] for e in events])
+        recent = {i for i in base.recent_log_ids | {e['log_id'] for e in events}
+                  if i > log_id - REPLAY_LOOKBACK}
+        return ColumnarSnapshot(tables, strings, log_id, recent,
+                                dims_hash or base.dims_hash, datetime.now().isoformat())
+
+    def _refresh(self):
+        self._dirty = False
+        self._checked = time.monotonic()
+
+        # Another worker process may already have published a newer version
+        disk = self._load_current()
+        if disk is not None and (self._snapshot is None or disk.log_id > self._snapshot.log_id):
+            self._snapshot = disk
+
+        if self._snapshot is None:
+            snapshot = self.build()
+        else:
+            base = self._snapshot
+            events = [e for e in self.load_events(base.log_id - REPLAY_LOOKBACK)
+                      if e['log_id'] not in base.recent_log_ids]
+            dims, dims_hash = self._load_dimensions()
+            if not events and dims_hash == base.dims_hash:
+                return
+            snapshot = self.apply_events(base, events,
+                                         dims if dims_hash != base.dims_hash else None, dims_hash)
+
+        self._snapshot = snapshot
+        self._save(snapshot)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _current_path(self) -> str:
+        return os.path.join(self.directory, 'CURRENT')
+
+    def _save(self, snapshot: ColumnarSnapshot):
+        """Write a snapshot version and point CURRENT at it"""
+        name = f"v{snapshot.log_id}-{os.getpid()}-{int(time.time() * 1000)}"
+        try:
+            write_snapshot(snapshot, os.path.join(self.directory, name))
+
+            pointer_tmp = f"{self._current_path()}.{os.getpid()}.tmp"
+            with open(pointer_tmp, 'w') as f:
+                f.write(name)
+            os.replace(pointer_tmp, self._current_path())
+            self._prune(name)
+        except OSError as e:
+            print(f"Error saving columnar snapshot: {e}")
+
+    def _prune(self, current: str, keep: int = 2):
+        """Remove old versions (readers that still map them keep their pages)"""
+        versions = sorted(
+            (entry for entry in os.scandir(self.directory)
+             if entry.is_dir() and entry.name.startswith('v')
+             and not entry.name.endswith('.tmp')),
+            key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in versions[keep:]:
+            if entry.name != current:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def _load_current(self) -> Optional[ColumnarSnapshot]:
+        """Memory-map the version CURRENT points to, if any"""
+        try:
+            with open(self._current_path()) as f:
+                name = f.read().strip()
+            meta = read_snapshot_meta(os.path.join(self.directory, name))
+            if meta is None or (self._snapshot is not None
+                                and meta['log_id'] <= self._snapshot.log_id):
+                return None
+            return read_snapshot(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable columnar snapshot: {e}")
+            return None
+
+
+class ColumnarReportManager(ReportManager):
+    """ReportManager that answers the standard reports from a ColumnarSnapshot
+
+    Falls back to the database (views / summary tables) for streamed exports,
+    reports the snapshot does not cover, and whenever no snapshot is available.
+    """
+
+    def __init__(self, db: NHDatabase, store: ColumnarStore):
+        super().__init__(db)
+        self.store = store
+
+    def _columns(self, stream: bool = False) -> Optional[ColumnarSnapshot]:
+        # Streamed exports keep reading the database cursor row by row
+        return None if stream else self.store.get()
+
+    def get_summary_status(self, report: str) -> Dict:
+        """Data source and freshness of a report"""
+        snap = self.store.get()
+        if snap is None:
+            return super().get_summary_status(report)
+        return {'source': 'columnar_snapshot', 'refreshed_at': snap.built_at,
+                'log_id': snap.log_id}
+
+    def _matching(self, snap: ColumnarSnapshot, table: str, column: str, value: str) -> np.ndarray:
+        """Row positions of a dimension table whose column equals value"""
+        names = snap.decode(table, column)
+        return np.array([i for i, name in enumerate(names)
+                         if _sort_text(name) == _sort_text(value)], dtype=np.int64)
+
+    def get_nh_config_summary(self, nh_number: Optional[str] = None,
+                              stream: bool = False) -> List[Dict]:
+        """Get NH configuration summary (stream=True yields rows instead)"""
+        snap = self._columns(stream)
+        if snap is None:
+            return super().get_nh_config_summary(nh_number, stream)
+
+        joins = snap.joins()
+        mask = (joins['det_nh'] >= 0) & (joins['det_cfg'] >= 0)
+        if nh_number:
+            mask &= np.isin(joins['det_nh'], self._matching(snap, 'nh', 'nh_number', nh_number))
+        nh_pos = joins['det_nh'][mask]
+        cfg_pos = joins['det_cfg'][mask]
+        length = (snap.column('details', 'end_m') - snap.column('details', 'start_m'))[mask]
+
+        n_configs = len(snap.column('configs', 'config_id'))
+        keys, inverse = np.unique(nh_pos * n_configs + cfg_pos, return_inverse=True)
+        totals = np.bincount(inverse, weights=length).astype(np.int64)
+        counts = np.bincount(inverse)
+
+        nh_numbers = snap.decode('nh', 'nh_number')
+        nh_names = snap.decode('nh', 'nh_name')
+        config_names = snap.decode('configs', 'config_name')
+        rows = [{
+            'nh_number': nh_numbers[key // n_configs],
+            'nh_name': nh_names[key // n_configs],
+            'config_name': config_names[key % n_configs],
+            'total_length': _km(total),
+            'number_of_sections': int(count)
+        } for key, total, count in zip(keys.tolist(), totals.tolist(), counts.tolist())]
+        rows.sort(key=lambda r: (_sort_text(r['nh_number']), _sort_text(r['config_name'])))
+        return rows
+
+    def get_division_summary(self, division_name: Optional[str] = None,
+                             stream: bool = False) -> List[Dict]:
+        """Get division-wise summary (stream=True yields rows instead)"""
+        snap = self._columns(stream)
+        if snap is None:
+            return super().get_division_summary(division_name, stream)
+
+        joins = snap.joins()
+        mask = (joins['seg_nh'] >= 0) & (joins['seg_div'] >= 0)
+        if division_name:
+            mask &= np.isin(joins['seg_div'],
+                            self._matching(snap, 'divisions', 'division_name', division_name))
+        div_pos = joins['seg_div'][mask]
+        nh_pos = joins['seg_nh'][mask]
+        length = (snap.column('segments', 'end_m') - snap.column('segments', 'start_m'))[mask]
+
+        n_nhs = len(snap.column('nh', 'nh_id'))
+        keys, inverse = np.unique(div_pos * n_nhs + nh_pos, return_inverse=True)
+        totals = np.bincount(inverse, weights=length).astype(np.int64)
+        counts = np.bincount(inverse)
+
+        division_names = snap.decode('divisions', 'division_name')
+        office_names = snap.decode('divisions', 'office_name')
+        nh_numbers = snap.decode('nh', 'nh_number')
+        rows = [{
+            'division_name': division_names[key // n_nhs],
+            'office_name': office_names[key // n_nhs],
+            'nh_number': nh_numbers[key % n_nhs],
+            'segment_count': int(count),
+            'nh_count': 1,
+            'total_length': _km(total)
+        } for key, total, count in zip(keys.tolist(), totals.tolist(), counts.tolist())]
+        rows.sort(key=lambda r: (_sort_text(r['division_name']), _sort_text(r['office_name']),
+                                 _sort_text(r['nh_number'])))
+        return rows
+
+    def get_config_statistics(self, stream: bool = False) -> List[Dict]:
+        """Get configuration-wise statistics (stream=True yields rows instead)"""
+        snap = self._columns(stream)
+        if snap is None:
+            return super().get_config_statistics(stream)
+
+        joins = snap.joins()
+        n_configs = len(snap.column('configs', 'config_id'))
+        n_nhs = len(snap.column('nh', 'nh_id'))
+        mask = (joins['det_cfg'] >= 0) & (joins['det_seg'] >= 0)
+        cfg_pos = joins['det_cfg'][mask]
+        nh_pos = joins['det_nh'][mask]
+        length = (snap.column('details', 'end_m') - snap.column('details', 'start_m'))[mask]
+
+        counts = np.bincount(cfg_pos, minlength=n_configs)
+        totals = np.bincount(cfg_pos, weights=length, minlength=n_configs).astype(np.int64)
+        minimums = np.full(n_configs, np.iinfo(np.int64).max, dtype=np.int64)
+        maximums = np.zeros(n_configs, dtype=np.int64)
+        np.minimum.at(minimums, cfg_pos, length)
+        np.maximum.at(maximums, cfg_pos, length)
+        averages = _round_metres(totals / np.maximum(counts, 1))
+
+        with_nh = nh_pos >= 0
+        pairs = np.unique(cfg_pos[with_nh] * max(n_nhs, 1) + nh_pos[with_nh])
+        highways = np.bincount(pairs // max(n_nhs, 1), minlength=n_configs)
+
+        names = snap.decode('configs', 'config_name')
+        codes = snap.decode('configs', 'config_code')
+        display_order = snap.column('configs', 'display_order').tolist()
+        rows = []
+        for i in range(n_configs):
+            has_sections = counts[i] > 0
+            rows.append({
+                'config_name': names[i],
+                'config_code': codes[i],
+                'display_order': display_order[i],
+                'num_highways': int(highways[i]),
+                'num_sections': int(counts[i]),
+                'total_length': _km(totals[i]) if has_sections else None,
+                'avg_section_length': _km(averages[i]) if has_sections else None,
+                'min_section_length': _km(minimums[i]) if has_sections else None,
+                'max_section_length': _km(maximums[i]) if has_sections else None
+            })
+        rows.sort(key=lambda r: _sort_text(r['config_name']))
+        return rows
+
+    def get_config_details(self, config_id: int, stream: bool = False) -> List[Dict]:
+        """Get detailed chainage report for a specific configuration (stream=True yields rows instead)"""
+        snap = self._columns(stream)
+        if snap is None:
+            return super().get_config_details(config_id, stream)
+
+        joins = snap.joins()
+        det_seg = joins['det_seg']
+        mask = ((snap.column('details', 'config_id') == int(config_id))
+                & (joins['det_nh'] >= 0) & (joins['det_div'] >= 0))
+        detail_pos = np.flatnonzero(mask)
+        seg_pos = det_seg[detail_pos]
+        nh_pos = joins['det_nh'][detail_pos]
+        div_pos = joins['det_div'][detail_pos]
+
+        nh_rank = _rank([_sort_text(n) for n in snap.decode('nh', 'nh_number')])
+        start = snap.column('details', 'start_m')[detail_pos]
+        end = snap.column('details', 'end_m')[detail_pos]
+        order = np.lexsort((start, snap.column('segments', 'start_m')[seg_pos], nh_rank[nh_pos]))
+        detail_pos, seg_pos, nh_pos, div_pos = (detail_pos[order], seg_pos[order],
+                                                nh_pos[order], div_pos[order])
+        start, end = start[order], end[order]
+
+        columns = {
+            'nh_number': snap.decode('nh', 'nh_number', nh_pos),
+            'segment_name': snap.decode('segments', 'segment_name', seg_pos),
+            'start_chainage': _km_list(start),
+            'end_chainage': _km_list(end),
+            'length_km': _km_list(end - start),
+            'remarks': snap.decode('details', 'remarks', detail_pos),
+            'division_name': snap.decode('divisions', 'division_name', div_pos),
+            'office_name': snap.decode('divisions', 'office_name', div_pos)
+        }
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    def get_division_wise_details(self, nh_number: Optional[str] = None, config_id: Optional[int] = None,
+                                  stream: bool = False) -> List[Dict]:
+        """Get division-wise detailed report with optional NH and config filters (stream=True yields rows instead)"""
+        snap = self._columns(stream)
+        if snap is None:
+            return super().get_division_wise_details(nh_number, config_id, stream)
+
+        joins = snap.joins()
+        seg_ok = (joins['seg_nh'] >= 0) & (joins['seg_div'] >= 0)
+        if nh_number and nh_number != 'ALL':
+            seg_ok &= np.isin(joins['seg_nh'], self._matching(snap, 'nh', 'nh_number', nh_number))
+
+        # segments LEFT JOIN details: one row per detail, one per bare segment
+        det_seg = joins['det_seg']
+        det_ok = det_seg >= 0
+        det_ok[det_ok] = seg_ok[det_seg[det_ok]]
+        if config_id:
+            det_ok &= snap.column('details', 'config_id') == int(config_id)
+            detail_pos = np.flatnonzero(det_ok)
+            seg_pos = det_seg[detail_pos]
+        else:
+            n_segments = len(seg_ok)
+            has_details = np.bincount(det_seg[det_seg >= 0], minlength=n_segments) > 0
+            bare = np.flatnonzero(seg_ok & ~has_details)
+            detail_pos = np.concatenate([np.flatnonzero(det_ok), np.full(len(bare), -1)])
+            seg_pos = np.concatenate([det_seg[det_ok], bare])
+
+        has_detail = detail_pos >= 0
+        safe_detail = np.maximum(detail_pos, 0)
+        nh_pos = joins['seg_nh'][seg_pos]
+        div_pos = joins['seg_div'][seg_pos]
+        seg_start = snap.column('segments', 'start_m')[seg_pos]
+        seg_end = snap.column('segments', 'end_m')[seg_pos]
+        det_start = np.where(has_detail, snap.column('details', 'start_m')[safe_detail], -1)
+        det_end = np.where(has_detail, snap.column('details', 'end_m')[safe_detail], -1)
+
+        div_rank = _rank(list(zip([_sort_text(n) for n in snap.decode('divisions', 'division_name')],
+                                  [_sort_text(n) for n in snap.decode('divisions', 'office_name')])))
+        nh_rank = _rank([_sort_text(n) for n in snap.decode('nh', 'nh_number')])
+        order = np.lexsort((det_start, seg_start, nh_rank[nh_pos], div_rank[div_pos]))
+        (detail_pos, has_detail, safe_detail, seg_pos, nh_pos, div_pos,
+         seg_start, seg_end, det_start, det_end) = (
+            a[order] for a in (detail_pos, has_detail, safe_detail, seg_pos, nh_pos, div_pos,
+                               seg_start, seg_end, det_start, det_end))
+
+        cfg_pos = np.where(has_detail, joins['det_cfg'][safe_detail], -1)
+        config_names = snap.decode('configs', 'config_name')
+        has = has_detail.tolist()
+        config_start = _km_list(det_start)
+        config_end = _km_list(det_end)
+        config_length = _km_list(det_end - det_start)
+        remarks = snap.decode('details', 'remarks', safe_detail)
+
+        columns = {
+            'division_name': snap.decode('divisions', 'division_name', div_pos),
+            'office_name': snap.decode('divisions', 'office_name', div_pos),
+            'nh_number': snap.decode('nh', 'nh_number', nh_pos),
+            'nh_name': snap.decode('nh', 'nh_name', nh_pos),
+            'segment_name': snap.decode('segments', 'segment_name', seg_pos),
+            'segment_start': _km_list(seg_start),
+            'segment_end': _km_list(seg_end),
+            'segment_length': _km_list(seg_end - seg_start),
+            'config_name': [config_names[c] if c >= 0 else None for c in cfg_pos.tolist()],
+            'config_start': [v if h else None for v, h in zip(config_start, has)],
+            'config_end': [v if h else None for v, h in zip(config_end, has)],
+            'config_length': [v if h else None for v, h in zip(config_length, has)],
+            'remarks': [v if h else None for v, h in zip(remarks, has)]
+        }
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
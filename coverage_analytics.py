@@ -0,0 +1,268 @@
+"""
+National Highways Management System - Coverage Analytics
+Vectorised segment coverage and gap analysis using NumPy.
+
+Unlike the GROUP BY coverage query in validation_queries.sql (#5), overlapping
+road details are merged before measuring, so covered length never exceeds the
+segment length and overlaps are reported separately.
+"""
+
+from typing import Optional, List, Dict
+import threading
+
+import numpy as np
+
+from nh_management import NHDatabase
+
+
+# Chainages are DECIMAL(10, 3) km, so integer metres are exact
+METRES_PER_KM = 1000
+
+
+def _to_metres(values) -> np.ndarray:
+    """Convert an iterable of km chainages to int64 metres"""
+    return np.rint(np.asarray(values, dtype=np.float64) * METRES_PER_KM).astype(np.int64)
+
+
+def _to_km(metres) -> float:
+    """Convert metres back to km rounded like the database (3 dp)"""
+    return round(float(metres) / METRES_PER_KM, 3)
+
+
+def union_runs(group: np.ndarray, start: np.ndarray, end: np.ndarray):
+    """
+    Merge overlapping or touching intervals within each group in one pass
+
+    Groups are shifted into disjoint ranges so a single running maximum of
+    interval ends can detect where a new merged run begins.
+
+    Args:
+        group: Non-negative int64 group id per interval
+        start: int64 interval starts
+        end: int64 interval ends
+
+    Returns:
+        Tuple (run_group, run_start, run_end) sorted by group then start
+    """
+    if len(start) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+
+    order = np.lexsort((start, group))
+    group, start, end = group[order], start[order], end[order]
+
+    base = start.min()
+    span = int(end.max() - base) + 1
+    shifted_start = start - base + group * span
+    shifted_end = end - base + group * span
+
+    running_end = np.maximum.accumulate(shifted_end)
+    previous_end = np.empty_like(running_end)
+    previous_end[0] = -1
+    previous_end[1:] = running_end[:-1]
+
+    run_index = np.flatnonzero(shifted_start > previous_end)
+    run_end = np.maximum.reduceat(end, run_index)
+    return group[run_index], start[run_index], run_end
+
+
+class CoverageDataset:
+    """Segments and road details loaded into NumPy arrays"""
+
+    def __init__(self, segments: List[Dict], details: List[Dict], configs: List[Dict]):
+        self.segments = segments
+        self.segment_ids = np.array([s['segment_id'] for s in segments], dtype=np.int64)
+        self.segment_start = _to_metres([s['start_chainage'] for s in segments])
+        self.segment_end = _to_metres([s['end_chainage'] for s in segments])
+
+        self.configs = configs
+        config_pos = {c['config_id']: i for i, c in enumerate(configs)}
+        segment_pos = {sid: i for i, sid in enumerate(self.segment_ids.tolist())}
+
+        details = [d for d in details
+                   if d['segment_id'] in segment_pos and d['config_id'] in config_pos]
+        self.detail_segment = np.array([segment_pos[d['segment_id']] for d in details],
+                                       dtype=np.int64)
+        self.detail_config = np.array([config_pos[d['config_id']] for d in details],
+                                      dtype=np.int64)
+
+        # Clip details to their segment so out-of-bounds rows cannot inflate coverage
+        start = _to_metres([d['start_chainage'] for d in details])
+        end = _to_metres([d['end_chainage'] for d in details])
+        if len(details):
+            start = np.maximum(start, self.segment_start[self.detail_segment])
+            end = np.minimum(end, self.segment_end[self.detail_segment])
+        valid = end > start
+        self.detail_start = start[valid]
+        self.detail_end = end[valid]
+        self.detail_segment = self.detail_segment[valid]
+        self.detail_config = self.detail_config[valid]
+
+
+class CoverageAnalytics:
+    """Exact union coverage, gaps and per-config lengths for every segment"""
+
+    def __init__(self, db: NHDatabase):
+        self.db = db
+        self._lock = threading.Lock()
+        self._dataset = None
+        self._result = None
+        db.add_change_listener(self._on_change)
+
+    def _load(self) -> CoverageDataset:
+        """Bulk load segments, details and configurations"""
+        segments = self.db.execute_query("""
+            SELECT ns.segment_id, ns.segment_name, ns.start_chainage, ns.end_chainage,
+                   ns.status, ns.division_office_id, nm.nh_number,
+                   d.division_name, d.office_name
+            FROM nh_segments ns
+            JOIN nh_master nm ON ns.nh_id = nm.nh_id
+            JOIN divisions d ON ns.division_office_id = d.division_id
+            ORDER BY nm.nh_number, ns.start_chainage
+        """, raise_on_error=True)
+        details = self.db.execute_query(
+            "SELECT segment_id, config_id, start_chainage, end_chainage FROM nh_road_details",
+            raise_on_error=True
+        )
+        configs = self.db.execute_query(
+            "SELECT config_id, config_name, config_code FROM road_configurations ORDER BY display_order",
+            raise_on_error=True
+        )
+        return CoverageDataset(segments, details, configs)
+
+    def _compute(self, ds: CoverageDataset) -> List[Dict]:
+        """Compute coverage rows for all segments in one vectorised pass"""
+        n_segments = len(ds.segments)
+        n_configs = len(ds.configs)
+        segment_length = ds.segment_end - ds.segment_start
+
+        # Union coverage per segment
+        run_group, run_start, run_end = union_runs(ds.detail_segment, ds.detail_start,
+                                                   ds.detail_end)
+        covered = np.bincount(run_group, weights=run_end - run_start, minlength=n_segments)
+        raw = np.bincount(ds.detail_segment, weights=ds.detail_end - ds.detail_start,
+                          minlength=n_segments)
+
+        # Union length per (segment, config) so duplicate configs are not double counted
+        key = ds.detail_segment * max(n_configs, 1) + ds.detail_config
+        key_group, key_start, key_end = union_runs(key, ds.detail_start, ds.detail_end)
+        config_lengths = np.bincount(key_group, weights=key_end - key_start,
+                                     minlength=n_segments * max(n_configs, 1))
+        config_lengths = config_lengths.reshape(n_segments, max(n_configs, 1))
+
+        # Uncovered intervals: before each run, after the last run, whole empty segments
+        first = np.ones(len(run_group), dtype=bool)
+        first[1:] = run_group[1:] != run_group[:-1]
+        last = np.ones(len(run_group), dtype=bool)
+        last[:-1] = run_group[1:] != run_group[:-1]
+
+        previous_end = np.empty_like(run_end)
+        if len(run_end):
+            previous_end[1:] = run_end[:-1]
+            previous_end[first] = ds.segment_start[run_group[first]]
+
+        has_runs = np.zeros(n_segments, dtype=bool)
+        has_runs[run_group] = True
+        empty = np.flatnonzero(~has_runs)
+
+        gap_group = np.concatenate([run_group, run_group[last], empty])
+        gap_start = np.concatenate([previous_end, run_end[last], ds.segment_start[empty]])
+        gap_end = np.concatenate([run_start, ds.segment_end[run_group[last]],
+                                  ds.segment_end[empty]])
+        keep = gap_end > gap_start
+        gap_group, gap_start, gap_end = gap_group[keep], gap_start[keep], gap_end[keep]
+        order = np.lexsort((gap_start, gap_group))
+        gap_group, gap_start, gap_end = gap_group[order], gap_start[order], gap_end[order]
+        bounds = np.searchsorted(gap_group, np.arange(n_segments + 1))
+
+        rows = []
+        for i, segment in enumerate(ds.segments):
+            length = int(segment_length[i])
+            covered_m = int(covered[i])
+            rows.append({
+                'segment_id': segment['segment_id'],
+                'segment_name': segment['segment_name'],
+                'nh_number': segment['nh_number'],
+                'division_office_id': segment['division_office_id'],
+                'division_name': segment['division_name'],
+                'office_name': segment['office_name'],
+                'status': segment['status'],
+                'start_chainage': _to_km(ds.segment_start[i]),
+                'end_chainage': _to_km(ds.segment_end[i]),
+                'segment_length': _to_km(length),
+                'covered_length': _to_km(covered_m),
+                'uncovered_length': _to_km(length - covered_m),
+                'overlap_length': _to_km(raw[i] - covered_m),
+                'coverage_percentage': round(covered_m / length * 100, 2) if length else 0.0,
+                'uncovered_intervals': [
+                    [_to_km(s), _to_km(e)]
+                    for s, e in zip(gap_start[bounds[i]:bounds[i + 1]],
+                                    gap_end[bounds[i]:bounds[i + 1]])
+                ],
+                'config_lengths': {
+                    ds.configs[c]['config_name']: _to_km(config_lengths[i, c])
+                    for c in np.flatnonzero(config_lengths[i])
+                }
+            })
+        return rows
+
+    def _get_rows(self) -> List[Dict]:
+        """Get cached coverage rows, rebuilding the dataset if data changed"""
+        rows = self._result
+        if rows is not None:
+            return rows
+
+        with self._lock:
+            if self._result is None:
+                if self._dataset is None:
+                    self._dataset = self._load()
+                self._result = self._compute(self._dataset)
+            return self._result
+
+    def get_coverage(self, nh_number: Optional[str] = None,
+                     division_name: Optional[str] = None) -> Dict:
+        """
+        Get segment coverage with optional NH and division filters
+
+        Returns:
+            Dict with per-segment rows, per-config totals and an overall summary
+        """
+        rows = [r for r in self._get_rows()
+                if (not nh_number or nh_number == 'ALL' or r['nh_number'] == nh_number)
+                and (not division_name or r['division_name'] == division_name)]
+
+        total = sum(r['segment_length'] for r in rows)
+        covered = sum(r['covered_length'] for r in rows)
+        config_totals = {}
+        for r in rows:
+            for name, length in r['config_lengths'].items():
+                config_totals[name] = config_totals.get(name, 0) + length
+
+        return {
+            'summary': {
+                'segment_count': len(rows),
+                'total_length': round(total, 3),
+                'covered_length': round(covered, 3),
+                'uncovered_length': round(total - covered, 3),
+                'overlap_length': round(sum(r['overlap_length'] for r in rows), 3),
+                'coverage_percentage': round(covered / total * 100, 2) if total else 0.0
+            },
+            'config_totals': [
+                {'config_name': name, 'total_length': round(length, 3)}
+                for name, length in config_totals.items()
+            ],
+            'segments': rows
+        }
+
+    def invalidate(self):
+        """Discard the cached dataset so the next request reloads it"""
+        with self._lock:
+            self._dataset = None
+            self._result = None
+
+    def _on_change(self, table_name: str, action: str,
+                   record_id: Optional[int], values: Dict):
+        """Rebuild on the next request when coverage inputs change"""
+        if table_name in ('nh_segments', 'nh_road_details', 'nh_master',
+                          'divisions', 'road_configurations'):
+            self.invalidate()
@@ -105,12 +105,33 @@ CREATE TABLE nh_road_details (
     CHECK (end_chainage > start_chainage)
 );
 
+-- ============================================================================
+-- 6a. ARCHIVE TABLES
+-- Segments whose status is set to 'archived' are moved here with their road
+-- details (see segment_archive.sql), so everyday queries only scan hot rows.
+-- Columns are matched by name: add columns added to the live tables here too.
+-- ============================================================================
+CREATE TABLE nh_segments_archive LIKE nh_segments;
+ALTER TABLE nh_segments_archive
+    DROP INDEX unique_nh_segment,
+    ADD COLUMN archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ADD INDEX idx_segments_archive_nh (nh_id, start_chainage),
+    ADD INDEX idx_segments_archive_archived (archived_at);
+
+CREATE TABLE nh_road_details_archive LIKE nh_road_details;
+ALTER TABLE nh_road_details_archive
+    MODIFY length_km DECIMAL(10, 3),
+    ADD COLUMN archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
 -- ============================================================================
 -- 7. AUDIT_LOG TABLE (Optional but recommended)
 -- Tracks all changes for auditing purposes
+-- Partitioned by month; archive_audit.py adds upcoming partitions and moves
+-- old months to compressed files. Partitioned tables cannot have foreign
+-- keys, so user_id is not constrained.
 -- ============================================================================
 CREATE TABLE audit_log (
-    log_id INT PRIMARY KEY AUTO_INCREMENT,
+    log_id INT AUTO_INCREMENT,
     user_id INT,
     table_name VARCHAR(50) NOT NULL,
     record_id INT NOT NULL,
@@ -118,8 +139,27 @@ CREATE TABLE audit_log (
     old_values JSON,
     new_values JSON,
     ip_address VARCHAR(45),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE SET NULL
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    -- Segment the entry belongs to (the detail's segment for road details)
+    segment_id INT GENERATED ALWAYS AS (
+        CASE table_name
+            WHEN 'nh_segments' THEN record_id
+            WHEN 'nh_road_details' THEN CAST(COALESCE(new_values->>'$.segment_id',
+                                                      old_values->>'$.segment_id') AS UNSIGNED)
+        END
+    ) STORED,
+    PRIMARY KEY (log_id, created_at)
+)
+PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) (
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
+
+-- Progress of the batched audit writer (AUDIT_MODE=batched): the last spool
+-- sequence number each writer process has committed to audit_log
+CREATE TABLE audit_writer_state (
+    writer_id VARCHAR(100) PRIMARY KEY,
+    last_seq BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
 -- ============================================================================
@@ -134,13 +174,17 @@ CREATE INDEX idx_users_division ON users(division_office_id);
 CREATE INDEX idx_segments_nh ON nh_segments(nh_id);
 CREATE INDEX idx_segments_division ON nh_segments(division_office_id);
 CREATE INDEX idx_segments_chainage ON nh_segments(start_chainage, end_chainage);
+CREATE INDEX idx_segments_nh_chainage ON nh_segments(nh_id, start_chainage);
 
 -- NH Road Details indexes
 CREATE INDEX idx_details_segment ON nh_road_details(segment_id);
 CREATE INDEX idx_details_config ON nh_road_details(config_id);
 CREATE INDEX idx_details_chainage ON nh_road_details(start_chainage, end_chainage);
+CREATE INDEX idx_details_segment_chainage ON nh_road_details(segment_id, start_chainage);
 
--- Audit log indexes
-CREATE INDEX idx_audit_user ON audit_log(user_id);
-CREATE INDEX idx_audit_table ON audit_log(table_name, record_id);
+-- Audit log indexes (keyset pagination on created_at, log_id)
+CREATE INDEX idx_audit_user_time ON audit_log(user_id, created_at, log_id);
+CREATE INDEX idx_audit_record_time ON audit_log(table_name, record_id, created_at, log_id);
+CREATE INDEX idx_audit_table_time ON audit_log(table_name, created_at, log_id);
+CREATE INDEX idx_audit_segment_time ON audit_log(segment_id, created_at, log_id);
 CREATE INDEX idx_audit_created ON audit_log(created_at);
@@ -0,0 +1,166 @@
+"""
+National Highways Management System - Delta Sync
+Incremental download of segments, road details and reference rows for
+offline/mobile clients (/api/sync?since=<token>).
+
+Segment and detail changes are found through audit_log (a log_id range
+scan on the primary key), reference rows through their indexed updated_at
+columns; both cost O(changes). A changed id whose row no longer exists is
+returned as a tombstone. Deletes of reference rows reach audit_log through
+the triggers in sync_support.sql.
+
+Changes from the last SETTLE seconds are sent again on the next sync, so a
+transaction that commits after a later one has been seen is not missed;
+clients apply rows as upserts, so repeats are harmless.
+"""
+
+from typing import Optional, List, Dict, Iterable
+from datetime import datetime, timedelta
+import base64
+import binascii
+import json
+
+from nh_management import NHDatabase
+
+
+TOKEN_VERSION = 1
+
+# kind -> (table, id column, qualified id column, query selecting rows as
+# /api/segments etc. return them)
+SYNC_KINDS = {
+    'segments': ('nh_segments', 'segment_id', 'ns.segment_id', """
+        SELECT ns.*, nm.nh_number, nm.nh_name, d.division_name, d.office_name
+        FROM nh_segments ns
+        JOIN nh_master nm ON ns.nh_id = nm.nh_id
+        JOIN divisions d ON ns.division_office_id = d.division_id
+    """),
+    'details': ('nh_road_details', 'detail_id', 'rd.detail_id', """
+        SELECT rd.*, rc.config_name, rc.config_code
+        FROM nh_road_details rd
+        JOIN road_configurations rc ON rd.config_id = rc.config_id
+    """),
+    'nh': ('nh_master', 'nh_id', 'nh_id', "SELECT * FROM nh_master"),
+    'divisions': ('divisions', 'division_id', 'division_id', "SELECT * FROM divisions"),
+    'configurations': ('road_configurations', 'config_id', 'config_id',
+                       "SELECT * FROM road_configurations")
+}
+
+# Reference tables: changes found by updated_at, deletes by audit_log
+REFERENCE_KINDS = ('nh', 'divisions', 'configurations')
+
+KIND_BY_TABLE = {table: kind for kind, (table, _, _, _) in SYNC_KINDS.items()}
+
+# Ids per IN (...) lookup
+LOOKUP_BATCH = 500
+
+
+def encode_token(log_id: int, updated_since: datetime) -> str:
+    payload = json.dumps({'v': TOKEN_VERSION, 'log_id': log_id,
+                          'updated_since': updated_since.isoformat()}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_token(token: str) -> Dict:
+    """
+    Raises:
+        ValueError: Malformed or outdated token
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        if payload['v'] != TOKEN_VERSION:
+            raise ValueError
+        return {'log_id': int(payload['log_id']),
+                'updated_since': datetime.fromisoformat(payload['updated_since'])}
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise ValueError("Invalid sync token - sync again without 'since'")
+
+
+class SyncManager:
+    """Computes full and incremental sync responses"""
+
+    def __init__(self, db: NHDatabase, settle_seconds: int = 5):
+        """
+        Args:
+            db: Database handle
+            settle_seconds: How long changes keep being re-sent (longest
+                            expected write transaction)
+        """
+        self.db = db
+        self.settle_seconds = settle_seconds
+
+    def _rows_by_id(self, kind: str, ids: Iterable[int]) -> List[Dict]:
+        _, _, id_expression, query = SYNC_KINDS[kind]
+        ids = sorted(ids)
+        rows = []
+        for start in range(0, len(ids), LOOKUP_BATCH):
+            batch = ids[start:start + LOOKUP_BATCH]
+            rows.extend(self.db.execute_query(
+                f"{query} WHERE {id_expression} IN ({', '.join(['%s'] * len(batch))})",
+                tuple(batch), raise_on_error=True))
+        return rows
+
+    def sync(self, token: Optional[str] = None) -> Dict:
+        """
+        Everything (no token) or the changes since a token
+
+        Args:
+            token: Token from the previous response
+
+        Returns:
+            {'token', 'full', <kind>: [rows], 'deleted': {<kind>: [ids]}}
+
+        Raises:
+            ValueError: Invalid token
+        """
+        since = decode_token(token) if token else None
+        rows = self.db.execute_query("""
+            SELECT NOW() AS now, MIN(log_id) AS oldest_log_id FROM audit_log
+        """, raise_on_error=True)
+        settled = rows[0]['now'] - timedelta(seconds=self.settle_seconds)
+        oldest = rows[0]['oldest_log_id']
+
+        # Entries before the token were archived: only a full sync is exact
+        if since is not None and oldest is not None and since['log_id'] < oldest - 1:
+            since = None
+        if since is None:
+            return self._full_sync(settled)
+
+        entries = self.db.execute_query(f"""
+            SELECT log_id, table_name, record_id, created_at
+            FROM audit_log
+            WHERE log_id > %s AND table_name IN ({', '.join(['%s'] * len(KIND_BY_TABLE))})
+            ORDER BY log_id
+        """, (since['log_id'],) + tuple(KIND_BY_TABLE), raise_on_error=True)
+
+        next_log_id = since['log_id']
+        unsettled = False
+        touched = {kind: set() for kind in SYNC_KINDS}
+        for entry in entries:
+            touched[KIND_BY_TABLE[entry['table_name']]].add(entry['record_id'])
+            # The token only moves past settled entries (and all before them)
+            unsettled = unsettled or entry['created_at'] > settled
+            if not unsettled:
+                next_log_id = entry['log_id']
+
+        result = {'token': encode_token(next_log_id, settled), 'full': False, 'deleted': {}}
+        for kind, (_, id_column, _, query) in SYNC_KINDS.items():
+            changed = {}
+            if kind in REFERENCE_KINDS:
+                for row in self.db.execute_query(f"{query} WHERE updated_at >= %s",
+                                                 (since['updated_since'],), raise_on_error=True):
+                    changed[row[id_column]] = row
+            for row in self._rows_by_id(kind, touched[kind] - set(changed)):
+                changed[row[id_column]] = row
+            result[kind] = list(changed.values())
+            result['deleted'][kind] = sorted(touched[kind] - set(changed))
+        return result
+
+    def _full_sync(self, settled: datetime) -> Dict:
+        rows = self.db.execute_query(
+            "SELECT COALESCE(MAX(log_id), 0) AS log_id FROM audit_log WHERE created_at <= %s",
+            (settled,), raise_on_error=True)
+        result = {'token': encode_token(int(rows[0]['log_id']), settled), 'full': True,
+                  'deleted': {kind: [] for kind in SYNC_KINDS}}
+        for kind, (_, _, _, query) in SYNC_KINDS.items():
+            result[kind] = self.db.execute_query(query, raise_on_error=True)
+        return result
@@ -0,0 +1,187 @@
+"""
+National Highways Management System - Road Detail Validation
+Validates road detail chainages against cached segment bounds and existing
+detail intervals, so a clean insert needs only the INSERT round-trip.
+
+The database triggers (triggers.sql) still run on every write and remain the
+final safety net if the cache is behind another process.
+"""
+
+from bisect import bisect_left, insort
+from typing import Optional, Dict, Tuple
+import threading
+
+from nh_management import NHDatabase
+
+
+OVERLAP_MESSAGE = ("Configuration overlaps with existing configuration in this segment. "
+                   "Please check the chainage range and try again.")
+
+
+class SegmentIntervals:
+    """Bounds of one segment and the sorted intervals of its road details"""
+
+    def __init__(self, segment_id: int, start: float, end: float, name: Optional[str]):
+        self.segment_id = segment_id
+        self.start = start
+        self.end = end
+        self.name = name
+        self.intervals = []  # sorted (start, end, detail_id)
+
+    def add(self, start: float, end: float, detail_id: Optional[int]):
+        insort(self.intervals, (start, end, detail_id if detail_id is not None else -1))
+
+    def remove(self, detail_id: int) -> bool:
+        for i, interval in enumerate(self.intervals):
+            if interval[2] == detail_id:
+                del self.intervals[i]
+                return True
+        return False
+
+    def find_overlap(self, start: float, end: float,
+                     exclude_detail_id: Optional[int] = None) -> Optional[Tuple]:
+        """Return an existing interval overlapping [start, end), if any"""
+        # Details in a segment never overlap, so only the neighbours of the
+        # insertion point can intersect the new interval
+        i = bisect_left(self.intervals, (start,))
+        for interval in self.intervals[max(i - 1, 0):]:
+            if interval[0] >= end:
+                break
+            if interval[2] != exclude_detail_id and start < interval[1] and end > interval[0]:
+                return interval
+        return None
+
+
+class DetailValidator:
+    """Cached per-segment interval sets used to validate detail writes"""
+
+    def __init__(self, db: NHDatabase):
+        self.db = db
+        self._lock = threading.Lock()
+        self._segments = {}        # segment_id -> SegmentIntervals
+        self._detail_segment = {}  # detail_id -> segment_id
+        self._version = 0          # Incremented by every segment/detail change
+        db.add_change_listener(self._on_change)
+
+    def _load(self, segment_id: int) -> Optional[SegmentIntervals]:
+        """Load a segment and its details in a single query"""
+        rows = self.db.execute_query("""
+            SELECT ns.start_chainage AS segment_start, ns.end_chainage AS segment_end,
+                   ns.segment_name, rd.detail_id, rd.start_chainage, rd.end_chainage
+            FROM nh_segments ns
+            LEFT JOIN nh_road_details rd ON ns.segment_id = rd.segment_id
+            WHERE ns.segment_id = %s
+        """, (segment_id,), raise_on_error=True)
+        if not rows:
+            return None
+
+        segment = SegmentIntervals(segment_id, float(rows[0]['segment_start']),
+                                   float(rows[0]['segment_end']), rows[0]['segment_name'])
+        for row in rows:
+            if row['detail_id'] is not None:
+                segment.add(float(row['start_chainage']), float(row['end_chainage']),
+                            row['detail_id'])
+        return segment
+
+    def get_segment(self, segment_id: int) -> Optional[SegmentIntervals]:
+        """Get cached bounds and intervals for a segment, loading on a miss"""
+        # Request bodies may carry the id as a string; the cache and the
+        # change notifications key by int
+        segment_id = int(segment_id)
+        with self._lock:
+            segment = self._segments.get(segment_id)
+            version = self._version
+        if segment is not None:
+            return segment
+
+        # Load outside _lock so one segment's round-trip does not hold up
+        # validations and change notifications for the others
+        segment = self._load(segment_id)
+        if segment is None:
+            return None
+        with self._lock:
+            cached = self._segments.get(segment_id)
+            if cached is not None:
+                return cached
+            # A write during the load may be missing from it: use it for this
+            # validation only (the triggers re-check) and reload next time
+            if self._version == version:
+                self._segments[segment_id] = segment
+                for _, _, detail_id in segment.intervals:
+                    self._detail_segment[detail_id] = segment_id
+        return segment
+
+    def validate(self, segment_id: int, start_chainage: float, end_chainage: float,
+                 exclude_detail_id: Optional[int] = None
+                 ) -> Tuple[Optional[Tuple[str, int]], Optional[SegmentIntervals]]:
+        """
+        Validate a road detail before it is written
+
+        Args:
+            segment_id: Target segment
+            start_chainage: Detail start (km)
+            end_chainage: Detail end (km)
+            exclude_detail_id: Detail being updated, ignored in the overlap check
+
+        Returns:
+            (error, segment): error is None if valid, otherwise (error message,
+            HTTP status); segment is the SegmentIntervals validated against
+            (None if the segment does not exist)
+        """
+        segment = self.get_segment(segment_id)
+        if segment is None:
+            return ("Segment not found", 404), None
+
+        if start_chainage < segment.start or end_chainage > segment.end:
+            return (f"Chainage must be within segment boundaries ({segment.start} - {segment.end} km). " +
+                    f"You entered: {start_chainage} - {end_chainage} km", 400), segment
+
+        if start_chainage >= end_chainage:
+            return ("Start chainage must be less than end chainage", 400), segment
+
+        with self._lock:
+            if segment.find_overlap(start_chainage, end_chainage, exclude_detail_id):
+                return (OVERLAP_MESSAGE, 400), segment
+
+        return None, segment
+
+    def invalidate(self, segment_id: Optional[int] = None):
+        """Drop one cached segment, or the whole cache"""
+        with self._lock:
+            self._version += 1
+            if segment_id is None:
+                self._segments.clear()
+                self._detail_segment.clear()
+            else:
+                self._segments.pop(int(segment_id), None)
+
+    def _on_change(self, table_name: str, action: str,
+                   record_id: Optional[int], values: Dict):
+        """Keep cached interval sets in step with detail and segment writes"""
+        if table_name == 'nh_segments':
+            if action != 'INSERT':
+                self.invalidate(record_id)
+            return
+        if table_name != 'nh_road_details':
+            return
+
+        with self._lock:
+            self._version += 1
+            segment_id = values.get('segment_id') or self._detail_segment.get(record_id)
+            if segment_id is None:
+                return
+            segment_id = int(segment_id)
+            segment = self._segments.get(segment_id)
+            if segment is None:
+                return
+
+            if action in ('UPDATE', 'DELETE'):
+                segment.remove(record_id)
+            if action in ('INSERT', 'UPDATE'):
+                if record_id is None or 'start_chainage' not in values:
+                    # Not enough information to patch - reload on next use
+                    self._segments.pop(segment_id, None)
+                    return
+                segment.add(float(values['start_chainage']), float(values['end_chainage']),
+                            record_id)
+                self._detail_segment[record_id] = segment_id
@@ -8,8 +8,96 @@ from mysql.connector import Error
 from mysql.connector.pooling import MySQLConnectionPool
 import bcrypt
 from datetime import datetime
-from typing import Optional, List, Dict, Tuple
+import base64
+import binascii
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Tuple, Callable, Iterator, Union
+import functools
+import heapq
 import json
+import re
+import threading
+import time
+
+
+# MySQL errors raised when a statement is stopped by MAX_EXECUTION_TIME or KILL QUERY
+TIMEOUT_ERRNOS = (3024, 1317, 1028)
+
+SELECT_RE = re.compile(r'^\s*SELECT\b', re.IGNORECASE)
+
+# MySQL error raised by SIGNAL SQLSTATE '45000' in the validation triggers
+TRIGGER_ERRNO = 1644
+
+# Audited table -> (primary key, fields logged in old_values/new_values),
+# matching the JSON written by the audit triggers in triggers.sql
+AUDITED_FIELDS = {
+    'nh_segments': ('segment_id', ('nh_id', 'division_office_id', 'start_chainage',
+                                   'end_chainage', 'segment_name', 'status')),
+    'nh_road_details': ('detail_id', ('segment_id', 'config_id', 'start_chainage',
+                                      'end_chainage', 'remarks'))
+}
+
+# Hot table -> archive table holding archived segments and their details
+# (segment_archive.sql)
+ARCHIVE_TABLES = {
+    'nh_segments': 'nh_segments_archive',
+    'nh_road_details': 'nh_road_details_archive'
+}
+
+
+class QueryTimeoutError(Exception):
+    """A query exceeded the execution time budget of the operation running it"""
+    
+    def __init__(self, operation: Optional[str], budget_ms: int):
+        self.operation = operation
+        self.budget_ms = budget_ms
+        super().__init__(f"{operation or 'Query'} exceeded its time budget of {budget_ms} ms")
+
+
+class PoolExhaustedError(Exception):
+    """No connection became free in a pool within the checkout timeout"""
+    
+    def __init__(self, pool_name: str, timeout: float):
+        self.pool_name = pool_name
+        self.timeout = timeout
+        super().__init__(f"No free connection in {pool_name} after {timeout:g} s")
+
+
+class _QueryWatchdog:
+    """Kills a running statement with KILL QUERY once its budget runs out"""
+    
+    def __init__(self, db: 'NHDatabase', connection_id: int, timeout_ms: int):
+        self.db = db
+        self.connection_id = connection_id
+        self.running = True
+        self._lock = threading.Lock()
+        self._timer = threading.Timer(timeout_ms / 1000, self._kill)
+        self._timer.daemon = True
+        self._timer.start()
+    
+    def _kill(self):
+        # Holding the lock keeps the connection out of the pool until the
+        # KILL has been issued, so it can never hit another request's query
+        with self._lock:
+            if not self.running:
+                return
+            try:
+                killer = mysql.connector.connect(host=self.db.host, port=self.db.port,
+                                                 database=self.db.database,
+                                                 user=self.db.user, password=self.db.password)
+                cursor = killer.cursor()
+                cursor.execute(f"KILL QUERY {int(self.connection_id)}")
+                cursor.close()
+                killer.close()
+            except Error as e:
+                print(f"Error killing query on connection {self.connection_id}: {e}")
+    
+    def stop(self):
+        """The statement finished - cancel the kill"""
+        self._timer.cancel()
+        with self._lock:
+            self.running = False
 
 
 class NHDatabase:
@@ -32,21 +120,54 @@ class NHDatabase:
         self.password = password
         self.port = port
         self.pool = None
+        self.sub_pools = {}  # route class -> dedicated pool
+        self.pool_timeout = 10.0  # Seconds a checkout waits for a free connection
+        self._free = {}  # pool name -> semaphore counting its free connections
+        self._pool_class = threading.local()
+        self._budget = threading.local()
+        self._raising = threading.local()
         self.last_error = None  # Store last error for retrieval
+        self.audit_writer = None  # AuditWriter when audit entries are written by the application
+        self._change_listeners = []
+        self._archive_columns = {}  # hot table -> (shared columns, generated columns)
         
-    def connect(self):
-        """Create database connection pool"""
+    def connect(self, sub_pools: Optional[Dict[str, int]] = None, pool_size: int = 10,
+                pool_timeout: float = 10.0):
+        """
+        Create database connection pool
+        
+        Args:
+            sub_pools: Optional route class -> size of a dedicated pool; work
+                       running under use_pool(name) only draws from that pool
+            pool_size: Total connections; the sub-pools are reserved out of
+                       it and the shared pool gets the rest
+            pool_timeout: Seconds a checkout waits for a free connection
+                          before raising PoolExhaustedError
+        """
+        sub_pools = dict(sub_pools or {})
+        shared_size = pool_size - sum(sub_pools.values())
+        if shared_size < 1:
+            print(f"Error connecting to database: sub-pools need {sum(sub_pools.values())} "
+                  f"of {pool_size} connections, none are left for the shared pool")
+            return False
+        self.pool_timeout = pool_timeout
         try:
-            self.pool = MySQLConnectionPool(
-                pool_name="nh_pool",
-                pool_size=10,
-                pool_reset_session=True,
-                host=self.host,
-                port=self.port,
-                database=self.database,
-                user=self.user,
-                password=self.password
-            )
+            for name, size in list(sub_pools.items()) + [(None, shared_size)]:
+                pool = MySQLConnectionPool(
+                    pool_name=f"nh_pool_{name}" if name else "nh_pool",
+                    pool_size=size,
+                    pool_reset_session=True,
+                    host=self.host,
+                    port=self.port,
+                    database=self.database,
+                    user=self.user,
+                    password=self.password
+                )
+                if name is None:
+                    self.pool = pool
+                else:
+                    self.sub_pools[name] = pool
+                self._free[name] = threading.BoundedSemaphore(size)
             print(f"Successfully connected to {self.database}")
             return True
         except Error as e:
@@ -58,6 +179,198 @@ class NHDatabase:
         # Connection pool doesn't need explicit closing
         pass
     
+    def set_pool(self, name: Optional[str]) -> Optional[str]:
+        """
+        Select the sub-pool the current thread draws connections from
+        
+        Args:
+            name: Sub-pool name, or None for the shared pool
+        
+        Returns:
+            The previously selected name (to restore later)
+        """
+        previous = getattr(self._pool_class, 'name', None)
+        self._pool_class.name = name
+        return previous
+    
+    @contextmanager
+    def use_pool(self, name: Optional[str]):
+        """Run a block with the current thread drawing from a sub-pool"""
+        previous = self.set_pool(name)
+        try:
+            yield
+        finally:
+            self.set_pool(previous)
+    
+    def _get_pool(self) -> MySQLConnectionPool:
+        """Pool for the current thread (its sub-pool if one is selected)"""
+        return self.sub_pools.get(getattr(self._pool_class, 'name', None), self.pool)
+    
+    def _checkout(self):
+        """
+        Take a connection from the current thread's pool
+        
+        Waits up to pool_timeout (or the rest of the time budget) for one to
+        be returned; the pool itself fails at once when it is empty.
+        
+        Returns:
+            (connection, semaphore to pass to _checkin)
+        
+        Raises:
+            PoolExhaustedError: No connection became free in time
+            QueryTimeoutError: The time budget ran out while waiting
+        """
+        name = getattr(self._pool_class, 'name', None)
+        if name not in self.sub_pools:
+            name = None
+        pool = self._get_pool()
+        free = self._free[name]
+        timeout = self.pool_timeout
+        budget_ms = self._remaining_budget_ms()
+        if budget_ms is not None and budget_ms / 1000 < timeout:
+            if not free.acquire(timeout=budget_ms / 1000):
+                raise QueryTimeoutError(self._budget.operation, self._budget.budget_ms)
+        elif not free.acquire(timeout=timeout):
+            raise PoolExhaustedError(pool.pool_name, timeout)
+        try:
+            return pool.get_connection(), free
+        except Exception:
+            free.release()
+            raise
+    
+    def _checkin(self, connection, free):
+        """Return a connection taken with _checkout() to its pool"""
+        try:
+            connection.close()
+        finally:
+            free.release()
+    
+    @contextmanager
+    def time_budget(self, budget_ms: Optional[int], operation: Optional[str] = None):
+        """
+        Bound the total execution time of the queries run in a block
+        
+        SELECTs get a MAX_EXECUTION_TIME hint for the remaining budget; other
+        statements are stopped with KILL QUERY. The outermost budget applies
+        and budgets nested inside it are ignored, so budget_ms=None runs a
+        block unbounded even if it calls budgeted methods.
+        
+        Args:
+            budget_ms: Milliseconds for all queries in the block (None = unbounded)
+            operation: Name reported in QueryTimeoutError
+        """
+        if getattr(self._budget, 'active', False):
+            yield
+            return
+        self._budget.active = True
+        self._budget.budget_ms = budget_ms
+        self._budget.operation = operation
+        self._budget.deadline = None if budget_ms is None else time.monotonic() + budget_ms / 1000
+        try:
+            yield
+        finally:
+            self._budget.active = False
+    
+    @contextmanager
+    def raising_errors(self):
+        """
+        Run a block with every query raising its database errors
+        
+        Manager methods turn a failed query into an empty result; background
+        work that stores or publishes results uses this so that a failure is
+        not mistaken for no data.
+        """
+        previous = getattr(self._raising, 'active', False)
+        self._raising.active = True
+        try:
+            yield
+        finally:
+            self._raising.active = previous
+    
+    def raises_errors(self) -> bool:
+        """Whether the current thread is inside a raising_errors() block"""
+        return getattr(self._raising, 'active', False)
+    
+    def _raise_errors(self, raise_on_error: bool) -> bool:
+        return raise_on_error or getattr(self._raising, 'active', False)
+    
+    def _remaining_budget_ms(self) -> Optional[int]:
+        """Milliseconds left in the current thread's budget (None if unbounded)"""
+        if not getattr(self._budget, 'active', False) or self._budget.deadline is None:
+            return None
+        remaining = int((self._budget.deadline - time.monotonic()) * 1000)
+        if remaining <= 0:
+            raise QueryTimeoutError(self._budget.operation, self._budget.budget_ms)
+        return remaining
+    
+    def wait_within_budget(self, event: threading.Event):
+        """
+        Wait for event, for at most the current thread's remaining time budget
+        
+        Raises:
+            QueryTimeoutError: The budget ran out before event was set
+        """
+        budget_ms = self._remaining_budget_ms()
+        if not event.wait(None if budget_ms is None else budget_ms / 1000):
+            raise QueryTimeoutError(self._budget.operation, self._budget.budget_ms)
+    
+    def bind_context(self, fn: Callable) -> Callable:
+        """
+        Wrap fn to run with the calling thread's sub-pool and time budget
+        
+        Both are thread-local, so work handed to another thread would
+        otherwise draw from the shared pool and run unbounded. A
+        raising_errors() block carries over too.
+        """
+        pool_name = getattr(self._pool_class, 'name', None)
+        raising = getattr(self._raising, 'active', False)
+        budget = None
+        if getattr(self._budget, 'active', False):
+            budget = (self._budget.budget_ms, self._budget.operation, self._budget.deadline)
+        
+        @functools.wraps(fn)
+        def bound(*args, **kwargs):
+            previous_raising = getattr(self._raising, 'active', False)
+            self._raising.active = previous_raising or raising
+            try:
+                with self.use_pool(pool_name):
+                    if budget is None or getattr(self._budget, 'active', False):
+                        return fn(*args, **kwargs)
+                    self._budget.active = True
+                    self._budget.budget_ms, self._budget.operation, self._budget.deadline = budget
+                    try:
+                        return fn(*args, **kwargs)
+                    finally:
+                        self._budget.active = False
+            finally:
+                self._raising.active = previous_raising
+        return bound
+    
+    def bind_iterator(self, rows: Iterator) -> Iterator:
+        """
+        Iterate rows with the calling thread's sub-pool, time budget and
+        raising_errors() state (see bind_context)
+        
+        A row stream returned from inside a time_budget() block is read after
+        the block has ended, often by the response writer; every step of the
+        returned iterator runs under the context captured here instead.
+        """
+        step = self.bind_context(next)
+        
+        def bound_rows():
+            try:
+                while True:
+                    try:
+                        row = step(rows)
+                    except StopIteration:
+                        return
+                    yield row
+            finally:
+                close = getattr(rows, 'close', None)
+                if close is not None:
+                    close()
+        return bound_rows()
+    
     def execute_query(self, query: str, params: Optional[tuple] = None, 
                      fetch: bool = True, raise_on_error: bool = False) -> Optional[List[tuple]]:
         """
@@ -70,18 +383,31 @@ class NHDatabase:
             raise_on_error: If True, raise exceptions; if False, return None on error
             
         Returns:
-            Query results if fetch=True, True for successful non-fetch, None on error (if not raising)
+            Query results if fetch=True; for successful non-fetch the
+            AUTO_INCREMENT id of an INSERT, True for other statements; None on
+            error (if not raising)
         
         Raises:
-            Error: Database errors (only if raise_on_error=True)
+            Error: Database errors (only if raise_on_error=True or in raising_errors())
+            QueryTimeoutError: The query ran past the current time_budget() (always raised)
+            PoolExhaustedError: No connection became free within pool_timeout (always raised)
         """
         connection = None
+        free = None
         cursor = None
+        watchdog = None
+        budget_ms = None
         try:
             self.last_error = None
             
-            # Get connection from pool
-            connection = self.pool.get_connection()
+            # Get connection from pool (waits for one to be returned if all are in use)
+            connection, free = self._checkout()
+            budget_ms = self._remaining_budget_ms()
+            hinted = budget_ms is not None and SELECT_RE.match(query) is not None
+            if hinted:
+                query = SELECT_RE.sub(f"SELECT /*+ MAX_EXECUTION_TIME({budget_ms}) */", query, count=1)
+            elif budget_ms is not None:
+                watchdog = _QueryWatchdog(self, connection.connection_id, budget_ms)
             
             # Use buffered cursor to fetch all results immediately
             cursor = connection.cursor(dictionary=True, buffered=True)
@@ -91,17 +417,29 @@ class NHDatabase:
                 results = cursor.fetchall()
             else:
                 connection.commit()
-                results = True
-                
-            cursor.close()
-            connection.close()  # Return connection to pool
+                # The new row's id comes from this cursor, not shared state:
+                # other threads write through the same NHDatabase
+                results = cursor.lastrowid or True
             return results
             
         except Error as e:
             self.last_error = str(e)
             print(f"Error executing query: {e}")
             
-            # Clean up
+            # A timeout must not look like an empty result
+            if budget_ms is not None and e.errno in TIMEOUT_ERRNOS:
+                raise QueryTimeoutError(self._budget.operation, self._budget.budget_ms) from e
+            
+            # Either raise the error or return None based on flag
+            if self._raise_errors(raise_on_error):
+                raise
+            else:
+                return None
+        
+        finally:
+            # Clean up (the connection goes back to the pool)
+            if watchdog:
+                watchdog.stop()
             if cursor:
                 try:
                     cursor.close()
@@ -109,15 +447,278 @@ class NHDatabase:
                     pass
             if connection:
                 try:
-                    connection.close()
+                    self._checkin(connection, free)
                 except:
                     pass
-            
-            # Either raise the error or return None based on flag
-            if raise_on_error:
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run statements on one connection as a single transaction
+
+        Yields a dictionary cursor; commits when the block ends and rolls
+        back if it raises.
+
+        Raises:
+            Error: Database errors
+            PoolExhaustedError: No connection became free within pool_timeout
+        """
+        connection, free = self._checkout()
+        cursor = None
+        try:
+            cursor = connection.cursor(dictionary=True, buffered=True)
+            yield cursor
+            connection.commit()
+        except Exception:
+            try:
+                connection.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            if cursor:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+            self._checkin(connection, free)
+
+    def execute_audited(self, query: str, params: tuple, table_name: str, action: str,
+                        where: Optional[str] = None, where_params: tuple = (),
+                        raise_on_error: bool = False) -> Optional[bool]:
+        """
+        Execute an INSERT, UPDATE or DELETE on an audited table (AUDITED_FIELDS)
+        
+        Without an audit_writer this is execute_query(fetch=False) and the
+        audit triggers log the change. With one, the triggers are skipped
+        (@nh_app_audit) and the affected rows are read in the same transaction
+        - before an UPDATE or DELETE, after an INSERT or UPDATE - and queued
+        with the writer once committed.
+        
+        Args:
+            query: The INSERT, UPDATE or DELETE statement
+            params: Statement parameters
+            table_name: Table the statement modifies
+            action: 'INSERT', 'UPDATE' or 'DELETE'
+            where: Condition selecting the rows an UPDATE or DELETE affects
+            where_params: Parameters of the condition
+            raise_on_error: If True, raise exceptions; if False, return None on error
+        
+        Returns:
+            The new row's id for an INSERT, True for other statements, None on
+            error (if not raising)
+        """
+        writer = self.audit_writer
+        if writer is None:
+            return self.execute_query(query, params, fetch=False, raise_on_error=raise_on_error)
+        
+        key, fields = AUDITED_FIELDS[table_name]
+        columns = ', '.join((key, 'created_by') + fields)
+        try:
+            self.last_error = None
+            with self.transaction() as cursor:
+                cursor.execute("SET @nh_app_audit = 1")
+                old_rows = []
+                if action != 'INSERT':
+                    cursor.execute(f"""
+                        SELECT {columns}, NOW() AS changed_at FROM {table_name}
+                        WHERE {where} FOR UPDATE
+                    """, where_params)
+                    old_rows = cursor.fetchall()
+                cursor.execute(query, params)
+                insert_id = cursor.lastrowid
+                
+                keys = {'INSERT': [insert_id], 'DELETE': []}.get(
+                    action, [row[key] for row in old_rows])
+                new_rows = []
+                if keys:
+                    cursor.execute(f"""
+                        SELECT {columns}, NOW() AS changed_at FROM {table_name}
+                        WHERE {key} IN ({', '.join(['%s'] * len(keys))})
+                    """, tuple(keys))
+                    new_rows = cursor.fetchall()
+        except Error as e:
+            self.last_error = str(e)
+            print(f"Error executing query: {e}")
+            if self._raise_errors(raise_on_error):
                 raise
+            return None
+        
+        def values(row):
+            return {field: row[field] for field in fields} if row else None
+        
+        old_by_key = {row[key]: row for row in old_rows}
+        new_by_key = {row[key]: row for row in new_rows}
+        writer.record([{
+            'user_id': (new_by_key.get(k) or old_by_key.get(k))['created_by'],
+            'table_name': table_name,
+            'record_id': k,
+            'action': action,
+            'old_values': values(old_by_key.get(k)),
+            'new_values': values(new_by_key.get(k)),
+            'ip_address': None,
+            'created_at': (new_by_key.get(k) or old_by_key.get(k))['changed_at']
+        } for k in (list(new_by_key) if action == 'INSERT' else list(old_by_key))])
+        return insert_id or True
+
+    def stream_query(self, query: str, params: Optional[tuple] = None,
+                     chunk_size: int = 1000) -> Iterator[Dict]:
+        """
+        Execute a SELECT and yield rows as they arrive from the server
+
+        Uses an unbuffered cursor and fetchmany(), so only one chunk of rows is
+        held in memory at a time. The connection stays checked out of the pool
+        until the generator is exhausted or closed.
+
+        Args:
+            query: SQL query string
+            params: Query parameters (for prepared statements)
+            chunk_size: Rows fetched per round trip
+
+        Yields:
+            Result rows as dictionaries
+
+        Raises:
+            Error: Database errors (the stream cannot report them any other way)
+            QueryTimeoutError: The stream ran past the current time_budget(),
+                               checked between chunks (the SELECT also gets
+                               a MAX_EXECUTION_TIME hint)
+        """
+        connection, free = self._checkout()
+        cursor = None
+        watchdog = None
+        budget_ms = self._remaining_budget_ms()
+        if budget_ms is not None:
+            if SELECT_RE.match(query):
+                query = SELECT_RE.sub(f"SELECT /*+ MAX_EXECUTION_TIME({budget_ms}) */", query, count=1)
             else:
-                return None
+                watchdog = _QueryWatchdog(self, connection.connection_id, budget_ms)
+        try:
+            cursor = connection.cursor(dictionary=True, buffered=False)
+            try:
+                cursor.execute(query, params or ())
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield from rows
+                    self._remaining_budget_ms()
+            except Error as e:
+                # A timeout must not look like the end of the stream
+                if budget_ms is not None and e.errno in TIMEOUT_ERRNOS:
+                    raise QueryTimeoutError(self._budget.operation, self._budget.budget_ms) from e
+                raise
+        finally:
+            if watchdog:
+                watchdog.stop()
+            # A stream closed early must drain the result set before the
+            # connection goes back to the pool
+            try:
+                connection.consume_results()
+            except Exception:
+                pass
+            if cursor:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+            self._checkin(connection, free)
+
+    def archive_columns(self, table_name: str) -> Tuple[List[str], List[str]]:
+        """
+        Columns a hot table shares with its archive table (ARCHIVE_TABLES)
+        
+        Matched by name, so columns added to the hot table later are only
+        archived once they are added to the archive table too. Checked once.
+        
+        Returns:
+            (shared columns in table order, those generated in the hot table);
+            no columns if the archive table is not installed
+        """
+        if table_name not in self._archive_columns:
+            results = self.execute_query("""
+                SELECT hot.column_name AS column_name, hot.extra AS extra
+                FROM information_schema.columns hot
+                JOIN information_schema.columns cold
+                  ON cold.table_schema = hot.table_schema
+                 AND cold.table_name = %s
+                 AND cold.column_name = hot.column_name
+                WHERE hot.table_schema = DATABASE() AND hot.table_name = %s
+                ORDER BY hot.ordinal_position
+            """, (ARCHIVE_TABLES[table_name], table_name))
+            if results is None:
+                return [], []  # Check failed - treat as not installed and retry next time
+            self._archive_columns[table_name] = (
+                [row['column_name'] for row in results],
+                [row['column_name'] for row in results if 'GENERATED' in row['extra'].upper()])
+        return self._archive_columns[table_name]
+    
+    def archived_source(self, table_name: str, include_archived: bool = False) -> str:
+        """
+        FROM clause source for nh_segments / nh_road_details
+        
+        The hot table alone, or with include_archived a union with its archive
+        table in which archived rows have archived_at set (NULL for hot rows).
+        """
+        columns, _ = self.archive_columns(table_name) if include_archived else ([], [])
+        if not columns:
+            return table_name
+        column_list = ', '.join(columns)
+        return (f"(SELECT {column_list}, NULL AS archived_at FROM {table_name}"
+                f" UNION ALL SELECT {column_list}, archived_at"
+                f" FROM {ARCHIVE_TABLES[table_name]})")
+    
+    def add_change_listener(self, callback: Callable[[str, str, Optional[int], Dict], None]):
+        """
+        Register a callback to be notified after data is modified
+        
+        Args:
+            callback: Called as callback(table_name, action, record_id, values)
+                      where action is 'INSERT', 'UPDATE' or 'DELETE'
+        """
+        self._change_listeners.append(callback)
+    
+    def notify_change(self, table_name: str, action: str,
+                      record_id: Optional[int] = None, **values):
+        """
+        Notify change listeners (caches, indexes) that a table was modified
+        
+        Args:
+            table_name: Modified table
+            action: 'INSERT', 'UPDATE' or 'DELETE'
+            record_id: Primary key of the modified row, if known
+            **values: Extra context such as nh_id or segment_id
+        """
+        for callback in list(self._change_listeners):
+            try:
+                callback(table_name, action, record_id, values)
+            except Exception as e:
+                print(f"Error in change listener: {e}")
+
+
+def apply_time_budgets(db: NHDatabase, manager, budgets: Dict[str, int]):
+    """
+    Run manager methods under an execution time budget
+    
+    Args:
+        db: Database handle
+        manager: Manager instance, e.g. a ReportManager
+        budgets: Method name -> budget in milliseconds
+    """
+    def bounded(method, label, budget_ms):
+        @functools.wraps(method)
+        def call(*args, **kwargs):
+            with db.time_budget(budget_ms, label):
+                result = method(*args, **kwargs)
+                if isinstance(result, Iterator):
+                    # stream=True: the rows are read after this block ends
+                    return db.bind_iterator(result)
+                return result
+        return call
+    
+    for name, budget_ms in budgets.items():
+        label = f"{type(manager).__name__}.{name}"
+        setattr(manager, name, bounded(getattr(manager, name), label, budget_ms))
 
 
 class UserManager:
@@ -228,11 +829,11 @@ class NHManager:
         query = "CALL sp_get_nh_summary(%s)"
         return self.db.execute_query(query, (nh_id,)) or {}
     
-    def get_nh_segments(self, nh_id: int) -> List[Dict]:
-        """Get all segments for a specific NH"""
-        query = """
+    def get_nh_segments(self, nh_id: int, include_archived: bool = False) -> List[Dict]:
+        """Get all segments for a specific NH (archived ones too if include_archived)"""
+        query = f"""
             SELECT ns.*, d.division_name, d.office_name
-            FROM nh_segments ns
+            FROM {self.db.archived_source('nh_segments', include_archived)} ns
             JOIN divisions d ON ns.division_office_id = d.division_id
             WHERE ns.nh_id = %s
             ORDER BY ns.start_chainage
@@ -243,20 +844,65 @@ class NHManager:
 class SegmentManager:
     """Manage NH segments"""
     
+    # Maintained per-segment aggregates (mv_segment_stats, summary_tables.sql)
+    STATS_COLUMNS = """
+        COALESCE(st.detail_count, 0) AS detail_count,
+        COALESCE(st.configured_length, 0) AS configured_length,
+        COALESCE(st.coverage_pct, 0) AS coverage_pct,
+        st.last_modified_at
+    """
+    
     def __init__(self, db: NHDatabase):
         self.db = db
+        self._segment_stats = None  # Whether mv_segment_stats exists (checked once)
     
-    def get_segments_by_division(self, division_office_id: int) -> List[Dict]:
-        """Get all segments assigned to a division office"""
-        query = """
-            SELECT ns.*, nm.nh_number, nm.nh_name
-            FROM nh_segments ns
+    def has_segment_stats(self) -> bool:
+        """Check (once) whether the per-segment aggregates table is installed"""
+        if self._segment_stats is None:
+            query = """
+                SELECT COUNT(*) AS table_count FROM information_schema.tables
+                WHERE table_schema = DATABASE() AND table_name = 'mv_segment_stats'
+            """
+            results = self.db.execute_query(query)
+            if results is None:
+                return False  # Check failed - list without aggregates and retry next time
+            self._segment_stats = results[0]['table_count'] > 0
+        return self._segment_stats
+    
+    def _stats_sql(self) -> Tuple[str, str]:
+        """(select list suffix, join) adding the aggregates to segment rows, if installed"""
+        if not self.has_segment_stats():
+            return "", ""
+        return (f", {self.STATS_COLUMNS}",
+                "LEFT JOIN mv_segment_stats st ON ns.segment_id = st.segment_id")
+    
+    def get_segments_by_division(self, division_office_id: int,
+                                 include_archived: bool = False) -> List[Dict]:
+        """Get all segments assigned to a division office (archived ones too if include_archived)"""
+        columns, join = self._stats_sql()
+        query = f"""
+            SELECT ns.*, nm.nh_number, nm.nh_name{columns}
+            FROM {self.db.archived_source('nh_segments', include_archived)} ns
             JOIN nh_master nm ON ns.nh_id = nm.nh_id
+            {join}
             WHERE ns.division_office_id = %s
             ORDER BY nm.nh_number, ns.start_chainage
         """
         return self.db.execute_query(query, (division_office_id,)) or []
     
+    def get_all_segments(self, include_archived: bool = False) -> List[Dict]:
+        """Get all segments with their NH and division (archived ones too if include_archived)"""
+        columns, join = self._stats_sql()
+        query = f"""
+            SELECT ns.*, nm.nh_number, nm.nh_name, d.division_name, d.office_name{columns}
+            FROM {self.db.archived_source('nh_segments', include_archived)} ns
+            JOIN nh_master nm ON ns.nh_id = nm.nh_id
+            JOIN divisions d ON ns.division_office_id = d.division_id
+            {join}
+            ORDER BY nm.nh_number, ns.start_chainage
+        """
+        return self.db.execute_query(query) or []
+    
     def create_segment(self, nh_id: int, division_office_id: int,
                       start_chainage: float, end_chainage: float,
                       segment_name: str, created_by: int,
@@ -269,27 +915,255 @@ class SegmentManager:
             VALUES (%s, %s, %s, %s, %s, %s, %s)
         """
         
-        result = self.db.execute_query(
+        result = self.db.execute_audited(
             query,
             (nh_id, division_office_id, start_chainage, end_chainage,
              segment_name, remarks, created_by),
-            fetch=False
+            'nh_segments', 'INSERT'
         )
         
+        if result is not None:
+            self.db.notify_change('nh_segments', 'INSERT', result, nh_id=nh_id)
         return result is not None
     
-    def get_segment_details(self, segment_id: int) -> Optional[Dict]:
-        """Get details for a specific segment"""
-        query = """
+    def get_segment_details(self, segment_id: int,
+                            include_archived: bool = False) -> Optional[Dict]:
+        """Get details for a specific segment (also an archived one if include_archived)"""
+        columns, join = self._stats_sql()
+        query = f"""
             SELECT ns.*, nm.nh_number, nm.nh_name, 
-                   d.division_name, d.office_name
-            FROM nh_segments ns
+                   d.division_name, d.office_name{columns}
+            FROM {self.db.archived_source('nh_segments', include_archived)} ns
             JOIN nh_master nm ON ns.nh_id = nm.nh_id
             JOIN divisions d ON ns.division_office_id = d.division_id
+            {join}
             WHERE ns.segment_id = %s
         """
         results = self.db.execute_query(query, (segment_id,))
         return results[0] if results else None
+    
+    def reconcile_segment_stats(self, fix: bool = True) -> Dict:
+        """
+        Compare mv_segment_stats with the base tables and repair drift
+        
+        The comparison is one statement, so it reads a consistent snapshot
+        in which the aggregates and the details they were updated with agree;
+        a difference is real drift (manual SQL, ON DELETE CASCADE, bugs).
+        
+        Args:
+            fix: Recompute the drifted segments (False only reports them)
+        
+        Returns:
+            {'drifted': [rows with stored and actual values], 'orphaned': [segment ids]}
+        """
+        query = """
+            SELECT ns.segment_id,
+                   st.detail_count, st.configured_length, st.coverage_pct,
+                   COUNT(rd.detail_id) AS actual_detail_count,
+                   COALESCE(SUM(rd.length_km), 0) AS actual_configured_length,
+                   ROUND(COALESCE(SUM(rd.length_km), 0)
+                         / (ns.end_chainage - ns.start_chainage) * 100, 2) AS actual_coverage_pct
+            FROM nh_segments ns
+            LEFT JOIN nh_road_details rd ON ns.segment_id = rd.segment_id
+            LEFT JOIN mv_segment_stats st ON ns.segment_id = st.segment_id
+            GROUP BY ns.segment_id, ns.start_chainage, ns.end_chainage,
+                     st.detail_count, st.configured_length, st.coverage_pct
+            HAVING st.detail_count IS NULL
+                OR st.detail_count <> actual_detail_count
+                OR st.configured_length <> actual_configured_length
+                OR st.coverage_pct <> actual_coverage_pct
+            ORDER BY ns.segment_id
+        """
+        drifted = self.db.execute_query(query, raise_on_error=True)
+        orphaned = [row['segment_id'] for row in self.db.execute_query("""
+            SELECT st.segment_id FROM mv_segment_stats st
+            LEFT JOIN nh_segments ns ON st.segment_id = ns.segment_id
+            WHERE ns.segment_id IS NULL
+        """, raise_on_error=True)]
+        
+        if fix:
+            for segment_id in [row['segment_id'] for row in drifted] + orphaned:
+                self.db.execute_query("CALL sp_mv_refresh_segment_stats(%s)", (segment_id,),
+                                      fetch=False, raise_on_error=True)
+        return {'drifted': drifted, 'orphaned': orphaned}
+    
+    def has_archive(self) -> bool:
+        """Whether the segment archive tables are installed (segment_archive.sql)"""
+        return bool(self.db.archive_columns('nh_segments')[0]
+                    and self.db.archive_columns('nh_road_details')[0])
+    
+    def _move_to_archive(self, cursor, segment_id: Optional[int] = None) -> List[Dict]:
+        """Move archived-status segments and their details on a transaction's cursor"""
+        segment_columns, _ = self.db.archive_columns('nh_segments')
+        detail_columns, _ = self.db.archive_columns('nh_road_details')
+        query = "SELECT segment_id, nh_id FROM nh_segments WHERE status = 'archived'"
+        params = ()
+        if segment_id is not None:
+            query += " AND segment_id = %s"
+            params = (segment_id,)
+        cursor.execute(query + " FOR UPDATE", params)
+        moved = cursor.fetchall()
+        if not moved:
+            return []
+        ids = tuple(row['segment_id'] for row in moved)
+        in_ids = f"IN ({', '.join(['%s'] * len(ids))})"
+        
+        for table, columns in (('nh_segments', segment_columns),
+                               ('nh_road_details', detail_columns)):
+            cursor.execute(f"""
+                INSERT INTO {ARCHIVE_TABLES[table]} ({', '.join(columns)}, archived_at)
+                SELECT {', '.join(columns)}, NOW() FROM {table} WHERE segment_id {in_ids}
+            """, ids)
+        cursor.execute(f"DELETE FROM nh_road_details WHERE segment_id {in_ids}", ids)
+        cursor.execute(f"DELETE FROM nh_segments WHERE segment_id {in_ids}", ids)
+        return moved
+    
+    def _move_from_archive(self, cursor, segment_id: int, status: str) -> Optional[Dict]:
+        """Move an archived segment and its details back on a transaction's cursor"""
+        segment_columns, _ = self.db.archive_columns('nh_segments')
+        detail_columns, generated = self.db.archive_columns('nh_road_details')
+        detail_columns = [c for c in detail_columns if c not in generated]
+        select_list = ', '.join('%s' if c == 'status' else c for c in segment_columns)
+        cursor.execute("""
+            SELECT segment_id, nh_id FROM nh_segments_archive
+            WHERE segment_id = %s FOR UPDATE
+        """, (segment_id,))
+        rows = cursor.fetchall()
+        if not rows:
+            return None
+        
+        # Insert triggers re-validate the segment and details and log them
+        cursor.execute(f"""
+            INSERT INTO nh_segments ({', '.join(segment_columns)})
+            SELECT {select_list} FROM nh_segments_archive WHERE segment_id = %s
+        """, ((status,) if 'status' in segment_columns else ()) + (segment_id,))
+        cursor.execute(f"""
+            INSERT INTO nh_road_details ({', '.join(detail_columns)})
+            SELECT {', '.join(detail_columns)} FROM nh_road_details_archive
+            WHERE segment_id = %s ORDER BY start_chainage
+        """, (segment_id,))
+        cursor.execute("DELETE FROM nh_road_details_archive WHERE segment_id = %s", (segment_id,))
+        cursor.execute("DELETE FROM nh_segments_archive WHERE segment_id = %s", (segment_id,))
+        return rows[0]
+    
+    def archive_segments(self, segment_id: Optional[int] = None) -> List[int]:
+        """
+        Move archived segments and their details to the archive tables
+        
+        Moves the segment if its status is 'archived' (or, without a
+        segment_id, every segment whose status is). The move is one
+        transaction; the delete triggers log it in audit_log and update the
+        summary tables, so listings, reports and sync see only hot segments.
+        
+        Returns:
+            Ids of the segments moved
+        """
+        if not self.has_archive():
+            return []
+        with self.db.transaction() as cursor:
+            # Triggers write the audit entries, also under the batched writer
+            cursor.execute("SET @nh_app_audit = NULL")
+            moved = self._move_to_archive(cursor, segment_id)
+        
+        for row in moved:
+            self.db.notify_change('nh_segments', 'DELETE', row['segment_id'], nh_id=row['nh_id'])
+        return [row['segment_id'] for row in moved]
+    
+    def restore_segment(self, segment_id: int, status: str = 'active') -> bool:
+        """
+        Move an archived segment and its details back to the hot tables
+        
+        Args:
+            segment_id: Archived segment
+            status: Status the segment is restored with
+        
+        Returns:
+            True if restored, False if the segment is not archived
+        
+        Raises:
+            Error: Database constraint violations (e.g. a segment created
+                   since now overlaps it)
+        """
+        if not self.has_archive():
+            return False
+        with self.db.transaction() as cursor:
+            cursor.execute("SET @nh_app_audit = NULL")
+            row = self._move_from_archive(cursor, segment_id, status)
+        
+        if row is None:
+            return False
+        self.db.notify_change('nh_segments', 'INSERT', segment_id, nh_id=row['nh_id'])
+        return True
+    
+    def insert_archived(self, insert_query: str, params: tuple) -> Optional[int]:
+        """
+        Insert a segment created with status 'archived' straight into the archive
+        
+        The INSERT and the move are one transaction, so a failed move leaves
+        no segment behind.
+        
+        Returns:
+            The new segment_id
+        
+        Raises:
+            Error: Database errors, including validation trigger errors
+        """
+        with self.db.transaction() as cursor:
+            cursor.execute("SET @nh_app_audit = NULL")
+            cursor.execute(insert_query, params)
+            segment_id = cursor.lastrowid
+            moved = self._move_to_archive(cursor, segment_id) if self.has_archive() else []
+        
+        for row in moved:
+            self.db.notify_change('nh_segments', 'DELETE', row['segment_id'], nh_id=row['nh_id'])
+        if not moved:
+            self.db.notify_change('nh_segments', 'INSERT', segment_id)
+        return segment_id
+    
+    def update_archival(self, segment_id: int, update_fields: List[str], update_values: List,
+                        restore_status: Optional[str] = None) -> bool:
+        """
+        Update a segment whose status change moves it into or out of the archive
+        
+        One transaction: an archived segment is first restored with
+        restore_status, the UPDATE is applied, and the segment is moved to
+        the archive if its status is then 'archived'. If any step fails
+        nothing is changed. Triggers write the audit entries, as in
+        archive_segments().
+        
+        Args:
+            segment_id: Segment to update
+            update_fields: "column = %s" assignments
+            update_values: Values of the assignments
+            restore_status: Status to restore an archived segment with (None
+                            if the segment is in nh_segments)
+        
+        Returns:
+            False if restore_status is given but the segment is not archived
+        
+        Raises:
+            Error: Database errors, including validation trigger errors
+        """
+        with self.db.transaction() as cursor:
+            cursor.execute("SET @nh_app_audit = NULL")
+            restored = None
+            if restore_status is not None:
+                restored = self._move_from_archive(cursor, segment_id, restore_status)
+                if restored is None:
+                    return False
+            if update_fields:
+                cursor.execute(f"""
+                    UPDATE nh_segments SET {', '.join(update_fields)} WHERE segment_id = %s
+                """, tuple(update_values) + (segment_id,))
+            moved = self._move_to_archive(cursor, segment_id) if self.has_archive() else []
+        
+        if moved:
+            self.db.notify_change('nh_segments', 'DELETE', segment_id, nh_id=moved[0]['nh_id'])
+        elif restored is not None:
+            self.db.notify_change('nh_segments', 'INSERT', segment_id, nh_id=restored['nh_id'])
+        else:
+            self.db.notify_change('nh_segments', 'UPDATE', segment_id)
+        return True
 
 
 class RoadDetailManager:
@@ -307,11 +1181,11 @@ class RoadDetailManager:
         """
         return self.db.execute_query(query) or []
     
-    def get_segment_details(self, segment_id: int) -> List[Dict]:
-        """Get all road details for a segment"""
-        query = """
+    def get_segment_details(self, segment_id: int, include_archived: bool = False) -> List[Dict]:
+        """Get all road details for a segment (also an archived one if include_archived)"""
+        query = f"""
             SELECT rd.*, rc.config_name, rc.config_code
-            FROM nh_road_details rd
+            FROM {self.db.archived_source('nh_road_details', include_archived)} rd
             JOIN road_configurations rc ON rd.config_id = rc.config_id
             WHERE rd.segment_id = %s
             ORDER BY rd.start_chainage
@@ -333,14 +1207,18 @@ class RoadDetailManager:
             VALUES (%s, %s, %s, %s, %s, %s)
         """
         
-        result = self.db.execute_query(
+        result = self.db.execute_audited(
             query,
             (segment_id, config_id, start_chainage, end_chainage, 
              remarks, created_by),
-            fetch=False,
+            'nh_road_details', 'INSERT',
             raise_on_error=True  # Raise errors so server can handle them
         )
         
+        if result:
+            self.db.notify_change('nh_road_details', 'INSERT', result,
+                                  segment_id=segment_id, config_id=config_id,
+                                  start_chainage=start_chainage, end_chainage=end_chainage)
         return result is not None and result is not False
     
     def update_road_detail(self, detail_id: int, start_chainage: float,
@@ -353,19 +1231,26 @@ class RoadDetailManager:
             WHERE detail_id = %s
         """
         
-        result = self.db.execute_query(
+        result = self.db.execute_audited(
             query,
             (start_chainage, end_chainage, remarks, detail_id),
-            fetch=False,
+            'nh_road_details', 'UPDATE', where="detail_id = %s", where_params=(detail_id,),
             raise_on_error=True
         )
         
+        if result:
+            self.db.notify_change('nh_road_details', 'UPDATE', detail_id,
+                                  start_chainage=start_chainage, end_chainage=end_chainage)
         return result is not None and result is not False
     
     def delete_road_detail(self, detail_id: int) -> bool:
         """Delete a road configuration detail"""
         query = "DELETE FROM nh_road_details WHERE detail_id = %s"
-        result = self.db.execute_query(query, (detail_id,), fetch=False, raise_on_error=True)
+        result = self.db.execute_audited(query, (detail_id,), 'nh_road_details', 'DELETE',
+                                         where="detail_id = %s", where_params=(detail_id,),
+                                         raise_on_error=True)
+        if result:
+            self.db.notify_change('nh_road_details', 'DELETE', detail_id)
         return result is not None and result is not False
 
 
@@ -396,48 +1281,332 @@ class ValidationManager:
         return self.db.execute_query(query, (nh_id,)) or []
 
 
+class AuditManager:
+    """Read the audit trail, newest first, with keyset pagination
+
+    Pages continue from the (created_at, log_id) of the last entry returned,
+    so every page is an index range scan however deep it is. Entries older
+    than the hot window (archive_audit.py) are read from the audit archive
+    once a page runs past the start of the table; without an archive such
+    pages are marked truncated.
+    """
+
+    AUDIT_COLUMNS = """
+        al.log_id, al.user_id, u.username, al.table_name, al.record_id, al.action,
+        al.old_values, al.new_values, al.ip_address, al.created_at
+    """
+
+    def __init__(self, db: NHDatabase, archive=None):
+        """
+        Args:
+            db: Database handle
+            archive: AuditArchive holding the months dropped from audit_log
+        """
+        self.db = db
+        self.archive = archive
+
+    @staticmethod
+    def encode_cursor(entry: Dict) -> str:
+        """Opaque cursor for the page after an entry"""
+        position = f"{entry['created_at'].isoformat()}|{entry['log_id']}"
+        return base64.urlsafe_b64encode(position.encode('utf-8')).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+        """
+        Raises:
+            ValueError: Malformed cursor
+        """
+        try:
+            position = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+            created_at, log_id = position.split('|')
+            return datetime.fromisoformat(created_at), int(log_id)
+        except (ValueError, UnicodeDecodeError, binascii.Error):
+            raise ValueError("Invalid cursor")
+
+    def _archived(self, filters: Dict, before: Optional[Tuple[datetime, int]],
+                  count: int) -> List[Dict]:
+        """
+        The newest `count` archived entries matching the filters, older than
+        the position `before`
+
+        Archive files are in log_id order, so every file the filters and the
+        position do not rule out is read through.
+        """
+        until = filters.get('until')
+        rows = self.archive.query(since=filters.get('since'),
+                                  until=before[0] if before else until,
+                                  table_names=[filters['table_name']] if filters.get('table_name') else None,
+                                  record_id=filters.get('record_id'), user_id=filters.get('user_id'),
+                                  segment_id=filters.get('segment_id'))
+        rows = (row for row in rows
+                if (until is None or row['created_at'] < until)
+                and (before is None or (row['created_at'], row['log_id']) < before))
+        entries = heapq.nlargest(count, rows, key=lambda row: (row['created_at'], row['log_id']))
+
+        user_ids = {entry['user_id'] for entry in entries if entry['user_id'] is not None}
+        usernames = {}
+        if user_ids:
+            users = self.db.execute_query(
+                f"SELECT user_id, username FROM users WHERE user_id IN ({', '.join(['%s'] * len(user_ids))})",
+                tuple(user_ids), raise_on_error=True)
+            usernames = {user['user_id']: user['username'] for user in users}
+        return [{'log_id': entry['log_id'], 'user_id': entry['user_id'],
+                 'username': usernames.get(entry['user_id']), 'table_name': entry['table_name'],
+                 'record_id': entry['record_id'], 'action': entry['action'],
+                 'old_values': entry['old_values'], 'new_values': entry['new_values'],
+                 'ip_address': entry['ip_address'], 'created_at': entry['created_at']}
+                for entry in entries]
+
+    def _page(self, conditions: List[str], params: List, cursor: Optional[str],
+              limit: int, filters: Dict) -> Dict:
+        """
+        One page of entries matching the conditions
+
+        filters holds the same criteria by name, for the audit archive.
+        """
+        conditions, params = list(conditions), list(params)
+        position = None
+        if cursor:
+            position = self.decode_cursor(cursor)
+            created_at, log_id = position
+            # The first term is the index range, the second only drops the
+            # entries sharing the cursor's timestamp that were already returned
+            conditions.append("al.created_at <= %s AND (al.created_at < %s OR al.log_id < %s)")
+            params.extend([created_at, created_at, log_id])
+
+        query = f"""
+            SELECT {self.AUDIT_COLUMNS}
+            FROM audit_log al
+            LEFT JOIN users u ON al.user_id = u.user_id
+            WHERE {' AND '.join(conditions) or 'TRUE'}
+            ORDER BY al.created_at DESC, al.log_id DESC
+            LIMIT {int(limit) + 1}
+        """
+        entries = self.db.execute_query(query, tuple(params), raise_on_error=True)
+        for entry in entries:
+            for column in ('old_values', 'new_values'):
+                if isinstance(entry[column], (bytes, bytearray)):
+                    entry[column] = entry[column].decode('utf-8')
+                if isinstance(entry[column], str):
+                    entry[column] = json.loads(entry[column])
+
+        truncated = False
+        if len(entries) <= limit:
+            # The table has run out: the rest of the page is in the archive
+            if entries:
+                position = (entries[-1]['created_at'], entries[-1]['log_id'])
+            if self.archive is not None:
+                entries += self._archived(filters, position, limit + 1 - len(entries))
+            else:
+                oldest = self.db.execute_query(
+                    "SELECT MIN(created_at) AS oldest FROM audit_log", raise_on_error=True)[0]['oldest']
+                since = filters.get('since')
+                truncated = oldest is not None and (since is None or since < oldest)
+
+        next_cursor = self.encode_cursor(entries[limit - 1]) if len(entries) > limit else None
+        return {'entries': entries[:limit], 'next_cursor': next_cursor, 'truncated': truncated}
+
+    def get_entries(self, table_name: Optional[str] = None, record_id: Optional[int] = None,
+                    user_id: Optional[int] = None, since: Optional[datetime] = None,
+                    until: Optional[datetime] = None, cursor: Optional[str] = None,
+                    limit: int = 20) -> Dict:
+        """
+        Audit entries matching the filters
+
+        Args:
+            table_name: Only changes to this table
+            record_id: Only changes to this record (requires table_name)
+            user_id: Only changes made by this user
+            since: Entries created at or after this time
+            until: Entries created before this time
+            cursor: next_cursor of the previous page
+            limit: Page size
+
+        Returns:
+            {'entries': [...], 'next_cursor': cursor or None on the last page,
+             'truncated': True if older entries may exist in archived months
+             that were not searched (no audit archive configured)}
+
+        Raises:
+            ValueError: record_id without table_name, or an invalid cursor
+        """
+        if record_id is not None and table_name is None:
+            raise ValueError("record_id requires a table")
+
+        conditions, params = [], []
+        for clause, value in (("al.table_name = %s", table_name), ("al.record_id = %s", record_id),
+                              ("al.user_id = %s", user_id), ("al.created_at >= %s", since),
+                              ("al.created_at < %s", until)):
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+        filters = {'table_name': table_name, 'record_id': record_id, 'user_id': user_id,
+                   'since': since, 'until': until}
+        return self._page(conditions, params, cursor, limit, filters)
+
+    def get_segment_history(self, segment_id: int, cursor: Optional[str] = None,
+                            limit: int = 20) -> Dict:
+        """
+        Changes to a segment and to all of its road details (including
+        deleted ones) in one query over audit_log.segment_id
+        """
+        return self._page(["al.segment_id = %s"], [segment_id], cursor, limit,
+                          {'segment_id': segment_id})
+
+
 class ReportManager:
     """Generate reports and analytics"""
     
+    # Summary tables (summary_tables.sql) backing each report
+    SUMMARY_TABLES = {
+        'nh_config_summary': 'mv_nh_config_summary',
+        'division_summary': 'mv_division_nh_summary',
+        'config_statistics': 'mv_nh_config_summary',
+        'division_wise': 'mv_nh_complete_overview'
+    }
+    
     def __init__(self, db: NHDatabase):
         self.db = db
+        self._summary_tables = None  # None until checked
+        self._user_activity = None
+        self._partition_executor = None
+        self._partition_pool = None
     
-    def get_nh_config_summary(self, nh_number: Optional[str] = None) -> List[Dict]:
-        """Get NH configuration summary"""
-        if nh_number:
+    def enable_partitioning(self, workers: int, pool: Optional[str] = None):
+        """
+        Compute the division-wise report as concurrent per-division queries
+        
+        Args:
+            workers: Partition queries running at once (across all requests)
+            pool: Database sub-pool the partition queries draw connections
+                  from; give it `workers` connections
+        """
+        self._partition_executor = ThreadPoolExecutor(max_workers=workers,
+                                                      thread_name_prefix='report-partition')
+        self._partition_pool = pool
+    
+    def has_summary_tables(self) -> bool:
+        """Check (once) whether the materialised summary tables are installed"""
+        if self._summary_tables is None:
             query = """
-                SELECT * FROM vw_nh_config_summary 
-                WHERE nh_number = %s
-                ORDER BY nh_number, config_name
+                SELECT COUNT(*) AS table_count FROM information_schema.tables
+                WHERE table_schema = DATABASE() AND table_name = 'mv_summary_state'
             """
-            return self.db.execute_query(query, (nh_number,)) or []
-        else:
-            query = "SELECT * FROM vw_nh_config_summary ORDER BY nh_number, config_name"
-            return self.db.execute_query(query) or []
+            results = self.db.execute_query(query)
+            if results is None:
+                return False  # Check failed - use the views and retry next time
+            self._summary_tables = results[0]['table_count'] > 0
+        return self._summary_tables
     
-    def get_division_summary(self, division_name: Optional[str] = None) -> List[Dict]:
-        """Get division-wise summary"""
-        if division_name:
+    def get_summary_status(self, report: str) -> Dict:
+        """
+        Get the data source and freshness of a report
+        
+        Summary tables are updated in the same transaction as each write, so
+        refreshed_at is the time of the last change (or full rebuild) applied.
+        
+        Args:
+            report: Key of SUMMARY_TABLES, e.g. 'nh_config_summary'
+        """
+        if not self.has_summary_tables():
+            return {'source': 'views', 'refreshed_at': datetime.now().isoformat()}
+        
+        table = self.SUMMARY_TABLES[report]
+        query = f"""
+            SELECT GREATEST(
+                COALESCE((SELECT MAX(updated_at) FROM {table}), '1970-01-01'),
+                COALESCE((SELECT last_rebuild_at FROM mv_summary_state
+                          WHERE summary_name = 'reports'), '1970-01-01')
+            ) AS refreshed_at
+        """
+        results = self.db.execute_query(query)
+        refreshed_at = results[0]['refreshed_at'] if results else None
+        if isinstance(refreshed_at, datetime):
+            refreshed_at = refreshed_at.isoformat()
+        return {'source': 'summary_tables', 'refreshed_at': refreshed_at}
+    
+    def _fetch(self, query: str, params: Optional[tuple] = None,
+               stream: bool = False) -> Union[List[Dict], Iterator[Dict]]:
+        """Run a report query, either fully fetched or as a row stream"""
+        if stream:
+            return self.db.stream_query(query, params)
+        return self.db.execute_query(query, params) or []
+    
+    def rebuild_summary_tables(self) -> bool:
+        """Fully rebuild the materialised summary tables from the base tables"""
+        result = self.db.execute_query("CALL sp_mv_rebuild_all()", fetch=False,
+                                       raise_on_error=True)
+        self._summary_tables = None
+        self._user_activity = None
+        return result is not None
+    
+    def get_nh_config_summary(self, nh_number: Optional[str] = None,
+                              stream: bool = False) -> List[Dict]:
+        """Get NH configuration summary (stream=True yields rows instead)"""
+        if self.has_summary_tables():
             query = """
-                SELECT * FROM vw_division_nh_summary 
-                WHERE division_name = %s
-                ORDER BY division_name, office_name, nh_number
+                SELECT nm.nh_number, nm.nh_name, rc.config_name,
+                       ROUND(s.total_length, 3) AS total_length,
+                       s.number_of_sections
+                FROM mv_nh_config_summary s
+                JOIN nh_master nm ON s.nh_id = nm.nh_id
+                JOIN road_configurations rc ON s.config_id = rc.config_id
             """
-            return self.db.execute_query(query, (division_name,)) or []
         else:
+            query = "SELECT * FROM vw_nh_config_summary"
+        
+        if nh_number:
+            query += " WHERE nh_number = %s ORDER BY nh_number, config_name"
+            return self._fetch(query, (nh_number,), stream)
+        else:
+            query += " ORDER BY nh_number, config_name"
+            return self._fetch(query, stream=stream)
+    
+    def get_division_summary(self, division_name: Optional[str] = None,
+                             stream: bool = False) -> List[Dict]:
+        """Get division-wise summary (stream=True yields rows instead)"""
+        if self.has_summary_tables():
             query = """
-                SELECT * FROM vw_division_nh_summary 
-                ORDER BY division_name, office_name, nh_number
+                SELECT d.division_name, d.office_name, nm.nh_number,
+                       s.segment_count, 1 AS nh_count,
+                       ROUND(s.total_length, 3) AS total_length
+                FROM mv_division_nh_summary s
+                JOIN divisions d ON s.division_id = d.division_id
+                JOIN nh_master nm ON s.nh_id = nm.nh_id
             """
-            return self.db.execute_query(query) or []
+        else:
+            query = "SELECT * FROM vw_division_nh_summary"
+        
+        if division_name:
+            query += " WHERE division_name = %s ORDER BY division_name, office_name, nh_number"
+            return self._fetch(query, (division_name,), stream)
+        else:
+            query += " ORDER BY division_name, office_name, nh_number"
+            return self._fetch(query, stream=stream)
     
-    def get_config_statistics(self) -> List[Dict]:
-        """Get configuration-wise statistics"""
-        query = "SELECT * FROM vw_config_statistics ORDER BY config_name"
-        return self.db.execute_query(query) or []
+    def get_config_statistics(self, stream: bool = False) -> List[Dict]:
+        """Get configuration-wise statistics (stream=True yields rows instead)"""
+        if self.has_summary_tables():
+            query = """
+                SELECT rc.config_name, rc.config_code, rc.display_order,
+                       COUNT(s.nh_id) AS num_highways,
+                       CAST(COALESCE(SUM(s.number_of_sections), 0) AS UNSIGNED) AS num_sections,
+                       ROUND(SUM(s.total_length), 3) AS total_length,
+                       ROUND(SUM(s.total_length) / SUM(s.number_of_sections), 3) AS avg_section_length,
+                       ROUND(MIN(s.min_section_length), 3) AS min_section_length,
+                       ROUND(MAX(s.max_section_length), 3) AS max_section_length
+                FROM road_configurations rc
+                LEFT JOIN mv_nh_config_summary s ON rc.config_id = s.config_id
+                GROUP BY rc.config_id, rc.config_name, rc.config_code, rc.display_order
+                ORDER BY config_name
+            """
+        else:
+            query = "SELECT * FROM vw_config_statistics ORDER BY config_name"
+        return self._fetch(query, stream=stream)
     
-    def get_config_details(self, config_id: int) -> List[Dict]:
-        """Get detailed chainage report for a specific configuration"""
+    def get_config_details(self, config_id: int, stream: bool = False) -> List[Dict]:
+        """Get detailed chainage report for a specific configuration (stream=True yields rows instead)"""
         query = """
             SELECT 
                 nm.nh_number,
@@ -455,32 +1624,69 @@ class ReportManager:
             WHERE rd.config_id = %s
             ORDER BY nm.nh_number, ns.start_chainage, rd.start_chainage
         """
-        return self.db.execute_query(query, (config_id,)) or []
+        return self._fetch(query, (config_id,), stream)
     
-    def get_division_wise_details(self, nh_number: Optional[str] = None, config_id: Optional[int] = None) -> List[Dict]:
-        """Get division-wise detailed report with optional NH and config filters"""
-        query = """
-            SELECT 
-                d.division_name,
-                d.office_name,
-                nm.nh_number,
-                nm.nh_name,
-                ns.segment_name,
-                ns.start_chainage AS segment_start,
-                ns.end_chainage AS segment_end,
-                ROUND(ns.end_chainage - ns.start_chainage, 3) AS segment_length,
-                rc.config_name,
-                rd.start_chainage AS config_start,
-                rd.end_chainage AS config_end,
-                ROUND(rd.end_chainage - rd.start_chainage, 3) AS config_length,
-                rd.remarks
-            FROM divisions d
-            JOIN nh_segments ns ON d.division_id = ns.division_office_id
-            JOIN nh_master nm ON ns.nh_id = nm.nh_id
-            LEFT JOIN nh_road_details rd ON ns.segment_id = rd.segment_id
-            LEFT JOIN road_configurations rc ON rd.config_id = rc.config_id
-            WHERE 1=1
-        """
+    def get_division_wise_details(self, nh_number: Optional[str] = None, config_id: Optional[int] = None,
+                                  stream: bool = False) -> List[Dict]:
+        """Get division-wise detailed report with optional NH and config filters (stream=True yields rows instead)"""
+        if self._partition_executor is not None:
+            rows = self._partitioned_division_wise(nh_number, config_id)
+            return rows if stream else list(rows)
+        query, params = self._division_wise_query(nh_number, config_id)
+        return self._fetch(query, params, stream)
+    
+    def _division_wise_query(self, nh_number: Optional[str], config_id: Optional[int],
+                             division_ids: Optional[List[int]] = None) -> Tuple[str, tuple]:
+        """Division-wise report query, optionally restricted to some divisions"""
+        if self.has_summary_tables():
+            query = """
+                SELECT 
+                    d.division_name,
+                    d.office_name,
+                    nm.nh_number,
+                    nm.nh_name,
+                    o.segment_name,
+                    o.segment_start,
+                    o.segment_end,
+                    ROUND(o.segment_end - o.segment_start, 3) AS segment_length,
+                    rc.config_name,
+                    o.config_start,
+                    o.config_end,
+                    ROUND(o.config_end - o.config_start, 3) AS config_length,
+                    o.remarks
+                FROM mv_nh_complete_overview o
+                JOIN divisions d ON o.division_id = d.division_id
+                JOIN nh_master nm ON o.nh_id = nm.nh_id
+                LEFT JOIN road_configurations rc ON o.config_id = rc.config_id
+                WHERE 1=1
+            """
+            config_column = "o.config_id"
+            order_by = " ORDER BY d.division_name, d.office_name, nm.nh_number, o.segment_start, o.config_start"
+        else:
+            query = """
+                SELECT 
+                    d.division_name,
+                    d.office_name,
+                    nm.nh_number,
+                    nm.nh_name,
+                    ns.segment_name,
+                    ns.start_chainage AS segment_start,
+                    ns.end_chainage AS segment_end,
+                    ROUND(ns.end_chainage - ns.start_chainage, 3) AS segment_length,
+                    rc.config_name,
+                    rd.start_chainage AS config_start,
+                    rd.end_chainage AS config_end,
+                    ROUND(rd.end_chainage - rd.start_chainage, 3) AS config_length,
+                    rd.remarks
+                FROM divisions d
+                JOIN nh_segments ns ON d.division_id = ns.division_office_id
+                JOIN nh_master nm ON ns.nh_id = nm.nh_id
+                LEFT JOIN nh_road_details rd ON ns.segment_id = rd.segment_id
+                LEFT JOIN road_configurations rc ON rd.config_id = rc.config_id
+                WHERE 1=1
+            """
+            config_column = "rd.config_id"
+            order_by = " ORDER BY d.division_name, d.office_name, nm.nh_number, ns.start_chainage, rd.start_chainage"
         params = []
         
         if nh_number and nh_number != 'ALL':
@@ -488,17 +1694,203 @@ class ReportManager:
             params.append(nh_number)
         
         if config_id:
-            query += " AND rd.config_id = %s"
+            query += f" AND {config_column} = %s"
             params.append(config_id)
         
-        query += " ORDER BY d.division_name, d.office_name, nm.nh_number, ns.start_chainage, rd.start_chainage"
+        if division_ids:
+            query += f" AND d.division_id IN ({', '.join(['%s'] * len(division_ids))})"
+            params.extend(division_ids)
+        
+        query += order_by
         
-        return self.db.execute_query(query, tuple(params)) if params else self.db.execute_query(query) or []
+        return query, tuple(params)
     
-    def get_user_activity(self) -> List[Dict]:
-        """Get user activity summary"""
-        query = "SELECT * FROM vw_user_activity ORDER BY role, division_name"
-        return self.db.execute_query(query) or []
+    def _partitioned_division_wise(self, nh_number: Optional[str],
+                                   config_id: Optional[int]) -> Iterator[Dict]:
+        """
+        Division-wise report computed one partition per division
+        
+        Divisions with the same name and office form one partition, and
+        partitions are emitted in (division_name, office_name) order, so the
+        concatenation is in the single query's ORDER BY order. All partitions
+        are queued at once; each is yielded as soon as it and those before it
+        are done.
+        """
+        groups = self.db.execute_query("""
+            SELECT GROUP_CONCAT(division_id) AS division_ids
+            FROM divisions
+            WHERE division_id IN (SELECT division_office_id FROM nh_segments)
+            GROUP BY division_name, office_name
+            ORDER BY division_name, office_name
+        """, raise_on_error=True)
+        
+        def run_partition(division_ids):
+            query, params = self._division_wise_query(nh_number, config_id, division_ids)
+            with self.db.use_pool(self._partition_pool):
+                return self.db.execute_query(query, params, raise_on_error=True) or []
+        
+        task = self.db.bind_context(run_partition)
+        futures = []
+        for group in groups:
+            ids = group['division_ids']
+            if isinstance(ids, (bytes, bytearray)):
+                ids = ids.decode('ascii')
+            futures.append(self._partition_executor.submit(
+                task, [int(i) for i in str(ids).split(',')]))
+        try:
+            for future in futures:
+                yield from future.result()
+        finally:
+            # Stream closed early or a partition failed: drop queued partitions
+            for future in futures:
+                future.cancel()
+    
+    def get_chainage_range(self, nh_number: str, from_chainage: float, to_chainage: float,
+                           after: Optional[float] = None,
+                           limit: Optional[int] = None) -> Optional[Dict]:
+        """
+        Get segments, clipped road details and per-config totals for a chainage window
+
+        Segments are read through the (nh_id, start_chainage) index: the only
+        segment starting before the window that can overlap it is the one with
+        the greatest start_chainage <= from_chainage, so the scan starts there.
+
+        Args:
+            nh_number: NH number, e.g. 'NH44'
+            from_chainage: Window start (km)
+            to_chainage: Window end (km)
+            after: Keyset cursor - only return segments starting after this chainage
+            limit: Maximum number of segments per page (None for all)
+
+        Returns:
+            Dict with segments (each with clipped details), config_totals for the
+            whole window (first page only) and next_cursor, or None if NH not found
+        """
+        nh_rows = self.db.execute_query(
+            "SELECT nh_id, nh_number, nh_name FROM nh_master WHERE nh_number = %s",
+            (nh_number,)
+        )
+        if not nh_rows:
+            return None
+        nh_id = nh_rows[0]['nh_id']
+
+        window_start = """
+            ns.nh_id = %s
+            AND ns.start_chainage >= COALESCE((
+                SELECT MAX(s2.start_chainage) FROM nh_segments s2
+                WHERE s2.nh_id = %s AND s2.start_chainage <= %s
+            ), %s)
+            AND ns.start_chainage < %s
+            AND ns.end_chainage > %s
+        """
+        window_params = [nh_id, nh_id, from_chainage, from_chainage,
+                         to_chainage, from_chainage]
+
+        segment_query = f"""
+            SELECT ns.segment_id, ns.segment_name, ns.start_chainage, ns.end_chainage,
+                   ns.status, ns.division_office_id, d.division_name, d.office_name
+            FROM nh_segments ns
+            JOIN divisions d ON ns.division_office_id = d.division_id
+            WHERE {window_start}
+        """
+        params = list(window_params)
+        if after is not None:
+            segment_query += " AND ns.start_chainage > %s"
+            params.append(after)
+        segment_query += " ORDER BY ns.start_chainage"
+        if limit:
+            segment_query += " LIMIT %s"
+            params.append(int(limit))
+
+        segments = self.db.execute_query(segment_query, tuple(params), raise_on_error=True)
+
+        details_by_segment = {}
+        if segments:
+            placeholders = ', '.join(['%s'] * len(segments))
+            detail_query = f"""
+                SELECT rd.detail_id, rd.segment_id, rd.config_id, rc.config_name,
+                       rc.config_code, rd.start_chainage, rd.end_chainage, rd.remarks
+                FROM nh_road_details rd
+                JOIN road_configurations rc ON rd.config_id = rc.config_id
+                WHERE rd.segment_id IN ({placeholders})
+                  AND rd.start_chainage < %s
+                  AND rd.end_chainage > %s
+                ORDER BY rd.segment_id, rd.start_chainage
+            """
+            detail_params = tuple(s['segment_id'] for s in segments) + (to_chainage, from_chainage)
+            for detail in self.db.execute_query(detail_query, detail_params, raise_on_error=True):
+                start = max(float(detail['start_chainage']), from_chainage)
+                end = min(float(detail['end_chainage']), to_chainage)
+                detail['clipped_start'] = start
+                detail['clipped_end'] = end
+                detail['clipped_length'] = round(end - start, 3)
+                details_by_segment.setdefault(detail['segment_id'], []).append(detail)
+
+        for segment in segments:
+            segment['details'] = details_by_segment.get(segment['segment_id'], [])
+
+        result = {
+            'nh_number': nh_number,
+            'from_chainage': from_chainage,
+            'to_chainage': to_chainage,
+            'segments': segments,
+            'next_cursor': None
+        }
+        if limit and len(segments) == int(limit):
+            result['next_cursor'] = float(segments[-1]['start_chainage'])
+
+        if after is None:
+            totals_query = f"""
+                SELECT rc.config_id, rc.config_name, rc.config_code,
+                       ROUND(SUM(LEAST(rd.end_chainage, %s)
+                                 - GREATEST(rd.start_chainage, %s)), 3) AS total_length,
+                       COUNT(rd.detail_id) AS number_of_sections
+                FROM nh_segments ns
+                JOIN nh_road_details rd ON ns.segment_id = rd.segment_id
+                JOIN road_configurations rc ON rd.config_id = rc.config_id
+                WHERE {window_start}
+                  AND rd.start_chainage < %s
+                  AND rd.end_chainage > %s
+                GROUP BY rc.config_id, rc.config_name, rc.config_code, rc.display_order
+                ORDER BY rc.display_order
+            """
+            totals_params = ([to_chainage, from_chainage] + window_params
+                             + [to_chainage, from_chainage])
+            result['config_totals'] = self.db.execute_query(
+                totals_query, tuple(totals_params), raise_on_error=True)
+
+        return result
+
+    def has_user_activity(self) -> bool:
+        """Check (once) whether the per-user activity counters are installed"""
+        if self._user_activity is None:
+            query = """
+                SELECT COUNT(*) AS table_count FROM information_schema.tables
+                WHERE table_schema = DATABASE() AND table_name = 'mv_user_activity'
+            """
+            results = self.db.execute_query(query)
+            if results is None:
+                return False  # Check failed - use the view and retry next time
+            self._user_activity = results[0]['table_count'] > 0
+        return self._user_activity
+    
+    def get_user_activity(self, stream: bool = False) -> List[Dict]:
+        """Get user activity summary (stream=True yields rows instead)"""
+        if self.has_user_activity():
+            # One primary key lookup per user instead of counting their rows
+            query = """
+                SELECT u.username, u.full_name, u.role, d.division_name, d.office_name,
+                       COALESCE(a.segments_created, 0) AS segments_created,
+                       COALESCE(a.details_created, 0) AS details_created,
+                       a.last_activity_at, u.last_login, u.is_active
+                FROM users u
+                LEFT JOIN divisions d ON u.division_office_id = d.division_id
+                LEFT JOIN mv_user_activity a ON u.user_id = a.user_id
+                ORDER BY u.role, d.division_name
+            """
+        else:
+            query = "SELECT * FROM vw_user_activity ORDER BY role, division_name"
+        return self._fetch(query, stream=stream)
 
 
 # Example usage
@@ -0,0 +1,10 @@
+-- Performance indexes for existing NH Management databases
+-- database_schema.sql already creates these for new installations.
+-- Run once: mysql -u root -p nh_management < performance_indexes.sql
+
+-- ============================================================================
+-- CHAINAGE RANGE ACCESS PATHS
+-- Used by ReportManager.get_chainage_range (/api/nh/<nh_number>/range)
+-- ============================================================================
+CREATE INDEX idx_segments_nh_chainage ON nh_segments(nh_id, start_chainage);
+CREATE INDEX idx_details_segment_chainage ON nh_road_details(segment_id, start_chainage);
@@ -0,0 +1,500 @@
+"""
+National Highways Management System - Read Model
+Holds the whole network (NHs, divisions, configurations, segments and road
+details) in memory, indexed by id, NH and division, so the everyday listing
+endpoints are answered without a database round-trip (READ_MODEL=True).
+
+The model is loaded once with one query per table and then follows
+audit_log by log_id: the segments and details named by new entries (and by
+writes made through this process) are re-read by primary key, and the small
+reference tables are reloaded when their row count or latest updated_at
+changes.
+
+Staleness is bounded: a read is only answered from memory if the last
+successful sync started at most MAX_STALENESS seconds ago, and a read issued
+after a write through this process waits for a sync that includes it. In
+every other case (still loading, database errors, include_archived) the
+read goes to the database as before.
+
+With WARM_CACHE=True the loaded rows are restored from the last snapshot on
+startup and the first sync only catches up on the entries written since.
+"""
+
+from typing import Optional, List, Dict, Iterable, Callable
+from decimal import Decimal, ROUND_HALF_UP
+import functools
+import threading
+import time
+
+from nh_management import NHDatabase
+
+
+# Entries this far below the high-water mark are re-read, so changes from
+# transactions that commit after a later log_id was seen are not missed
+TAIL_LOOKBACK = 1000
+
+# Ids per IN (...) lookup
+LOOKUP_BATCH = 500
+
+# Reference table -> (model table, id column)
+REFERENCE_TABLES = {
+    'nh_master': ('nh', 'nh_id'),
+    'divisions': ('divisions', 'division_id'),
+    'road_configurations': ('configs', 'config_id')
+}
+
+WATCHED_TABLES = ('nh_segments', 'nh_road_details', 'audit_log') + tuple(REFERENCE_TABLES)
+
+
+def _sort_text(value: Optional[str]) -> str:
+    """Sort key approximating the case-insensitive collation"""
+    return (value or '').lower()
+
+
+def _index(tables: Dict[str, Dict[int, Dict]]) -> tuple:
+    """Segment ids by NH and division, detail ids by segment"""
+    by_nh, by_division, by_segment = {}, {}, {}
+    for segment_id, segment in tables['segments'].items():
+        by_nh.setdefault(segment['nh_id'], set()).add(segment_id)
+        by_division.setdefault(segment['division_office_id'], set()).add(segment_id)
+    for detail_id, detail in tables['details'].items():
+        by_segment.setdefault(detail['segment_id'], set()).add(detail_id)
+    return by_nh, by_division, by_segment
+
+
+class ReadModel:
+    """In-memory copy of the network kept in sync by tailing audit_log"""
+
+    def __init__(self, db: NHDatabase, max_staleness: float = 5.0, poll_interval: float = 1.0,
+                 write_wait: float = 2.0, segment_stats: Optional[Callable[[], bool]] = None,
+                 pool: Optional[str] = None):
+        """
+        Args:
+            db: Database handle
+            max_staleness: Oldest sync (seconds) reads are still answered from
+            poll_interval: Seconds between audit_log polls
+            write_wait: Seconds a read waits for a local write to be synced
+                        before going to the database instead
+            segment_stats: Whether segment rows carry the mv_segment_stats
+                           fields (e.g. SegmentManager.has_segment_stats)
+            pool: Database sub-pool the sync thread draws connections from
+        """
+        self.db = db
+        self.max_staleness = max_staleness
+        self.poll_interval = poll_interval
+        self.write_wait = write_wait
+        self.segment_stats = segment_stats
+        self.pool = pool
+
+        self._tables = None  # model table -> {id: row}
+        self._by_nh = {}  # nh_id -> {segment_id}
+        self._by_division = {}  # division_id -> {segment_id}
+        self._by_segment = {}  # segment_id -> {detail_id}
+        self._with_stats = False
+        self._signatures = {}  # reference table -> (row count, latest updated_at)
+        self._high_water = None
+        self._seen = set()  # log_ids within TAIL_LOOKBACK of the high-water mark
+        self._touched = {'nh_segments': set(), 'nh_road_details': set()}
+        self._reload_references = False
+        self._changes = 0  # Local writes notified so far
+        self._synced_changes = 0  # Local writes included in the last sync
+        self._synced_at = None  # monotonic start time of the last successful sync
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_sync_error = None
+
+        db.add_change_listener(self._on_change)
+
+    def _on_change(self, table_name: str, action: str,
+                   record_id: Optional[int], values: Dict):
+        if table_name not in WATCHED_TABLES:
+            return
+        with self._cond:
+            if table_name in self._touched and record_id is not None:
+                self._touched[table_name].add(record_id)
+            elif table_name in REFERENCE_TABLES:
+                self._reload_references = True
+            if table_name != 'audit_log':
+                self._changes += 1
+        self._wake.set()
+
+    # ------------------------------------------------------------------
+    # Loading and syncing
+    # ------------------------------------------------------------------
+
+    def _rows_by_id(self, table_name: str, column: str, ids: Iterable[int]) -> List[Dict]:
+        ids = sorted(ids)
+        rows = []
+        for start in range(0, len(ids), LOOKUP_BATCH):
+            batch = ids[start:start + LOOKUP_BATCH]
+            rows.extend(self.db.execute_query(
+                f"SELECT * FROM {table_name} WHERE {column} IN ({', '.join(['%s'] * len(batch))})",
+                tuple(batch), raise_on_error=True))
+        return rows
+
+    def _reference_signatures(self) -> Dict[str, tuple]:
+        rows = self.db.execute_query(" UNION ALL ".join(
+            f"SELECT '{table}' AS table_name, COUNT(*) AS row_count, MAX(updated_at) AS updated_at "
+            f"FROM {table}" for table in REFERENCE_TABLES), raise_on_error=True)
+        return {row['table_name']: (row['row_count'], row['updated_at']) for row in rows}
+
+    def _load_references(self) -> Dict[str, Dict[int, Dict]]:
+        return {model: {row[key]: row for row in self.db.execute_query(
+                    f"SELECT * FROM {table}", raise_on_error=True)}
+                for table, (model, key) in REFERENCE_TABLES.items()}
+
+    def load(self):
+        """Load everything (one query per table)"""
+        rows = self.db.execute_query(
+            "SELECT COALESCE(MAX(log_id), 0) AS log_id FROM audit_log", raise_on_error=True)
+        high_water = int(rows[0]['log_id'])
+        # Entries already committed below the mark are reflected by the reads below
+        seen = {row['log_id'] for row in self.db.execute_query(
+            "SELECT log_id FROM audit_log WHERE log_id > %s AND log_id <= %s",
+            (high_water - TAIL_LOOKBACK, high_water), raise_on_error=True)}
+        started = time.monotonic()
+        with self._cond:
+            changes = self._changes
+            for ids in self._touched.values():
+                ids.clear()
+            self._reload_references = False
+
+        signatures = self._reference_signatures()
+        tables = self._load_references()
+        tables['segments'] = {row['segment_id']: row for row in self.db.stream_query(
+            "SELECT * FROM nh_segments")}
+        tables['details'] = {row['detail_id']: row for row in self.db.stream_query(
+            "SELECT * FROM nh_road_details")}
+        with_stats = bool(self.segment_stats and self.segment_stats())
+
+        by_nh, by_division, by_segment = _index(tables)
+
+        with self._cond:
+            self._tables = tables
+            self._by_nh, self._by_division, self._by_segment = by_nh, by_division, by_segment
+            self._with_stats = with_stats
+            self._signatures = signatures
+            self._high_water = high_water
+            self._seen = seen
+            self._synced_changes = changes
+            self._synced_at = started
+            self._cond.notify_all()
+
+    def sync(self) -> int:
+        """Apply changes since the last sync; returns the number of rows re-read"""
+        if self._tables is None:
+            self.load()
+            return 0
+
+        started = time.monotonic()
+        with self._cond:
+            changes = self._changes
+            touched = {table: set(ids) for table, ids in self._touched.items()}
+            for ids in self._touched.values():
+                ids.clear()
+            reload_references = self._reload_references
+            self._reload_references = False
+
+        try:
+            entries = self.db.execute_query("""
+                SELECT log_id, table_name, record_id FROM audit_log
+                WHERE log_id > %s
+                ORDER BY log_id
+            """, (self._high_water - TAIL_LOOKBACK,), raise_on_error=True)
+            entries = [e for e in entries if e['log_id'] not in self._seen]
+            for entry in entries:
+                if entry['table_name'] in touched:
+                    touched[entry['table_name']].add(entry['record_id'])
+                elif entry['table_name'] in REFERENCE_TABLES:
+                    reload_references = True  # Deletes audited by sync_support.sql
+
+            segment_ids = touched['nh_segments']
+            segments = self._rows_by_id('nh_segments', 'segment_id', segment_ids)
+            # Re-read whole segments: cascaded deletes and restored segments
+            # change details without entries of their own
+            details = self._rows_by_id('nh_road_details', 'segment_id', segment_ids)
+            details += self._rows_by_id('nh_road_details', 'detail_id',
+                                        touched['nh_road_details']
+                                        - {row['detail_id'] for row in details})
+
+            signatures = self._reference_signatures()
+            references = None
+            if reload_references or signatures != self._signatures:
+                references = self._load_references()
+        except Exception:
+            with self._cond:
+                for table, ids in touched.items():
+                    self._touched[table] |= ids
+                self._reload_references = self._reload_references or reload_references
+            raise
+
+        with self._cond:
+            tables = self._tables
+            if references is not None:
+                tables.update(references)
+            self._signatures = signatures
+
+            found = {row['segment_id']: row for row in segments}
+            for segment_id in segment_ids:
+                self._remove_segment(segment_id)
+                for detail_id in self._by_segment.pop(segment_id, set()):
+                    tables['details'].pop(detail_id, None)
+                if segment_id in found:
+                    self._add_segment(found[segment_id])
+
+            found_details = {row['detail_id']: row for row in details}
+            for detail_id in touched['nh_road_details'] | set(found_details):
+                self._remove_detail(detail_id)
+                row = found_details.get(detail_id)
+                if row is not None and row['segment_id'] in tables['segments']:
+                    tables['details'][detail_id] = row
+                    self._by_segment.setdefault(row['segment_id'], set()).add(detail_id)
+
+            if entries:
+                self._seen.update(e['log_id'] for e in entries)
+                self._high_water = max(self._high_water, entries[-1]['log_id'])
+                self._seen = {i for i in self._seen if i > self._high_water - TAIL_LOOKBACK}
+            self._synced_changes = changes
+            self._synced_at = started
+            self._cond.notify_all()
+        return len(segments) + len(details)
+
+    def export_state(self) -> Optional[Dict]:
+        """Loaded rows and tailing position, for warm_cache.WarmCache"""
+        with self._cond:
+            if self._tables is None:
+                return None
+            return {'tables': {name: dict(rows) for name, rows in self._tables.items()},
+                    'signatures': dict(self._signatures),
+                    'high_water': self._high_water,
+                    'seen': set(self._seen)}
+
+    def import_state(self, state: Dict, current: Dict) -> bool:
+        """
+        Take over saved rows; the first sync then catches up from their mark
+
+        Rejected (the model loads cold) when audit entries written since the
+        mark are no longer in audit_log, or the database is behind the mark.
+        """
+        high_water = state['high_water']
+        oldest = current['oldest_log_id']
+        if current['log_id'] < high_water or (oldest is not None and high_water < oldest - 1):
+            return False
+        tables = state['tables']
+        with_stats = bool(self.segment_stats and self.segment_stats())
+
+        by_nh, by_division, by_segment = _index(tables)
+
+        with self._cond:
+            self._tables = tables
+            self._by_nh, self._by_division, self._by_segment = by_nh, by_division, by_segment
+            self._with_stats = with_stats
+            self._signatures = state['signatures']
+            self._high_water = high_water
+            self._seen = state['seen']
+            self._synced_at = None  # Not fresh until the first sync
+        return True
+
+    def _add_segment(self, row: Dict):
+        self._tables['segments'][row['segment_id']] = row
+        self._by_nh.setdefault(row['nh_id'], set()).add(row['segment_id'])
+        self._by_division.setdefault(row['division_office_id'], set()).add(row['segment_id'])
+
+    def _remove_segment(self, segment_id: int):
+        row = self._tables['segments'].pop(segment_id, None)
+        if row is not None:
+            self._by_nh.get(row['nh_id'], set()).discard(segment_id)
+            self._by_division.get(row['division_office_id'], set()).discard(segment_id)
+
+    def _remove_detail(self, detail_id: int):
+        row = self._tables['details'].pop(detail_id, None)
+        if row is not None:
+            self._by_segment.get(row['segment_id'], set()).discard(detail_id)
+
+    # ------------------------------------------------------------------
+    # Freshness
+    # ------------------------------------------------------------------
+
+    def is_fresh(self) -> bool:
+        """
+        Whether reads can be answered from memory now
+
+        Waits up to write_wait for local writes to be synced.
+        """
+        deadline = time.monotonic() + self.write_wait
+        with self._cond:
+            changes = self._changes
+            while self._synced_changes < changes:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._wake.set()
+                self._cond.wait(remaining)
+            return (self._synced_at is not None
+                    and time.monotonic() - self._synced_at <= self.max_staleness)
+
+    # ------------------------------------------------------------------
+    # Reads (rows shaped like the corresponding manager queries)
+    # ------------------------------------------------------------------
+
+    def _segment_row(self, segment: Dict, nh: bool = True, division: bool = True) -> Optional[Dict]:
+        tables = self._tables
+        nh_row = tables['nh'].get(segment['nh_id'])
+        division_row = tables['divisions'].get(segment['division_office_id'])
+        if nh_row is None or division_row is None:
+            return None  # Inner joins in the SQL versions
+        row = dict(segment)
+        if nh:
+            row['nh_number'] = nh_row['nh_number']
+            row['nh_name'] = nh_row['nh_name']
+        if division:
+            row['division_name'] = division_row['division_name']
+            row['office_name'] = division_row['office_name']
+        return row
+
+    def _with_segment_stats(self, row: Dict) -> Dict:
+        if not self._with_stats:
+            return row
+        details = [self._tables['details'][i] for i in self._by_segment.get(row['segment_id'], ())]
+        configured = sum((d['end_chainage'] - d['start_chainage'] for d in details), Decimal('0.000'))
+        length = row['end_chainage'] - row['start_chainage']
+        row['detail_count'] = len(details)
+        row['configured_length'] = configured
+        row['coverage_pct'] = (configured / length * 100).quantize(Decimal('0.01'), ROUND_HALF_UP)
+        row['last_modified_at'] = max([row['updated_at']] + [d['updated_at'] for d in details])
+        return row
+
+    def _segments(self, segment_ids: Iterable[int], nh: bool = True,
+                  division: bool = True, stats: bool = True) -> List[Dict]:
+        rows = []
+        for segment_id in segment_ids:
+            row = self._segment_row(self._tables['segments'][segment_id], nh, division)
+            if row is not None:
+                rows.append(self._with_segment_stats(row) if stats else row)
+        return rows
+
+    def _by_nh_and_chainage(self, row: Dict) -> tuple:
+        return (_sort_text(self._tables['nh'][row['nh_id']]['nh_number']), row['start_chainage'])
+
+    def get_all_nhs(self) -> List[Dict]:
+        with self._cond:
+            rows = [dict(row) for row in self._tables['nh'].values()]
+        return sorted(rows, key=lambda row: _sort_text(row['nh_number']))
+
+    def get_divisions(self) -> List[Dict]:
+        with self._cond:
+            rows = [dict(row) for row in self._tables['divisions'].values()]
+        return sorted(rows, key=lambda row: (_sort_text(row['division_name']),
+                                             _sort_text(row['office_name'])))
+
+    def get_configurations(self) -> List[Dict]:
+        with self._cond:
+            rows = [dict(row) for row in self._tables['configs'].values() if row['is_active']]
+        return sorted(rows, key=lambda row: row['display_order'])
+
+    def get_nh_segments(self, nh_id: int) -> List[Dict]:
+        with self._cond:
+            rows = self._segments(self._by_nh.get(int(nh_id), ()), nh=False, stats=False)
+        return sorted(rows, key=lambda row: row['start_chainage'])
+
+    def get_segments_by_division(self, division_office_id: int) -> List[Dict]:
+        with self._cond:
+            rows = self._segments(self._by_division.get(int(division_office_id), ()),
+                                  division=False)
+            rows.sort(key=self._by_nh_and_chainage)
+        return rows
+
+    def get_all_segments(self) -> List[Dict]:
+        with self._cond:
+            rows = self._segments(self._tables['segments'])
+            rows.sort(key=self._by_nh_and_chainage)
+        return rows
+
+    def get_segment(self, segment_id: int) -> Optional[Dict]:
+        with self._cond:
+            if int(segment_id) not in self._tables['segments']:
+                return None
+            rows = self._segments([int(segment_id)])
+        return rows[0] if rows else None
+
+    def get_road_details(self, segment_id: int) -> List[Dict]:
+        with self._cond:
+            rows = []
+            for detail_id in self._by_segment.get(int(segment_id), ()):
+                detail = self._tables['details'][detail_id]
+                config = self._tables['configs'].get(detail['config_id'])
+                if config is not None:
+                    rows.append(dict(detail, config_name=config['config_name'],
+                                     config_code=config['config_code']))
+        return sorted(rows, key=lambda row: row['start_chainage'])
+
+    # ------------------------------------------------------------------
+    # Background syncing
+    # ------------------------------------------------------------------
+
+    def status(self) -> Dict:
+        with self._cond:
+            loaded = self._tables is not None
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'loaded': loaded,
+                'segments': len(self._tables['segments']) if loaded else 0,
+                'details': len(self._tables['details']) if loaded else 0,
+                'high_water_log_id': self._high_water,
+                'staleness_seconds': (round(time.monotonic() - self._synced_at, 3)
+                                      if self._synced_at is not None else None),
+                'last_sync_error': self.last_sync_error
+            }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.db.use_pool(self.pool):
+                    self.sync()
+                self.last_sync_error = None
+            except Exception as e:
+                self.last_sync_error = str(e)
+                print(f"Error syncing read model: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def start(self):
+        """Start loading and then following audit_log in the background"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='read-model', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background sync thread"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+def serve_from_read_model(model: ReadModel, manager, methods: Dict[str, str]):
+    """
+    Answer a manager's read methods from the read model while it is fresh
+
+    Calls with include_archived=True (the model holds live segments only) or
+    while the model is stale go to the original method.
+
+    Args:
+        model: Read model
+        manager: Manager instance, e.g. a SegmentManager
+        methods: Manager method name -> ReadModel method name
+    """
+    for name, model_name in methods.items():
+        original = getattr(manager, name)
+        from_model = getattr(model, model_name)
+
+        @functools.wraps(original)
+        def read(*args, _original=original, _from_model=from_model, **kwargs):
+            if any(kwargs.values()) or not model.is_fresh():
+                return _original(*args, **kwargs)
+            return _from_model(*args)
+        setattr(manager, name, read)
@@ -0,0 +1,46 @@
+"""
+Rebuild the materialised report summary tables (summary_tables.sql)
+
+Triggers keep the summaries current on every write; run this after bulk
+loads, manual SQL fixes, or if the summaries are suspected to have drifted.
+Usage: python rebuild_summaries.py
+"""
+
+import os
+from dotenv import load_dotenv
+from nh_management import NHDatabase, ReportManager
+
+
+def rebuild_summaries():
+    """Run sp_mv_rebuild_all() and print the resulting row counts"""
+    load_dotenv()
+    db = NHDatabase(
+        host=os.getenv('DB_HOST', 'localhost'),
+        database=os.getenv('DB_NAME', 'nh_management'),
+        user=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', ''),
+        port=int(os.getenv('DB_PORT', '3306'))
+    )
+    if not db.connect():
+        print("❌ Failed to connect to database")
+        return False
+
+    report_mgr = ReportManager(db)
+    if not report_mgr.has_summary_tables():
+        print("❌ Summary tables not installed - run summary_tables.sql first")
+        return False
+
+    print("📋 Rebuilding summary tables...")
+    report_mgr.rebuild_summary_tables()
+
+    for table in ['mv_nh_config_summary', 'mv_division_nh_summary', 'mv_nh_complete_overview',
+                  'mv_segment_stats', 'mv_user_activity']:
+        rows = db.execute_query(f"SELECT COUNT(*) AS row_count FROM {table}")
+        print(f"   ✓ {table}: {rows[0]['row_count'] if rows else '?'} rows")
+
+    print("\n✅ Summary tables rebuilt")
+    return True
+
+
+if __name__ == "__main__":
+    rebuild_summaries()
@@ -0,0 +1,60 @@
+"""
+Drift check and repair for the per-segment aggregates (mv_segment_stats)
+
+Triggers keep the aggregates current on every write; details removed by
+ON DELETE CASCADE or changed with triggers disabled are not seen by them.
+This compares the aggregates with the base tables and recomputes any
+segment that differs. Safe to run repeatedly; schedule it daily.
+Usage: python reconcile_segment_stats.py [--check]
+"""
+
+import os
+import sys
+from dotenv import load_dotenv
+from nh_management import NHDatabase, SegmentManager
+
+
+def reconcile_segment_stats(fix: bool = True):
+    """Report drifted segments and (unless fix=False) recompute them"""
+    load_dotenv()
+    db = NHDatabase(
+        host=os.getenv('DB_HOST', 'localhost'),
+        database=os.getenv('DB_NAME', 'nh_management'),
+        user=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', ''),
+        port=int(os.getenv('DB_PORT', '3306'))
+    )
+    if not db.connect():
+        print("❌ Failed to connect to database")
+        return False
+
+    segment_mgr = SegmentManager(db)
+    if not segment_mgr.has_segment_stats():
+        print("❌ mv_segment_stats not installed - run summary_tables.sql first")
+        return False
+
+    print("📋 Checking segment aggregates...")
+    result = segment_mgr.reconcile_segment_stats(fix=fix)
+    for row in result['drifted']:
+        if row['detail_count'] is None:
+            print(f"   ✗ Segment {row['segment_id']}: missing")
+        else:
+            print(f"   ✗ Segment {row['segment_id']}: "
+                  f"{row['detail_count']} details / {row['configured_length']} km / {row['coverage_pct']}% "
+                  f"stored, {row['actual_detail_count']} / {row['actual_configured_length']} km / "
+                  f"{row['actual_coverage_pct']}% actual")
+    for segment_id in result['orphaned']:
+        print(f"   ✗ Segment {segment_id}: aggregates for a deleted segment")
+
+    drift = len(result['drifted']) + len(result['orphaned'])
+    if not drift:
+        print("\n✅ No drift")
+    elif fix:
+        print(f"\n✅ {drift} segments recomputed")
+    else:
+        print(f"\n⚠️  {drift} segments drifted (run without --check to fix)")
+    return True
+
+
+if __name__ == "__main__":
+    reconcile_segment_stats(fix='--check' not in sys.argv[1:])
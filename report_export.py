@@ -0,0 +1,215 @@
+"""
+National Highways Management System - Streaming Report Export
+Serializes report rows to CSV, NDJSON or XLSX incrementally, so an export is
+written to the response while rows are still being read from the database.
+
+Each writer is a generator over row dicts that yields encoded byte chunks;
+at most one chunk of rows is held in memory at a time.
+"""
+
+from typing import Optional, Dict, Iterable, Iterator, List
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+import csv
+import io
+import json
+import re
+import zipfile
+
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+# Rows serialized between flushes to the response
+CHUNK_ROWS = 1000
+
+
+def choose_format(format_arg: Optional[str], accept_mimetypes) -> Optional[str]:
+    """
+    Pick the export format for a request
+
+    Args:
+        format_arg: Value of ?format= (takes precedence), e.g. 'csv'
+        accept_mimetypes: request.accept_mimetypes
+
+    Returns:
+        'csv', 'ndjson' or 'xlsx', or None for the regular JSON response
+
+    Raises:
+        ValueError: Unknown ?format= value
+    """
+    if format_arg:
+        fmt = format_arg.lower()
+        if fmt == 'json':
+            return None
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown format '{format_arg}'. "
+                             f"Available: json, {', '.join(EXPORT_FORMATS)}")
+        return fmt
+
+    # JSON first so that */* and missing Accept headers keep the JSON API
+    best = accept_mimetypes.best_match(['application/json'] + list(EXPORT_FORMATS.values()))
+    for fmt, mimetype in EXPORT_FORMATS.items():
+        if best == mimetype:
+            return fmt
+    return None
+
+
+def _plain(value):
+    """Convert database values to JSON/CSV friendly types"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(rows: Iterable[Dict]) -> Iterator[bytes]:
+    """Yield a CSV file (header from the first row's keys) in chunks"""
+    buffer = io.StringIO()
+    writer = None
+    for i, row in enumerate(rows, 1):
+        if writer is None:
+            writer = csv.writer(buffer)
+            writer.writerow(row.keys())
+        writer.writerow(row.values())
+        if i % CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def stream_ndjson(rows: Iterable[Dict]) -> Iterator[bytes]:
+    """Yield one JSON object per line, in chunks"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({k: _plain(v) for k, v in row.items()}))
+        if len(lines) == CHUNK_ROWS:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+# ----------------------------------------------------------------------
+# XLSX
+# ----------------------------------------------------------------------
+
+# Characters not allowed in XML 1.0 text
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+</Types>"""
+
+_ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+_WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+_WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+</Relationships>"""
+
+_SHEET_START = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>"""
+
+_SHEET_END = "</sheetData></worksheet>"
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """Write-only, non-seekable sink that hands written bytes back in chunks"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _xlsx_cell(value) -> str:
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    text = _INVALID_XML.sub('', str(_plain(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _xlsx_row(values: Iterable) -> str:
+    return '<row>' + ''.join(_xlsx_cell(v) for v in values) + '</row>'
+
+
+def stream_xlsx(rows: Iterable[Dict], sheet_name: str = 'Report') -> Iterator[bytes]:
+    """
+    Yield an XLSX workbook with one sheet, in chunks
+
+    The worksheet uses inline strings (no shared string table to build up
+    front) and is deflated straight into a streamed ZIP, so the workbook is
+    never assembled in memory.
+    """
+    sink = _ChunkBuffer()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _ROOT_RELS)
+        archive.writestr('xl/workbook.xml',
+                         _WORKBOOK.format(sheet_name=escape(sheet_name[:31], {'"': '&quot;'})))
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        yield sink.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(_SHEET_START.encode('utf-8'))
+            pending: List[str] = []
+            for i, row in enumerate(rows, 1):
+                if i == 1:
+                    pending.append(_xlsx_row(row.keys()))
+                pending.append(_xlsx_row(row.values()))
+                if i % CHUNK_ROWS == 0:
+                    sheet.write(''.join(pending).encode('utf-8'))
+                    pending = []
+                    chunk = sink.drain()
+                    if chunk:
+                        yield chunk
+            sheet.write((''.join(pending) + _SHEET_END).encode('utf-8'))
+    yield sink.drain()
+
+
+WRITERS = {
+    'csv': stream_csv,
+    'ndjson': stream_ndjson,
+    'xlsx': stream_xlsx
+}
+
+
+def stream_export(rows: Iterable[Dict], fmt: str, name: str = 'Report') -> Iterator[bytes]:
+    """Yield the rows serialized in the given export format"""
+    if fmt == 'xlsx':
+        return stream_xlsx(rows, sheet_name=name)
+    return WRITERS[fmt](rows)
@@ -0,0 +1,269 @@
+"""
+National Highways Management System - Asynchronous Report Jobs
+Runs heavy report exports on a bounded background worker pool and keeps the
+finished artifacts in a local spool directory until they expire.
+
+Job state is mirrored to <job_id>.meta.json in the spool, so a status poll
+served by another worker process on the same host still finds the job.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Iterable, Callable
+from datetime import datetime
+import csv
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+from nh_management import ReportManager
+
+
+JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+# Report name -> (required params, function(report_mgr, params) returning a row stream)
+REPORTS = {
+    'division-wise': ((), lambda mgr, p: mgr.get_division_wise_details(
+        p.get('nh_number'), p.get('config_id'), stream=True)),
+    'config-details': (('config_id',), lambda mgr, p: mgr.get_config_details(
+        p['config_id'], stream=True)),
+    'nh-summary': ((), lambda mgr, p: mgr.get_nh_config_summary(p.get('nh_number'), stream=True)),
+    'division-summary': ((), lambda mgr, p: mgr.get_division_summary(p.get('division_name'),
+                                                                      stream=True)),
+    'config-statistics': ((), lambda mgr, p: mgr.get_config_statistics(stream=True)),
+    'user-activity': ((), lambda mgr, p: mgr.get_user_activity(stream=True))
+}
+
+FORMATS = {
+    'json': 'application/json',
+    'csv': 'text/csv'
+}
+
+
+class ReportJobManager:
+    """Bounded background execution of report jobs with spooled results"""
+
+    def __init__(self, report_mgr: ReportManager, spool_dir: str = os.path.join('cache', 'report_jobs'),
+                 max_workers: int = 2, max_pending: int = 20, ttl: int = 3600,
+                 pool: Optional[str] = None, time_budget_ms: Optional[int] = None):
+        """
+        Args:
+            report_mgr: Report manager used to run the reports
+            spool_dir: Directory for finished artifacts and job state
+            max_workers: Reports that may run at the same time
+            max_pending: Queued + running jobs accepted before rejecting new ones
+            ttl: Seconds a finished artifact is kept
+            pool: Database sub-pool the workers draw connections from
+            time_budget_ms: Query time budget per job, replacing the shorter
+                            interactive budgets (None for unbounded)
+        """
+        self.report_mgr = report_mgr
+        self.spool_dir = spool_dir
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.pool = pool
+        self.time_budget_ms = time_budget_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='report-job')
+        self._jobs = {}  # job_id -> job dict
+        self._lock = threading.Lock()
+        os.makedirs(spool_dir, exist_ok=True)
+        self.cleanup()
+
+    # ------------------------------------------------------------------
+    # Job state
+    # ------------------------------------------------------------------
+
+    def _meta_path(self, job_id: str) -> str:
+        return os.path.join(self.spool_dir, f"{job_id}.meta.json")
+
+    def _save_state(self, job: Dict):
+        tmp_path = self._meta_path(job['job_id']) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(job, f, default=str)
+        os.replace(tmp_path, self._meta_path(job['job_id']))
+
+    def _update(self, job_id: str, **changes):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(changes)
+            snapshot = dict(job)
+        try:
+            self._save_state(snapshot)
+        except OSError as e:
+            print(f"Error saving report job state {job_id}: {e}")
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Get a job's status, from memory or the spool"""
+        if not JOB_ID_RE.match(job_id or ''):
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        try:
+            with open(self._meta_path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get_artifact_path(self, job: Dict) -> Optional[str]:
+        """Path of a finished job's artifact, if it still exists"""
+        if job.get('status') != 'completed':
+            return None
+        path = os.path.join(self.spool_dir, job['artifact'])
+        return path if os.path.exists(path) else None
+
+    # ------------------------------------------------------------------
+    # Submission and execution
+    # ------------------------------------------------------------------
+
+    def submit(self, report: str, params: Dict, fmt: str, user_id: int) -> Dict:
+        """
+        Queue a report job
+
+        Raises:
+            ValueError: Unknown report or format, or missing/invalid params
+            OverflowError: Too many jobs already pending
+        """
+        if report not in REPORTS:
+            raise ValueError(f"Unknown report '{report}'. Available: {', '.join(REPORTS)}")
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format '{fmt}'. Available: {', '.join(FORMATS)}")
+        required, _ = REPORTS[report]
+        missing = [name for name in required if params.get(name) in (None, '')]
+        if missing:
+            raise ValueError(f"Report '{report}' requires params: {', '.join(missing)}")
+        if params.get('config_id') not in (None, ''):
+            try:
+                params = dict(params, config_id=int(params['config_id']))
+            except (TypeError, ValueError):
+                raise ValueError("config_id must be an integer")
+
+        self.cleanup()
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if j['status'] in ('queued', 'running'))
+            if pending >= self.max_pending:
+                raise OverflowError("Too many report jobs pending, try again later")
+
+            job_id = uuid.uuid4().hex
+            job = {
+                'job_id': job_id,
+                'report': report,
+                'params': params,
+                'format': fmt,
+                'user_id': user_id,
+                'status': 'queued',
+                'progress': 0.0,
+                'row_count': None,
+                'error': None,
+                'artifact': f"{job_id}.{fmt}",
+                'created_at': datetime.now().isoformat(),
+                'started_at': None,
+                'finished_at': None,
+                'expires_at': None
+            }
+            self._jobs[job_id] = job
+
+        self._update(job_id)
+        self._executor.submit(self._run, job_id)
+        return dict(job)
+
+    def _run(self, job_id: str):
+        job = self.get_job(job_id)
+        self._update(job_id, status='running', progress=0.05,
+                     started_at=datetime.now().isoformat())
+        path = os.path.join(self.spool_dir, job['artifact'])
+        tmp_path = path + '.tmp'
+        try:
+            db = self.report_mgr.db
+            writer = self._write_csv if job['format'] == 'csv' else self._write_json
+            # Rows are written as they arrive; a failed query raises instead
+            # of ending the stream early or returning no rows
+            with db.use_pool(self.pool), db.raising_errors(), \
+                    db.time_budget(self.time_budget_ms, f"Report job {job['report']}"):
+                _, report = REPORTS[job['report']]
+                rows = report(self.report_mgr, job['params'])
+                row_count = writer(tmp_path, rows,
+                                   lambda done: self._update(job_id, row_count=done))
+            os.replace(tmp_path, path)
+
+            self._update(job_id, status='completed', progress=1.0, row_count=row_count,
+                         finished_at=datetime.now().isoformat(),
+                         expires_at=datetime.fromtimestamp(time.time() + self.ttl).isoformat())
+        except Exception as e:
+            print(f"Report job {job_id} failed: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            self._update(job_id, status='failed', error=str(e),
+                         finished_at=datetime.now().isoformat(),
+                         expires_at=datetime.fromtimestamp(time.time() + self.ttl).isoformat())
+
+    @staticmethod
+    def _write_csv(path: str, rows: Iterable[Dict], on_progress: Callable[[int], None],
+                   progress_every: int = 10000) -> int:
+        """Write rows as CSV; returns the number written"""
+        count = 0
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = None
+            for count, row in enumerate(rows, 1):
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(row.keys()))
+                    writer.writeheader()
+                writer.writerow(row)
+                if count % progress_every == 0:
+                    on_progress(count)
+        return count
+
+    @staticmethod
+    def _write_json(path: str, rows: Iterable[Dict], on_progress: Callable[[int], None],
+                    progress_every: int = 10000) -> int:
+        """Write rows as a JSON array; returns the number written"""
+        count = 0
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('[')
+            for count, row in enumerate(rows, 1):
+                if count > 1:
+                    f.write(',\n')
+                f.write(json.dumps(row, default=str))
+                if count % progress_every == 0:
+                    on_progress(count)
+            f.write(']\n')
+        return count
+
+    # ------------------------------------------------------------------
+    # Expiry
+    # ------------------------------------------------------------------
+
+    def cleanup(self):
+        """Delete expired jobs and spool files older than the TTL"""
+        now = time.time()
+        with self._lock:
+            for job_id, job in list(self._jobs.items()):
+                expires_at = job.get('expires_at')
+                if expires_at and datetime.fromisoformat(expires_at).timestamp() < now:
+                    del self._jobs[job_id]
+
+        try:
+            names = os.listdir(self.spool_dir)
+        except OSError:
+            return
+        for name in names:
+            job_id = name.split('.', 1)[0]
+            with self._lock:
+                if job_id in self._jobs:
+                    continue
+            path = os.path.join(self.spool_dir, name)
+            try:
+                if os.path.getmtime(path) + self.ttl < now:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def shutdown(self):
+        """Stop accepting jobs and wait for running ones"""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,255 @@
+"""
+National Highways Management System - Report Precomputation Scheduler
+Precomputes the standard reports in a background thread and keeps them as
+ready-to-serve (optionally gzip-compressed) response bodies.
+
+Snapshots are refreshed on a fixed cadence and shortly after data changes.
+Changes are debounced so a burst of writes triggers one refresh.
+Snapshots restored by warm_cache.WarmCache are served at once and refreshed
+on the normal cadence.
+"""
+
+from typing import Optional, Dict, Callable, Tuple
+from datetime import datetime
+import gzip
+import json
+import threading
+import time
+
+from nh_management import NHDatabase, ReportManager
+from warm_cache import change_mark, unchanged_since
+
+
+class ReportSnapshot:
+    """A serialized report body and when it was produced"""
+
+    __slots__ = ('body', 'compressed', 'generated_at', 'created')
+
+    def __init__(self, body: bytes, compressed: bool, generated_at: str):
+        self.body = body
+        self.compressed = compressed
+        self.generated_at = generated_at
+        self.created = time.monotonic()
+
+    @property
+    def age(self) -> float:
+        """Seconds since the snapshot was produced"""
+        return time.monotonic() - self.created
+
+    def get_bytes(self) -> bytes:
+        """Uncompressed body"""
+        return gzip.decompress(self.body) if self.compressed else self.body
+
+
+def _default_render(data, meta: Dict) -> bytes:
+    """Render the standard API envelope used by success_response()"""
+    return json.dumps({"success": True, "message": "Success", "data": data, "meta": meta},
+                      default=str).encode('utf-8')
+
+
+class ReportScheduler:
+    """Background precomputation of the standard reports"""
+
+    # Data changes that make report snapshots stale
+    WATCHED_TABLES = ('nh_segments', 'nh_road_details', 'nh_master',
+                      'divisions', 'road_configurations')
+
+    def __init__(self, db: NHDatabase, report_mgr: ReportManager,
+                 interval: float = 300, debounce: float = 5, max_delay: float = 30,
+                 compress: bool = True,
+                 render: Callable[[object, Dict], bytes] = _default_render,
+                 pool: Optional[str] = None):
+        """
+        Args:
+            db: Database handle (for change notifications)
+            report_mgr: Report manager used to compute the reports
+            interval: Seconds between scheduled refreshes
+            debounce: Quiet period after the last change before refreshing
+            max_delay: Longest a refresh is postponed by a stream of changes
+            compress: Store snapshots gzip-compressed
+            render: Serializes (data, meta) into a response body
+            pool: Database sub-pool the refresh thread draws connections from
+        """
+        self.db = db
+        self.report_mgr = report_mgr
+        self.interval = interval
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.compress = compress
+        self.render = render
+        self.pool = pool
+
+        self._snapshots = {}  # (report, filter value or None) -> ReportSnapshot
+        self._mark = None  # Database change mark the snapshots were computed at
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._change_count = 0
+        self._first_change = None
+        self._last_change = None
+        self.refresh_count = 0
+        self.last_refresh_error = None
+
+        db.add_change_listener(self._on_change)
+
+    # ------------------------------------------------------------------
+    # Snapshot access
+    # ------------------------------------------------------------------
+
+    def get_snapshot(self, report: str, key: Optional[str] = None) -> Optional[ReportSnapshot]:
+        """Get the latest snapshot for a report and optional filter value"""
+        return self._snapshots.get((report, key))
+
+    def status(self) -> Dict:
+        """Snapshot ages and refresh counters"""
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'refresh_count': self.refresh_count,
+            'pending_changes': self._first_change is not None,
+            'last_refresh_error': self.last_refresh_error,
+            'snapshots': len(self._snapshots),
+            'oldest_age_seconds': round(max((s.age for s in self._snapshots.values()),
+                                            default=0), 1)
+        }
+
+    # ------------------------------------------------------------------
+    # Computation
+    # ------------------------------------------------------------------
+
+    def _make_snapshot(self, data, meta: Dict) -> ReportSnapshot:
+        generated_at = datetime.now().isoformat()
+        body = self.render(data, dict(meta, generated_at=generated_at))
+        if self.compress:
+            body = gzip.compress(body, compresslevel=6)
+        return ReportSnapshot(body, self.compress, generated_at)
+
+    def _partition(self, report: str, rows, field: str, meta: Dict) -> Dict[Tuple, ReportSnapshot]:
+        """Snapshot the full report plus one snapshot per filter value"""
+        snapshots = {(report, None): self._make_snapshot(rows, meta)}
+        groups = {}
+        for row in rows:
+            groups.setdefault(row[field], []).append(row)
+        for value, group in groups.items():
+            snapshots[(report, value)] = self._make_snapshot(group, meta)
+        return snapshots
+
+    def refresh_all(self):
+        """
+        Recompute every standard report and swap in the new snapshots
+
+        A failed query raises (the managers would return an empty report)
+        and the previous snapshots stay in place.
+        """
+        mgr = self.report_mgr
+        mark = change_mark(self.db)
+        snapshots = {}
+        with self.db.raising_errors():
+            snapshots.update(self._partition(
+                'nh_config_summary', mgr.get_nh_config_summary(), 'nh_number',
+                mgr.get_summary_status('nh_config_summary')))
+            snapshots.update(self._partition(
+                'division_summary', mgr.get_division_summary(), 'division_name',
+                mgr.get_summary_status('division_summary')))
+            snapshots[('config_statistics', None)] = self._make_snapshot(
+                mgr.get_config_statistics(), mgr.get_summary_status('config_statistics'))
+
+        with self._lock:
+            self._snapshots = snapshots
+            self._mark = mark
+        self.refresh_count += 1
+
+    def export_state(self) -> Optional[Dict]:
+        """Snapshots and their change mark, for warm_cache.WarmCache"""
+        with self._lock:
+            if self._mark is None:
+                return None
+            return {'mark': self._mark,
+                    'snapshots': {key: (s.body, s.compressed, s.generated_at)
+                                  for key, s in self._snapshots.items()}}
+
+    def import_state(self, state: Dict, current: Dict) -> bool:
+        """Take over saved snapshots if nothing has changed since they were computed"""
+        if not unchanged_since(state['mark'], current):
+            return False
+        now = datetime.now()
+        snapshots = {}
+        for key, (body, compressed, generated_at) in state['snapshots'].items():
+            snapshot = ReportSnapshot(body, compressed, generated_at)
+            age = (now - datetime.fromisoformat(generated_at)).total_seconds()
+            snapshot.created -= max(age, 0)
+            snapshots[key] = snapshot
+        with self._lock:
+            self._snapshots = snapshots
+            self._mark = state['mark']
+        return True
+
+    # ------------------------------------------------------------------
+    # Scheduling
+    # ------------------------------------------------------------------
+
+    def _on_change(self, table_name: str, action: str,
+                   record_id: Optional[int], values: Dict):
+        if table_name not in self.WATCHED_TABLES:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._change_count += 1
+            self._last_change = now
+            if self._first_change is None:
+                self._first_change = now
+        self._wake.set()
+
+    def _next_due(self, next_scheduled: float) -> float:
+        with self._lock:
+            if self._first_change is None:
+                return next_scheduled
+            return min(next_scheduled,
+                       self._last_change + self.debounce,
+                       self._first_change + self.max_delay)
+
+    def _run(self):
+        # Restored snapshots are current: the first refresh can wait
+        next_scheduled = time.monotonic() + (self.interval if self._snapshots else 0)
+        while not self._stop.is_set():
+            now = time.monotonic()
+            due = self._next_due(next_scheduled)
+            if now < due:
+                self._wake.wait(timeout=due - now)
+                self._wake.clear()
+                continue
+
+            with self._lock:
+                seen_changes = self._change_count
+            delay = self.interval
+            try:
+                with self.db.use_pool(self.pool):
+                    self.refresh_all()
+                self.last_refresh_error = None
+            except Exception as e:
+                self.last_refresh_error = str(e)
+                print(f"Error precomputing reports: {e}")
+                delay = min(self.interval, self.max_delay)  # Retry sooner
+
+            with self._lock:
+                # Changes that arrived during the refresh still need one
+                if self._change_count == seen_changes:
+                    self._first_change = None
+                    self._last_change = None
+            next_scheduled = time.monotonic() + delay
+
+    def start(self):
+        """Start the background refresh thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='report-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background refresh thread"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
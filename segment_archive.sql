@@ -0,0 +1,36 @@
+-- Archive tables for archived segments (hot/cold split) for NH Management System
+-- Run after database_schema.sql (and add_latlong_columns.py, if used):
+--   mysql -u root -p nh_management < segment_archive.sql
+-- Then move segments that are already archived:
+--   python archive_segments.py
+--
+-- Segments whose status is set to 'archived' are moved here with their road
+-- details, so listings, reports, validations and their indexes only cover
+-- active and draft segments. ?include_archived=true on the segment endpoints
+-- unions the archive in. Setting the status of an archived segment back
+-- moves it back.
+--
+-- The archive tables copy the live tables' columns (CREATE TABLE ... LIKE)
+-- and are matched by column name: add any column added to nh_segments or
+-- nh_road_details later to the archive table as well.
+
+-- ============================================================================
+-- NH_SEGMENTS_ARCHIVE
+-- No foreign keys (LIKE does not copy them) and no unique chainage range:
+-- the same range can be archived more than once
+-- ============================================================================
+CREATE TABLE nh_segments_archive LIKE nh_segments;
+ALTER TABLE nh_segments_archive
+    DROP INDEX unique_nh_segment,
+    ADD COLUMN archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ADD INDEX idx_segments_archive_nh (nh_id, start_chainage),
+    ADD INDEX idx_segments_archive_archived (archived_at);
+
+-- ============================================================================
+-- NH_ROAD_DETAILS_ARCHIVE
+-- length_km is a plain column holding the value it had when archived
+-- ============================================================================
+CREATE TABLE nh_road_details_archive LIKE nh_road_details;
+ALTER TABLE nh_road_details_archive
+    MODIFY length_km DECIMAL(10, 3),
+    ADD COLUMN archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
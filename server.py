@@ -3,13 +3,32 @@ National Highways Management System - REST API Server
 This Flask application provides REST API endpoints for the NH Management System
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, send_file, stream_with_context, g
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from nh_management import *
-from datetime import timedelta
+from chainage_index import ChainageIndex
+from coverage_analytics import CoverageAnalytics
+from bitmap_index import BitmapIndex
+from detail_validation import DetailValidator
+from report_scheduler import ReportScheduler
+from report_jobs import ReportJobManager, FORMATS as REPORT_JOB_FORMATS
+from report_export import EXPORT_FORMATS, choose_format, stream_export
+from columnar_store import ColumnarStore, ColumnarReportManager
+from temporal_reports import CheckpointStore
+from audit_archive import AuditArchive
+from change_feed import ChangeFeed
+from delta_sync import SyncManager
+from read_model import ReadModel, serve_from_read_model
+from audit_writer import AuditWriter
+from warm_cache import WarmCache
+from single_flight import SingleFlight, coalesce_reads
+from admission import AdmissionController, classify, load_classes
+from datetime import datetime, timedelta
 import traceback
+import atexit
 import os
+import time
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -80,15 +99,194 @@ nh_mgr = NHManager(db)
 segment_mgr = SegmentManager(db)
 detail_mgr = RoadDetailManager(db)
 validation_mgr = ValidationManager(db)
-report_mgr = ReportManager(db)
+# Archived audit_log months (archive_audit.py) read alongside the table
+audit_archive = AuditArchive(db, hot_months=int(os.getenv('AUDIT_HOT_MONTHS', '3')))
+audit_mgr = AuditManager(db, archive=audit_archive)
+columnar_store = ColumnarStore(db, max_staleness=float(os.getenv('COLUMNAR_MAX_STALENESS', '5')))
+if os.getenv('COLUMNAR_REPORTS', 'False') == 'True':
+    # Answer reports from the memory-mapped columnar snapshot
+    report_mgr = ColumnarReportManager(db, columnar_store)
+else:
+    report_mgr = ReportManager(db)
+chainage_index = ChainageIndex(db)
+coverage_analytics = CoverageAnalytics(db)
+bitmap_index = BitmapIndex(db, resolution_m=int(os.getenv('BITMAP_RESOLUTION_M', '10')),
+                           save_interval=float(os.getenv('BITMAP_SAVE_INTERVAL', '5')))
+bitmap_index.start()
+atexit.register(bitmap_index.stop)
+detail_validator = DetailValidator(db)
+sync_mgr = SyncManager(db, settle_seconds=int(os.getenv('SYNC_SETTLE_SECONDS', '5')))
+
+# Identical concurrent reads share one query (see single_flight.py); callers
+# that join a running query wait at most their own time budget
+read_flight = SingleFlight(db)
+db.add_change_listener(read_flight.forget)
+coalesce_reads(read_flight, nh_mgr, ['get_all_nhs', 'get_nh_summary', 'get_nh_segments'])
+coalesce_reads(read_flight, segment_mgr, ['get_segments_by_division', 'get_all_segments',
+                                          'get_segment_details'])
+coalesce_reads(read_flight, detail_mgr, ['get_configurations', 'get_segment_details'])
+coalesce_reads(read_flight, validation_mgr, ['check_overlapping_segments',
+                                             'check_overlapping_configurations',
+                                             'check_out_of_bounds_details',
+                                             'validate_nh_continuity'])
+coalesce_reads(read_flight, report_mgr, ['get_nh_config_summary', 'get_division_summary',
+                                         'get_config_statistics', 'get_config_details',
+                                         'get_division_wise_details', 'get_chainage_range',
+                                         'get_user_activity'])
+
+# Execution time budgets (ms) for heavy reads; an overrun returns 504.
+# Applied over the coalescing so the budget is active while a caller waits
+report_budget_ms = int(os.getenv('QUERY_BUDGET_REPORT_MS', '30000'))
+validation_budget_ms = int(os.getenv('QUERY_BUDGET_VALIDATION_MS', '20000'))
+apply_time_budgets(db, report_mgr, {name: report_budget_ms for name in [
+    'get_nh_config_summary', 'get_division_summary', 'get_config_statistics',
+    'get_config_details', 'get_division_wise_details', 'get_chainage_range',
+    'get_user_activity']})
+apply_time_budgets(db, validation_mgr, {name: validation_budget_ms for name in [
+    'check_overlapping_segments', 'check_overlapping_configurations',
+    'check_out_of_bounds_details', 'validate_nh_continuity']})
+
+# Bulkheads: per route class concurrency limits and connection sub-pools
+admission = None
+# One background connection per consumer: report refreshes, report job
+# workers, checkpoints, the change feed and the read model
+background_consumers = ((os.getenv('REPORT_SNAPSHOTS', 'True') == 'True')
+                        + int(os.getenv('REPORT_JOB_WORKERS', '2'))
+                        + (os.getenv('AS_OF_REPORTS', 'True') == 'True')
+                        + 1
+                        + (os.getenv('READ_MODEL', 'False') == 'True'))
+sub_pools = {'background': int(os.getenv('BACKGROUND_POOL_SIZE', '0')) or background_consumers}
+if os.getenv('ADMISSION_CONTROL', 'True') == 'True':
+    admission = AdmissionController(load_classes(),
+                                    worker_threads=int(os.getenv('WEB_THREADS', '128')))
+    sub_pools.update(admission.pool_sizes())
+
+# Division-wise report as concurrent per-division queries on their own connections
+partition_workers = int(os.getenv('REPORT_PARTITION_WORKERS', '0'))
+if partition_workers > 0:
+    sub_pools['partitions'] = partition_workers
+    report_mgr.enable_partitioning(partition_workers, pool='partitions')
+
+# Segment/detail audit entries written by the application in batches instead of triggers
+batched_audit = os.getenv('AUDIT_MODE', 'triggers') == 'batched'
+if batched_audit:
+    sub_pools['audit'] = 1
 
 # Connect to database on startup
-if not db.connect():
+# Sub-pools are reserved out of DB_POOL_SIZE; the shared pool gets the rest
+if not db.connect(sub_pools=sub_pools, pool_size=int(os.getenv('DB_POOL_SIZE', '30')),
+                  pool_timeout=float(os.getenv('DB_POOL_TIMEOUT', '10'))):
     print("❌ Failed to connect to database")
     exit(1)
 
 print("✅ Connected to database")
 
+audit_writer = None
+if batched_audit:
+    audit_writer = AuditWriter(
+        db,
+        spool_dir=os.getenv('AUDIT_SPOOL_DIR', os.path.join('spool', 'audit')) or None,
+        batch_size=int(os.getenv('AUDIT_BATCH_SIZE', '500')),
+        flush_interval=float(os.getenv('AUDIT_FLUSH_INTERVAL', '0.2')),
+        fsync=os.getenv('AUDIT_SPOOL_FSYNC', 'True') == 'True',
+        pool='audit'
+    )
+    audit_writer.start()
+    db.audit_writer = audit_writer
+    atexit.register(audit_writer.stop)
+    print("✅ Batched audit writer started")
+
+# In-process caches saved to disk and restored on startup (warm restarts)
+warm_cache = None
+if os.getenv('WARM_CACHE', 'False') == 'True':
+    warm_cache = WarmCache(
+        db,
+        path=os.getenv('WARM_CACHE_PATH', os.path.join('cache', 'warm_cache.pkl')),
+        interval=float(os.getenv('WARM_CACHE_INTERVAL', '300')),
+        pool='background'
+    )
+    warm_cache.register('chainage_index', chainage_index)
+
+# Precompute standard reports in the background
+report_scheduler = ReportScheduler(
+    db, report_mgr,
+    interval=float(os.getenv('REPORT_SNAPSHOT_INTERVAL', '300')),
+    debounce=float(os.getenv('REPORT_SNAPSHOT_DEBOUNCE', '5')),
+    compress=os.getenv('REPORT_SNAPSHOT_COMPRESS', 'True') == 'True',
+    render=lambda data, meta: app.json.dumps(
+        {"success": True, "message": "Success", "data": data, "meta": meta}).encode('utf-8'),
+    pool='background'
+)
+if os.getenv('REPORT_SNAPSHOTS', 'True') == 'True':
+    if warm_cache is not None:
+        warm_cache.register('report_snapshots', report_scheduler)
+    report_scheduler.start()
+    print("✅ Report precomputation started")
+
+# Background report jobs (large exports run outside the request workers)
+report_jobs = ReportJobManager(
+    report_mgr,
+    spool_dir=os.getenv('REPORT_JOB_DIR', os.path.join('cache', 'report_jobs')),
+    max_workers=int(os.getenv('REPORT_JOB_WORKERS', '2')),
+    max_pending=int(os.getenv('REPORT_JOB_MAX_PENDING', '20')),
+    ttl=int(os.getenv('REPORT_JOB_TTL', '3600')),
+    pool='background',
+    time_budget_ms=int(os.getenv('REPORT_JOB_TIMEOUT_MS', '600000'))
+)
+
+# Checkpoints of the network state for ?as_of= reports
+checkpoints = CheckpointStore(
+    db, columnar_store,
+    directory=os.getenv('CHECKPOINT_DIR', os.path.join('cache', 'checkpoints')),
+    interval=float(os.getenv('CHECKPOINT_CHECK_INTERVAL', '900')),
+    max_events=int(os.getenv('CHECKPOINT_MAX_EVENTS', '5000')),
+    max_age=float(os.getenv('CHECKPOINT_MAX_AGE', '86400')),
+    keep=int(os.getenv('CHECKPOINT_KEEP', '0')) or None,
+    pool='background',
+    audit_archive=audit_archive
+)
+if os.getenv('AS_OF_REPORTS', 'True') == 'True':
+    checkpoints.start()
+    print("✅ Report checkpoints started")
+
+# Live change feed for /api/changes/stream (tails audit_log while anyone listens)
+change_feed = ChangeFeed(
+    db,
+    poll_interval=float(os.getenv('CHANGE_FEED_POLL_INTERVAL', '1')),
+    buffer_size=int(os.getenv('CHANGE_FEED_BUFFER', '2000')),
+    pool='background'
+)
+
+# Listing endpoints answered from an in-memory copy of the network
+read_model = None
+if os.getenv('READ_MODEL', 'False') == 'True':
+    read_model = ReadModel(
+        db,
+        max_staleness=float(os.getenv('READ_MODEL_MAX_STALENESS', '5')),
+        poll_interval=float(os.getenv('READ_MODEL_POLL_INTERVAL', '1')),
+        write_wait=float(os.getenv('READ_MODEL_WRITE_WAIT', '2')),
+        segment_stats=segment_mgr.has_segment_stats,
+        pool='background'
+    )
+    serve_from_read_model(read_model, nh_mgr, {'get_all_nhs': 'get_all_nhs',
+                                               'get_nh_segments': 'get_nh_segments'})
+    serve_from_read_model(read_model, segment_mgr, {
+        'get_segments_by_division': 'get_segments_by_division',
+        'get_all_segments': 'get_all_segments',
+        'get_segment_details': 'get_segment'})
+    serve_from_read_model(read_model, detail_mgr, {'get_configurations': 'get_configurations',
+                                                   'get_segment_details': 'get_road_details'})
+    if warm_cache is not None:
+        warm_cache.register('read_model', read_model)
+    read_model.start()
+    print("✅ Read model started")
+
+if warm_cache is not None:
+    warm_cache.start()
+    atexit.register(warm_cache.stop)
+    print(f"✅ Warm cache snapshots started (restored: "
+          f"{', '.join(name for name, ok in warm_cache.restored.items() if ok) or 'none'})")
+
 # Print JWT configuration for debugging
 print(f"🔐 JWT_SECRET_KEY configured: {'Yes' if os.getenv('JWT_SECRET_KEY') else 'No (using default)'}")
 
@@ -96,13 +294,85 @@ print(f"🔐 JWT_SECRET_KEY configured: {'Yes' if os.getenv('JWT_SECRET_KEY') el
 # HELPER FUNCTIONS
 # ==============================================================================
 
-def success_response(data=None, message="Success", status=200):
+def success_response(data=None, message="Success", status=200, meta=None):
     """Create a successful response"""
     response = {"success": True, "message": message}
     if data is not None:
         response["data"] = data
+    if meta is not None:
+        response["meta"] = meta
     return jsonify(response), status
 
+def snapshot_response(snapshot):
+    """Serve a precomputed report snapshot, reporting its age"""
+    headers = {
+        'Age': str(int(snapshot.age)),
+        'X-Snapshot-Generated-At': snapshot.generated_at
+    }
+    if snapshot.compressed and 'gzip' in request.headers.get('Accept-Encoding', ''):
+        body = snapshot.body
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+    else:
+        body = snapshot.get_bytes()
+    return app.response_class(body, status=200, mimetype='application/json', headers=headers)
+
+def use_snapshot():
+    """Reports are served from snapshots unless ?live=true is passed"""
+    return request.args.get('live', '').lower() != 'true'
+
+def include_archived():
+    """Whether archived segments are unioned in (?include_archived=true)"""
+    return request.args.get('include_archived', '').lower() == 'true'
+
+def export_format():
+    """Export format requested via ?format= or Accept (None for JSON)"""
+    return choose_format(request.args.get('format'), request.accept_mimetypes)
+
+def export_response(rows, fmt, name):
+    """Stream report rows as a CSV/NDJSON/XLSX download"""
+    headers = {
+        'Content-Disposition': f'attachment; filename="{name}.{fmt}"',
+        'X-Accel-Buffering': 'no'  # Let proxies pass chunks through
+    }
+    return app.response_class(stream_with_context(stream_export(rows, fmt, name)),
+                              mimetype=EXPORT_FORMATS[fmt], headers=headers)
+
+def request_datetime(name):
+    """ISO 8601 date or date-time query parameter as local time (None if absent)"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name} '{value}'. Use ISO 8601, e.g. 2026-03-01T18:00:00")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+def request_page_size():
+    """?limit= bounded by MAX_PAGE_SIZE (DEFAULT_PAGE_SIZE if absent)"""
+    limit = request.args.get('limit', type=int)
+    if limit is None:
+        return int(os.getenv('DEFAULT_PAGE_SIZE', '20'))
+    if limit <= 0:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, int(os.getenv('MAX_PAGE_SIZE', '100')))
+
+def request_reports():
+    """
+    Report manager for the request: the live one, or one answering from
+    the reconstructed state at ?as_of= (ISO 8601 date or date-time)
+    """
+    as_of = request_datetime('as_of')
+    if as_of is None:
+        return report_mgr
+    if os.getenv('AS_OF_REPORTS', 'True') != 'True':
+        raise ValueError("As-of reports are not enabled")
+    with db.time_budget(report_budget_ms, 'As-of reconstruction'):
+        return checkpoints.reports_at(as_of)
+
 def error_response(message="Error", status=400, details=None):
     """Create an error response"""
     response = {"success": False, "message": message}
@@ -110,6 +380,51 @@ def error_response(message="Error", status=400, details=None):
         response["details"] = details
     return jsonify(response), status
 
+def exception_response(e):
+    """Error response for an exception raised while handling a request"""
+    if isinstance(e, QueryTimeoutError):
+        return error_response("The request took too long and was cancelled", 504, details={
+            "error": "query_timeout",
+            "operation": e.operation,
+            "budget_ms": e.budget_ms
+        })
+    if isinstance(e, PoolExhaustedError):
+        response, status = error_response("Server busy (no free database connection), please retry",
+                                          503)
+        response.headers['Retry-After'] = '1'
+        return response, status
+    return error_response(f"Error: {str(e)}", 500)
+
+# ==============================================================================
+# ADMISSION CONTROL
+# ==============================================================================
+
+@app.before_request
+def admit_request():
+    """Apply the route class's concurrency limit and select its connection pool"""
+    if admission is None or request.method == 'OPTIONS':
+        return None
+    route_class = classify(request.path)
+    if route_class is None:
+        return None
+    
+    bulkhead = admission.bulkheads[route_class]
+    if not bulkhead.acquire():
+        response, status = error_response(f"Server busy ({route_class} requests), please retry", 503)
+        response.headers['Retry-After'] = str(bulkhead.retry_after())
+        return response, status
+    g.admission = (bulkhead, time.monotonic(), db.set_pool(route_class))
+    return None
+
+@app.teardown_request
+def release_request(error=None):
+    """Free the request's bulkhead slot (after any streamed body is sent)"""
+    admitted = g.pop('admission', None)
+    if admitted:
+        bulkhead, started, previous_pool = admitted
+        db.set_pool(previous_pool)
+        bulkhead.release(time.monotonic() - started)
+
 # ==============================================================================
 # AUTHENTICATION ENDPOINTS
 # ==============================================================================
@@ -171,7 +486,7 @@ def get_current_user():
             return error_response("User not found", 404)
     
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
 
 # ==============================================================================
 # DIVISION ENDPOINTS
@@ -181,11 +496,13 @@ def get_current_user():
 def get_divisions():
     """Get all divisions and offices - Public endpoint"""
     try:
+        if read_model is not None and read_model.is_fresh():
+            return success_response(read_model.get_divisions())
         query = "SELECT * FROM divisions ORDER BY division_name, office_name"
         divisions = db.execute_query(query)
         return success_response(divisions)
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
 
 # ==============================================================================
 # NATIONAL HIGHWAYS ENDPOINTS
@@ -198,7 +515,7 @@ def get_all_nhs():
         nhs = nh_mgr.get_all_nhs()
         return success_response(nhs)
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
 
 @app.route('/api/nh/<int:nh_id>', methods=['GET'])
 @jwt_required()
@@ -213,17 +530,100 @@ def get_nh(nh_id):
         else:
             return error_response("NH not found", 404)
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
 
 @app.route('/api/nh/<int:nh_id>/segments', methods=['GET'])
 @jwt_required()
 def get_nh_segments(nh_id):
     """Get all segments for a specific NH"""
     try:
-        segments = nh_mgr.get_nh_segments(nh_id)
+        segments = nh_mgr.get_nh_segments(nh_id, include_archived=include_archived())
         return success_response(segments)
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
+
+@app.route('/api/nh/<nh_number>/at', methods=['GET'])
+@jwt_required(optional=True)
+def get_nh_at_chainage(nh_number):
+    """Public endpoint - Get segment, division and configuration at a chainage"""
+    try:
+        chainage = request.args.get('chainage', type=float)
+        if chainage is None:
+            return error_response("A numeric chainage is required", 400)
+        
+        result = chainage_index.lookup(nh_number, chainage)
+        if result is None:
+            return error_response("NH not found", 404)
+        return success_response(result)
+    except Exception as e:
+        return exception_response(e)
+
+@app.route('/api/nh/<nh_number>/at', methods=['POST'])
+@jwt_required(optional=True)
+def get_nh_at_chainages(nh_number):
+    """Public endpoint - Batch chainage lookup: {"chainages": [12.5, 312.45, ...]}"""
+    try:
+        data = request.get_json() or {}
+        chainages = data.get('chainages')
+        if not isinstance(chainages, list):
+            return error_response("chainages must be a list of numbers", 400)
+        
+        try:
+            chainages = [float(c) for c in chainages]
+        except (TypeError, ValueError):
+            return error_response("chainages must be a list of numbers", 400)
+        
+        results = chainage_index.lookup_many(nh_number, chainages)
+        if results is None:
+            return error_response("NH not found", 404)
+        return success_response(results)
+    except Exception as e:
+        return exception_response(e)
+
+@app.route('/api/nh/<nh_number>/range', methods=['GET'])
+@jwt_required()
+def get_nh_range(nh_number):
+    """Get segments, clipped road details and config totals for a chainage window"""
+    try:
+        from_chainage = request.args.get('from', type=float)
+        to_chainage = request.args.get('to', type=float)
+        after = request.args.get('after', type=float)
+        limit = request.args.get('limit', type=int)
+        
+        if from_chainage is None or to_chainage is None:
+            return error_response("Numeric 'from' and 'to' chainages are required", 400)
+        if to_chainage <= from_chainage:
+            return error_response("'to' chainage must be greater than 'from' chainage", 400)
+        if limit is not None and limit <= 0:
+            return error_response("limit must be a positive integer", 400)
+        
+        result = report_mgr.get_chainage_range(nh_number, from_chainage, to_chainage,
+                                               after=after, limit=limit)
+        if result is None:
+            return error_response("NH not found", 404)
+        return success_response(result)
+    except Exception as e:
+        return exception_response(e)
+
+@app.route('/api/nh/<nh_number>/config-query', methods=['GET'])
+@jwt_required()
+def query_nh_configurations(nh_number):
+    """Find where a boolean configuration expression holds, e.g. ?expr=4L AND NOT 4L-PS"""
+    try:
+        expression = request.args.get('expr')
+        if not expression:
+            return error_response("Configuration expression (expr) is required", 400)
+        
+        try:
+            result = bitmap_index.query(nh_number, expression)
+        except ValueError as e:
+            return error_response(f"Invalid expression: {str(e)}", 400)
+        
+        if result is None:
+            return error_response("NH not found", 404)
+        return success_response(result)
+    except Exception as e:
+        return exception_response(e)
 
 # ==============================================================================
 # SEGMENT ENDPOINTS
@@ -249,45 +649,32 @@ def get_segments():
             
             # If division user, filter by their office
             if user['role'] == 'division':
-                segments = segment_mgr.get_segments_by_division(user['division_office_id'])
+                segments = segment_mgr.get_segments_by_division(
+                    user['division_office_id'], include_archived=include_archived())
             else:
                 # Central user sees all segments
-                query = """
-                    SELECT ns.*, nm.nh_number, nm.nh_name, d.division_name, d.office_name
-                    FROM nh_segments ns
-                    JOIN nh_master nm ON ns.nh_id = nm.nh_id
-                    JOIN divisions d ON ns.division_office_id = d.division_id
-                    ORDER BY nm.nh_number, ns.start_chainage
-                """
-                segments = db.execute_query(query)
+                segments = segment_mgr.get_all_segments(include_archived=include_archived())
         else:
             # Not logged in, show all segments (public access)
-            query = """
-                SELECT ns.*, nm.nh_number, nm.nh_name, d.division_name, d.office_name
-                FROM nh_segments ns
-                JOIN nh_master nm ON ns.nh_id = nm.nh_id
-                JOIN divisions d ON ns.division_office_id = d.division_id
-                ORDER BY nm.nh_number, ns.start_chainage
-            """
-            segments = db.execute_query(query)
+            segments = segment_mgr.get_all_segments(include_archived=include_archived())
         
         return success_response(segments)
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
 
 @app.route('/api/segments/<int:segment_id>', methods=['GET'])
 @jwt_required(optional=True)
 def get_segment(segment_id):
     """Public endpoint - Get specific segment details"""
     try:
-        segment = segment_mgr.get_segment_details(segment_id)
+        segment = segment_mgr.get_segment_details(segment_id, include_archived=include_archived())
         
         if segment:
             return success_response(segment)
         else:
             return error_response("Segment not found", 404)
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
 
 @app.route('/api/segments', methods=['POST'])
 @jwt_required()
@@ -337,7 +724,7 @@ def create_segment():
              status, remarks, created_by)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
-        result = db.execute_query(insert_query, (
+        insert_values = (
             data['nh_id'],
             data['division_id'],
             data.get('segment_description', ''),
@@ -350,14 +737,27 @@ def create_segment():
             data.get('status', 'active').lower(),
             data.get('segment_description', ''),
             user_id
-        ), fetch=False)
+        )
+        if data.get('status', 'active').lower() == 'archived':
+            # Inserted and moved to the archive in one transaction
+            try:
+                segment_mgr.insert_archived(insert_query, insert_values)
+            except Error as e:
+                if e.errno == TRIGGER_ERRNO:
+                    return error_response(e.msg, 400)
+                raise
+            return success_response({"message": "Segment created successfully"})
+        
+        result = db.execute_audited(insert_query, insert_values, 'nh_segments', 'INSERT')
         
         if result is None:
             return error_response("Failed to create segment", 500)
         
+        segment_id = result
+        db.notify_change('nh_segments', 'INSERT', segment_id, nh_id=data['nh_id'])
         return success_response({"message": "Segment created successfully"})
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
 
 @app.route('/api/segments/<int:segment_id>', methods=['PUT'])
 @jwt_required()
@@ -371,8 +771,21 @@ def update_segment(segment_id):
         check_query = "SELECT segment_id FROM nh_segments WHERE segment_id = %s"
         existing = db.execute_query(check_query, (segment_id,))
         
+        restore_status = None
         if not existing:
-            return error_response("Segment not found", 404)
+            # An archived segment is moved back when its status is changed
+            status = str(data.get('status', '')).lower()
+            archived = None
+            if status and status != 'archived':
+                archived = segment_mgr.get_segment_details(segment_id, include_archived=True)
+            if not archived:
+                return error_response("Segment not found", 404)
+            restore_status = status
+            # Validate the archived segment with the changes applied
+            for key, column in (('nh_id', 'nh_id'), ('division_id', 'division_office_id'),
+                                ('start_chainage', 'start_chainage'),
+                                ('end_chainage', 'end_chainage')):
+                data.setdefault(key, archived[column])
         
         # Validate chainages if provided
         if 'start_chainage' in data and 'end_chainage' in data:
@@ -441,6 +854,18 @@ def update_segment(segment_id):
             update_fields.append("end_longitude = %s")
             update_values.append(data['end_longitude'])
         
+        if restore_status is not None or str(data.get('status', '')).lower() == 'archived':
+            # Restore or archive, and the update, in one transaction
+            try:
+                if not segment_mgr.update_archival(segment_id, update_fields, update_values,
+                                                   restore_status):
+                    return error_response("Segment not found", 404)
+            except Error as e:
+                if e.errno == TRIGGER_ERRNO:
+                    return error_response(e.msg, 400)
+                raise
+            return success_response({"message": "Segment updated successfully"})
+        
         # updated_at will be automatically updated by the database
         update_values.append(segment_id)
         
@@ -450,14 +875,17 @@ def update_segment(segment_id):
             WHERE segment_id = %s
         """
         
-        result = db.execute_query(update_query, tuple(update_values), fetch=False)
+        result = db.execute_audited(update_query, tuple(update_values), 'nh_segments', 'UPDATE',
+                                    where="segment_id = %s", where_params=(segment_id,))
         
         if result is None:
             return error_response("Failed to update segment", 500)
         
+        db.notify_change('nh_segments', 'UPDATE', segment_id,
+                         **({'nh_id': data['nh_id']} if 'nh_id' in data else {}))
         return success_response({"message": "Segment updated successfully"})
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
 
 @app.route('/api/segments/<int:segment_id>', methods=['DELETE'])
 @jwt_required()
@@ -473,21 +901,24 @@ def delete_segment(segment_id):
         
         # Delete associated road details first
         delete_details_query = "DELETE FROM nh_road_details WHERE segment_id = %s"
-        result1 = db.execute_query(delete_details_query, (segment_id,), fetch=False)
+        result1 = db.execute_audited(delete_details_query, (segment_id,), 'nh_road_details', 'DELETE',
+                                     where="segment_id = %s", where_params=(segment_id,))
         
         if result1 is None:
             return error_response("Failed to delete associated road details", 500)
         
         # Delete segment
         delete_segment_query = "DELETE FROM nh_segments WHERE segment_id = %s"
-        result2 = db.execute_query(delete_segment_query, (segment_id,), fetch=False)
+        result2 = db.execute_audited(delete_segment_query, (segment_id,), 'nh_segments', 'DELETE',
+                                     where="segment_id = %s", where_params=(segment_id,))
         
         if result2 is None:
             return error_response("Failed to delete segment", 500)
         
+        db.notify_change('nh_segments', 'DELETE', segment_id)
         return success_response({"message": "Segment deleted successfully"})
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
 
 # ==============================================================================
 # ROAD DETAIL ENDPOINTS
@@ -500,17 +931,17 @@ def get_configurations():
         configs = detail_mgr.get_configurations()
         return success_response(configs)
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
 
 @app.route('/api/segments/<int:segment_id>/details', methods=['GET'])
 @jwt_required(optional=True)
 def get_segment_details(segment_id):
     """Public endpoint - Get road details for a specific segment"""
     try:
-        details = detail_mgr.get_segment_details(segment_id)
+        details = detail_mgr.get_segment_details(segment_id, include_archived=include_archived())
         return success_response(details)
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
 
 @app.route('/api/details', methods=['POST'])
 @jwt_required()
@@ -536,35 +967,19 @@ def add_detail():
             print(f"DEBUG: Missing fields check failed")
             return error_response("Missing required fields", 400)
         
-        # Get segment boundaries for better error message
-        segment_query = "SELECT start_chainage, end_chainage, segment_name FROM nh_segments WHERE segment_id = %s"
-        segment_result = db.execute_query(segment_query, (segment_id,))
-        
-        if not segment_result:
-            print(f"DEBUG: Segment not found: {segment_id}")
-            return error_response("Segment not found", 404)
-        
-        segment = segment_result[0]
-        seg_start = float(segment['start_chainage'])
-        seg_end = float(segment['end_chainage'])
         detail_start = float(start_chainage)
         detail_end = float(end_chainage)
         
-        print(f"DEBUG: Segment boundaries: {seg_start} - {seg_end}")
         print(f"DEBUG: Detail chainages: {detail_start} - {detail_end}")
         
-        # Validate chainages
-        if detail_start < seg_start or detail_end > seg_end:
-            print(f"DEBUG: Chainage validation failed")
-            return error_response(
-                f"Chainage must be within segment boundaries ({seg_start} - {seg_end} km). " +
-                f"You entered: {detail_start} - {detail_end} km",
-                400
-            )
+        # Validate bounds and overlaps against cached segment intervals;
+        # the database triggers still re-check on INSERT
+        validation_error, segment = detail_validator.validate(segment_id, detail_start, detail_end)
+        if validation_error:
+            return error_response(*validation_error)
         
-        if detail_start >= detail_end:
-            print(f"DEBUG: Start >= End check failed")
-            return error_response("Start chainage must be less than end chainage", 400)
+        seg_start = segment.start
+        seg_end = segment.end
         
         try:
             print(f"DEBUG: Calling add_road_detail...")
@@ -589,6 +1004,9 @@ def add_detail():
             error_msg = str(db_error)
             print(f"DEBUG: Database error: {error_msg}")
             
+            # The cache disagreed with the database - reload this segment next time
+            detail_validator.invalidate(segment_id)
+            
             if "overlaps with existing configuration" in error_msg.lower():
                 return error_response(
                     "Configuration overlaps with existing configuration in this segment. " +
@@ -604,7 +1022,7 @@ def add_detail():
                 return error_response(f"Database error: {error_msg}", 400)
     
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
 
 @app.route('/api/details/<int:detail_id>', methods=['PUT'])
 @jwt_required()
@@ -633,7 +1051,7 @@ def update_detail(detail_id):
             return error_response("Failed to update road detail", 400)
     
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
 
 @app.route('/api/details/<int:detail_id>', methods=['DELETE'])
 @jwt_required()
@@ -648,7 +1066,7 @@ def delete_detail(detail_id):
             return error_response("Failed to delete road detail", 400)
     
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
 
 # ==============================================================================
 # VALIDATION ENDPOINTS
@@ -662,7 +1080,7 @@ def check_overlapping_segments():
         overlaps = validation_mgr.check_overlapping_segments()
         return success_response(overlaps)
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
 
 @app.route('/api/validation/overlapping-configurations', methods=['GET'])
 @jwt_required()
@@ -672,7 +1090,7 @@ def check_overlapping_configurations():
         overlaps = validation_mgr.check_overlapping_configurations()
         return success_response(overlaps)
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
 
 @app.route('/api/validation/out-of-bounds', methods=['GET'])
 @jwt_required()
@@ -682,7 +1100,93 @@ def check_out_of_bounds():
         issues = validation_mgr.check_out_of_bounds_details()
         return success_response(issues)
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
+
+# ==============================================================================
+# AUDIT ENDPOINTS
+# ==============================================================================
+
+@app.route('/api/audit', methods=['GET'])
+@jwt_required()
+def get_audit_entries():
+    """Audit entries, newest first (?table=&record_id=&user_id=&since=&until=&cursor=&limit=)"""
+    try:
+        page = audit_mgr.get_entries(
+            table_name=request.args.get('table'),
+            record_id=request.args.get('record_id', type=int),
+            user_id=request.args.get('user_id', type=int),
+            since=request_datetime('since'),
+            until=request_datetime('until'),
+            cursor=request.args.get('cursor'),
+            limit=request_page_size()
+        )
+        return success_response(page['entries'], meta={'next_cursor': page['next_cursor'],
+                                                         'truncated': page['truncated']})
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        return exception_response(e)
+
+@app.route('/api/audit/segments/<int:segment_id>', methods=['GET'])
+@jwt_required()
+def get_segment_audit_history(segment_id):
+    """Changes to a segment and all of its road details, newest first"""
+    try:
+        page = audit_mgr.get_segment_history(segment_id, cursor=request.args.get('cursor'),
+                                             limit=request_page_size())
+        return success_response(page['entries'], meta={'next_cursor': page['next_cursor'],
+                                                         'truncated': page['truncated']})
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        return exception_response(e)
+
+# ==============================================================================
+# CHANGE FEED
+# ==============================================================================
+
+@app.route('/api/changes/stream', methods=['GET'])
+@jwt_required(optional=True)
+def stream_changes():
+    """Public endpoint - Server-Sent Events feed of segment and road detail changes"""
+    try:
+        nh_id = request.args.get('nh_id', type=int)
+        division_id = request.args.get('division_id', type=int)
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        if last_event_id is not None:
+            try:
+                last_event_id = int(last_event_id)
+            except ValueError:
+                return error_response("Last-Event-ID must be an event id", 400)
+        
+        events = change_feed.stream(nh_id=nh_id, division_id=division_id,
+                                    last_event_id=last_event_id,
+                                    max_duration=float(os.getenv('CHANGE_FEED_MAX_DURATION', '300')))
+        headers = {
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Let proxies pass events through
+        }
+        return app.response_class(stream_with_context(events),
+                                  mimetype='text/event-stream', headers=headers)
+    except Exception as e:
+        return exception_response(e)
+
+@app.route('/api/sync', methods=['GET'])
+@jwt_required(optional=True)
+def sync_changes():
+    """Public endpoint - Segments, details and reference rows changed since a sync token"""
+    try:
+        result = sync_mgr.sync(request.args.get('since'))
+        counts = {kind: len(rows) for kind, rows in result.items()
+                  if kind not in ('token', 'full', 'deleted')}
+        return success_response(result, meta={
+            'changed': counts,
+            'deleted': {kind: len(ids) for kind, ids in result['deleted'].items()}
+        })
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        return exception_response(e)
 
 # ==============================================================================
 # REPORT ENDPOINTS
@@ -694,10 +1198,22 @@ def get_nh_summary_report():
     """Get NH configuration summary report"""
     try:
         nh_number = request.args.get('nh_number')
-        summary = report_mgr.get_nh_config_summary(nh_number)
-        return success_response(summary)
+        reports = request_reports()
+        fmt = export_format()
+        if fmt:
+            return export_response(reports.get_nh_config_summary(nh_number, stream=True),
+                                   fmt, 'nh-summary')
+        
+        snapshot = report_scheduler.get_snapshot('nh_config_summary', nh_number or None)
+        if snapshot is not None and use_snapshot() and reports is report_mgr:
+            return snapshot_response(snapshot)
+        
+        summary = reports.get_nh_config_summary(nh_number)
+        return success_response(summary, meta=reports.get_summary_status('nh_config_summary'))
+    except ValueError as e:
+        return error_response(str(e), 400)
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
 
 @app.route('/api/reports/division-summary', methods=['GET'])
 @jwt_required()
@@ -705,20 +1221,60 @@ def get_division_summary_report():
     """Get division workload summary report"""
     try:
         division_name = request.args.get('division_name')
-        summary = report_mgr.get_division_summary(division_name)
-        return success_response(summary)
+        reports = request_reports()
+        fmt = export_format()
+        if fmt:
+            return export_response(reports.get_division_summary(division_name, stream=True),
+                                   fmt, 'division-summary')
+        
+        snapshot = report_scheduler.get_snapshot('division_summary', division_name or None)
+        if snapshot is not None and use_snapshot() and reports is report_mgr:
+            return snapshot_response(snapshot)
+        
+        summary = reports.get_division_summary(division_name)
+        return success_response(summary, meta=reports.get_summary_status('division_summary'))
+    except ValueError as e:
+        return error_response(str(e), 400)
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
 
 @app.route('/api/reports/config-statistics', methods=['GET'])
 @jwt_required()
 def get_config_statistics_report():
     """Get configuration statistics report"""
     try:
-        stats = report_mgr.get_config_statistics()
-        return success_response(stats)
+        reports = request_reports()
+        fmt = export_format()
+        if fmt:
+            return export_response(reports.get_config_statistics(stream=True),
+                                   fmt, 'config-statistics')
+        
+        snapshot = report_scheduler.get_snapshot('config_statistics')
+        if snapshot is not None and use_snapshot() and reports is report_mgr:
+            return snapshot_response(snapshot)
+        
+        stats = reports.get_config_statistics()
+        return success_response(stats, meta=reports.get_summary_status('config_statistics'))
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        return exception_response(e)
+
+@app.route('/api/reports/user-activity', methods=['GET'])
+@jwt_required()
+def get_user_activity_report():
+    """Get per-user activity report (current state only - no as_of)"""
+    try:
+        fmt = export_format()
+        if fmt:
+            return export_response(report_mgr.get_user_activity(stream=True),
+                                   fmt, 'user-activity')
+        
+        return success_response(report_mgr.get_user_activity())
+    except ValueError as e:
+        return error_response(str(e), 400)
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
 
 @app.route('/api/reports/config-details', methods=['GET'])
 @jwt_required()
@@ -729,10 +1285,20 @@ def get_config_details_report():
         if not config_id:
             return error_response("Configuration ID is required", 400)
         
-        details = report_mgr.get_config_details(config_id)
-        return success_response(details)
+        reports = request_reports()
+        fmt = export_format()
+        if fmt:
+            return export_response(reports.get_config_details(config_id, stream=True),
+                                   fmt, 'config-details')
+        
+        details = reports.get_config_details(config_id)
+        if reports is report_mgr:
+            return success_response(details)
+        return success_response(details, meta=reports.get_summary_status('config_details'))
+    except ValueError as e:
+        return error_response(str(e), 400)
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
 
 @app.route('/api/reports/division-wise', methods=['GET'])
 @jwt_required()
@@ -745,10 +1311,89 @@ def get_division_wise_report():
         if not nh_number:
             return error_response("NH number is required", 400)
         
-        details = report_mgr.get_division_wise_details(nh_number, config_id)
-        return success_response(details)
+        reports = request_reports()
+        fmt = export_format()
+        if fmt:
+            return export_response(reports.get_division_wise_details(nh_number, config_id, stream=True),
+                                   fmt, 'division-wise')
+        
+        details = reports.get_division_wise_details(nh_number, config_id)
+        return success_response(details, meta=reports.get_summary_status('division_wise'))
+    except ValueError as e:
+        return error_response(str(e), 400)
     except Exception as e:
-        return error_response(f"Error: {str(e)}", 500)
+        return exception_response(e)
+
+@app.route('/api/reports/coverage', methods=['GET'])
+@jwt_required()
+def get_coverage_report():
+    """Get segment coverage, uncovered intervals and per-config lengths"""
+    try:
+        nh_number = request.args.get('nh_number')
+        division_name = request.args.get('division_name')
+        coverage = coverage_analytics.get_coverage(nh_number, division_name)
+        return success_response(coverage)
+    except Exception as e:
+        return exception_response(e)
+
+@app.route('/api/reports/jobs', methods=['POST'])
+@jwt_required()
+def create_report_job():
+    """Queue a report to be generated in the background"""
+    try:
+        data = request.get_json() or {}
+        report = data.get('report')
+        if not report:
+            return error_response("Report name is required", 400)
+        
+        user_id = int(get_jwt_identity())
+        job = report_jobs.submit(report, data.get('params') or {},
+                                 data.get('format', 'json'), user_id)
+        return success_response({
+            "job_id": job['job_id'],
+            "status": job['status'],
+            "status_url": f"/api/reports/jobs/{job['job_id']}",
+            "download_url": f"/api/reports/jobs/{job['job_id']}/download"
+        }, "Report job queued", 202)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except OverflowError as e:
+        response, status = error_response(str(e), 503)
+        response.headers['Retry-After'] = '30'
+        return response, status
+    except Exception as e:
+        return exception_response(e)
+
+@app.route('/api/reports/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_report_job(job_id):
+    """Get the status and progress of a report job"""
+    try:
+        job = report_jobs.get_job(job_id)
+        if not job or job['user_id'] != int(get_jwt_identity()):
+            return error_response("Report job not found", 404)
+        return success_response(job)
+    except Exception as e:
+        return exception_response(e)
+
+@app.route('/api/reports/jobs/<job_id>/download', methods=['GET'])
+@jwt_required()
+def download_report_job(job_id):
+    """Stream the finished artifact of a report job"""
+    try:
+        job = report_jobs.get_job(job_id)
+        if not job or job['user_id'] != int(get_jwt_identity()):
+            return error_response("Report job not found", 404)
+        if job['status'] != 'completed':
+            return error_response(f"Report job is {job['status']}", 409)
+        
+        path = report_jobs.get_artifact_path(job)
+        if not path:
+            return error_response("Report job has expired", 410)
+        return send_file(os.path.abspath(path), mimetype=REPORT_JOB_FORMATS[job['format']],
+                         as_attachment=True, download_name=f"{job['report']}.{job['format']}")
+    except Exception as e:
+        return exception_response(e)
 
 # ==============================================================================
 # HEALTH CHECK
@@ -757,7 +1402,17 @@ def get_division_wise_report():
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return success_response({"status": "healthy", "database": "connected"})
+    return success_response({"status": "healthy", "database": "connected",
+                             "report_snapshots": report_scheduler.status(),
+                             "report_checkpoints": checkpoints.status(),
+                             "audit_archive": audit_archive.status(),
+                             "change_feed": change_feed.status(),
+                             "bitmap_index": bitmap_index.status(),
+                             "audit_writer": audit_writer.status() if audit_writer else None,
+                             "read_model": read_model.status() if read_model else None,
+                             "warm_cache": warm_cache.status() if warm_cache else None,
+                             "coalesced_reads": read_flight.stats(),
+                             "admission": admission.metrics() if admission else None})
 
 @app.route('/')
 def index():
@@ -788,7 +1443,11 @@ def api_docs():
             "nh": [
                 "GET /api/nh",
                 "GET /api/nh/<id>",
-                "GET /api/nh/<id>/segments"
+                "GET /api/nh/<id>/segments",
+                "GET /api/nh/<nh_number>/at?chainage=",
+                "POST /api/nh/<nh_number>/at",
+                "GET /api/nh/<nh_number>/range?from=&to=",
+                "GET /api/nh/<nh_number>/config-query?expr="
             ],
             "segments": [
                 "GET /api/segments",
@@ -806,10 +1465,23 @@ def api_docs():
                 "GET /api/validation/overlapping-configurations",
                 "GET /api/validation/out-of-bounds"
             ],
+            "audit": [
+                "GET /api/audit",
+                "GET /api/audit/segments/<segment_id>"
+            ],
+            "changes": [
+                "GET /api/changes/stream",
+                "GET /api/sync"
+            ],
             "reports": [
                 "GET /api/reports/nh-summary",
                 "GET /api/reports/division-summary",
-                "GET /api/reports/config-statistics"
+                "GET /api/reports/config-statistics",
+                "GET /api/reports/user-activity",
+                "GET /api/reports/coverage",
+                "POST /api/reports/jobs",
+                "GET /api/reports/jobs/<job_id>",
+                "GET /api/reports/jobs/<job_id>/download"
             ]
         }
     })
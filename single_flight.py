@@ -0,0 +1,156 @@
+"""
+National Highways Management System - Single-Flight Read Coalescing
+Concurrent identical read calls (same method, same arguments) share one
+execution: the first caller runs the query, later callers wait for it and
+receive a copy of its result instead of taking another pool connection.
+
+A failed query is an error inside NHDatabase.raising_errors() and an empty
+result outside it, so callers in such a block only share executions with each
+other.
+
+A waiting caller is bounded by its own time budget (NHDatabase.time_budget),
+not by the one the running query was started under: a request joining a
+report job's query gives up with QueryTimeoutError when its budget runs out.
+"""
+
+from typing import Optional, Dict, Callable, Iterable, Hashable
+import copy
+import functools
+import threading
+
+from nh_management import NHDatabase
+
+
+class _Call:
+    """One in-flight execution and the callers waiting on it"""
+
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+def _share(result):
+    """Copy a result so callers cannot see each other's modifications"""
+    if isinstance(result, list):
+        return [dict(row) if isinstance(row, dict) else copy.deepcopy(row) for row in result]
+    return copy.deepcopy(result)
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into one execution"""
+
+    def __init__(self, db: Optional[NHDatabase] = None):
+        """
+        Args:
+            db: Database handle whose time budgets bound waiting callers
+                (None = wait until the running call finishes)
+        """
+        self.db = db
+        self._calls = {}  # key -> _Call
+        self._stats = {}  # label -> counters
+        self._lock = threading.Lock()
+
+    def do(self, label: str, key: Hashable, fn: Callable):
+        """
+        Run fn, or wait for an identical call that is already running
+
+        Args:
+            label: Metrics name, e.g. 'ReportManager.get_config_statistics'
+            key: Identifies identical calls (must be hashable)
+            fn: Zero-argument callable performing the read
+
+        Returns:
+            A private copy of fn's result
+        
+        Raises:
+            QueryTimeoutError: Waiting for a running call outlasted the
+                caller's time budget
+        """
+        with self._lock:
+            stats = self._stats.setdefault(label, {'calls': 0, 'executions': 0,
+                                                   'coalesced': 0, 'in_flight': 0,
+                                                   'wait_timeouts': 0})
+            stats['calls'] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                stats['executions'] += 1
+                stats['in_flight'] += 1
+            else:
+                call.waiters += 1
+                stats['coalesced'] += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    if self._calls.get(key) is call:
+                        del self._calls[key]
+                    stats['in_flight'] -= 1
+                call.done.set()
+        elif self.db is None:
+            call.done.wait()
+        else:
+            try:
+                self.db.wait_within_budget(call.done)
+            except Exception:
+                with self._lock:
+                    stats['wait_timeouts'] += 1
+                raise
+
+        if call.error is not None:
+            raise call.error
+        return _share(call.result)
+
+    def wrap(self, label: str, method: Callable) -> Callable:
+        """Coalesce calls to method; streamed calls (stream=True) run directly"""
+        @functools.wraps(method)
+        def coalesced(*args, **kwargs):
+            if kwargs.get('stream'):
+                return method(*args, **kwargs)
+            raising = self.db is not None and self.db.raises_errors()
+            key = (label, raising, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                return method(*args, **kwargs)
+            return self.do(label, key, lambda: method(*args, **kwargs))
+        return coalesced
+
+    def forget(self, *args):
+        """
+        Stop new callers joining executions that are already running
+
+        Registered as a change listener, so a read issued after a write never
+        receives the result of a query that started before it.
+        """
+        with self._lock:
+            self._calls.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-method counts of calls, executions and coalesced calls"""
+        with self._lock:
+            return {label: dict(counters) for label, counters in self._stats.items()}
+
+
+def coalesce_reads(flight: SingleFlight, manager, method_names: Iterable[str]):
+    """
+    Route a manager's read methods through a SingleFlight
+
+    Args:
+        flight: Shared SingleFlight instance
+        manager: Manager instance, e.g. a ReportManager
+        method_names: Read-only methods to coalesce
+    """
+    for name in method_names:
+        label = f"{type(manager).__name__}.{name}"
+        setattr(manager, name, flight.wrap(label, getattr(manager, name)))
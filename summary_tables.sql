@@ -0,0 +1,555 @@
+-- Materialised Report Summaries for NH Management System
+-- Replaces the four-table joins behind the report views with summary tables
+-- that are updated incrementally by triggers on every segment/detail write.
+--
+-- Run after database_schema.sql, triggers.sql and validation_queries.sql:
+--   mysql -u root -p nh_management < summary_tables.sql
+-- Full rebuild at any time:
+--   CALL sp_mv_rebuild_all();   (or: python rebuild_summaries.py)
+--
+-- ReportManager reads these tables automatically once they exist and falls
+-- back to the vw_* views otherwise; segment listings include mv_segment_stats
+-- and the user activity report reads mv_user_activity.
+-- Drift check and repair for the segment aggregates:
+--   python reconcile_segment_stats.py
+
+-- ============================================================================
+-- SUMMARY TABLES
+-- Only ids are stored; names are joined from the small reference tables at
+-- read time so renaming a division/NH/configuration never leaves them stale.
+-- ============================================================================
+
+-- Backs vw_nh_config_summary and vw_config_statistics
+CREATE TABLE IF NOT EXISTS mv_nh_config_summary (
+    nh_id INT NOT NULL,
+    config_id INT NOT NULL,
+    total_length DECIMAL(12, 3) NOT NULL DEFAULT 0,
+    number_of_sections INT NOT NULL DEFAULT 0,
+    min_section_length DECIMAL(10, 3),
+    max_section_length DECIMAL(10, 3),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (nh_id, config_id),
+    KEY idx_mv_nh_config_config (config_id),
+    KEY idx_mv_nh_config_updated (updated_at)
+);
+
+-- Backs vw_division_nh_summary
+CREATE TABLE IF NOT EXISTS mv_division_nh_summary (
+    division_id INT NOT NULL,
+    nh_id INT NOT NULL,
+    segment_count INT NOT NULL DEFAULT 0,
+    total_length DECIMAL(12, 3) NOT NULL DEFAULT 0,
+    min_chainage DECIMAL(10, 3),
+    max_chainage DECIMAL(10, 3),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (division_id, nh_id),
+    KEY idx_mv_division_nh_updated (updated_at)
+);
+
+-- Backs vw_nh_complete_overview and the division-wise report
+-- One row per road detail; segments without details get one row with NULL detail
+CREATE TABLE IF NOT EXISTS mv_nh_complete_overview (
+    row_id INT PRIMARY KEY AUTO_INCREMENT,
+    nh_id INT NOT NULL,
+    division_id INT NOT NULL,
+    segment_id INT NOT NULL,
+    segment_name VARCHAR(100),
+    segment_start DECIMAL(10, 3) NOT NULL,
+    segment_end DECIMAL(10, 3) NOT NULL,
+    detail_id INT NULL,
+    config_id INT NULL,
+    config_start DECIMAL(10, 3),
+    config_end DECIMAL(10, 3),
+    remarks TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    KEY idx_mv_overview_segment (segment_id),
+    KEY idx_mv_overview_detail (detail_id),
+    KEY idx_mv_overview_nh (nh_id, segment_start),
+    KEY idx_mv_overview_division (division_id, nh_id, segment_start),
+    KEY idx_mv_overview_updated (updated_at)
+);
+
+-- Per-segment aggregates for segment listings and sp_get_division_workload.
+-- Details within a segment cannot overlap (triggers.sql), so the configured
+-- length is also the covered length.
+CREATE TABLE IF NOT EXISTS mv_segment_stats (
+    segment_id INT PRIMARY KEY,
+    detail_count INT NOT NULL DEFAULT 0,
+    configured_length DECIMAL(12, 3) NOT NULL DEFAULT 0,
+    coverage_pct DECIMAL(6, 2) NOT NULL DEFAULT 0,
+    last_modified_at TIMESTAMP NULL,  -- Last change to the segment or its details
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    KEY idx_mv_segment_stats_updated (updated_at)
+);
+
+-- Backs vw_user_activity: rows each user created that still exist. Rows with
+-- no created_by are not counted; users without rows have no entry.
+CREATE TABLE IF NOT EXISTS mv_user_activity (
+    user_id INT PRIMARY KEY,
+    segments_created INT NOT NULL DEFAULT 0,
+    details_created INT NOT NULL DEFAULT 0,
+    last_activity_at TIMESTAMP NULL,  -- Latest segment/detail created (not moved back by deletes)
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Time of the last full rebuild
+CREATE TABLE IF NOT EXISTS mv_summary_state (
+    summary_name VARCHAR(50) PRIMARY KEY,
+    last_rebuild_at TIMESTAMP NULL
+);
+
+-- ============================================================================
+-- REFRESH PROCEDURES
+-- Each recomputes one small group from the base tables. Used where a delta
+-- cannot be applied arithmetically (MIN/MAX after UPDATE or DELETE).
+-- ============================================================================
+
+DELIMITER //
+
+DROP PROCEDURE IF EXISTS sp_mv_refresh_nh_config //
+CREATE PROCEDURE sp_mv_refresh_nh_config(IN p_nh_id INT, IN p_config_id INT)
+BEGIN
+    DELETE FROM mv_nh_config_summary
+    WHERE nh_id = p_nh_id AND config_id = p_config_id;
+
+    INSERT INTO mv_nh_config_summary
+        (nh_id, config_id, total_length, number_of_sections,
+         min_section_length, max_section_length)
+    SELECT ns.nh_id, rd.config_id,
+           SUM(rd.end_chainage - rd.start_chainage),
+           COUNT(rd.detail_id),
+           MIN(rd.end_chainage - rd.start_chainage),
+           MAX(rd.end_chainage - rd.start_chainage)
+    FROM nh_road_details rd
+    JOIN nh_segments ns ON rd.segment_id = ns.segment_id
+    WHERE ns.nh_id = p_nh_id AND rd.config_id = p_config_id
+    GROUP BY ns.nh_id, rd.config_id;
+END //
+
+DROP PROCEDURE IF EXISTS sp_mv_refresh_nh //
+CREATE PROCEDURE sp_mv_refresh_nh(IN p_nh_id INT)
+BEGIN
+    DELETE FROM mv_nh_config_summary WHERE nh_id = p_nh_id;
+
+    INSERT INTO mv_nh_config_summary
+        (nh_id, config_id, total_length, number_of_sections,
+         min_section_length, max_section_length)
+    SELECT ns.nh_id, rd.config_id,
+           SUM(rd.end_chainage - rd.start_chainage),
+           COUNT(rd.detail_id),
+           MIN(rd.end_chainage - rd.start_chainage),
+           MAX(rd.end_chainage - rd.start_chainage)
+    FROM nh_road_details rd
+    JOIN nh_segments ns ON rd.segment_id = ns.segment_id
+    WHERE ns.nh_id = p_nh_id
+    GROUP BY ns.nh_id, rd.config_id;
+END //
+
+DROP PROCEDURE IF EXISTS sp_mv_refresh_division_nh //
+CREATE PROCEDURE sp_mv_refresh_division_nh(IN p_division_id INT, IN p_nh_id INT)
+BEGIN
+    DELETE FROM mv_division_nh_summary
+    WHERE division_id = p_division_id AND nh_id = p_nh_id;
+
+    INSERT INTO mv_division_nh_summary
+        (division_id, nh_id, segment_count, total_length, min_chainage, max_chainage)
+    SELECT division_office_id, nh_id,
+           COUNT(segment_id),
+           SUM(end_chainage - start_chainage),
+           MIN(start_chainage),
+           MAX(end_chainage)
+    FROM nh_segments
+    WHERE division_office_id = p_division_id AND nh_id = p_nh_id
+    GROUP BY division_office_id, nh_id;
+END //
+
+DROP PROCEDURE IF EXISTS sp_mv_refresh_overview_segment //
+CREATE PROCEDURE sp_mv_refresh_overview_segment(IN p_segment_id INT)
+BEGIN
+    DELETE FROM mv_nh_complete_overview WHERE segment_id = p_segment_id;
+
+    INSERT INTO mv_nh_complete_overview
+        (nh_id, division_id, segment_id, segment_name, segment_start, segment_end,
+         detail_id, config_id, config_start, config_end, remarks)
+    SELECT ns.nh_id, ns.division_office_id, ns.segment_id, ns.segment_name,
+           ns.start_chainage, ns.end_chainage,
+           rd.detail_id, rd.config_id, rd.start_chainage, rd.end_chainage, rd.remarks
+    FROM nh_segments ns
+    LEFT JOIN nh_road_details rd ON ns.segment_id = rd.segment_id
+    WHERE ns.segment_id = p_segment_id;
+END //
+
+DROP PROCEDURE IF EXISTS sp_mv_refresh_segment_stats //
+CREATE PROCEDURE sp_mv_refresh_segment_stats(IN p_segment_id INT)
+BEGIN
+    -- Upsert rather than delete + insert: also used by the reconciliation
+    -- job outside a trigger, where each statement commits on its own
+    INSERT INTO mv_segment_stats
+        (segment_id, detail_count, configured_length, coverage_pct, last_modified_at)
+    SELECT ns.segment_id,
+           COUNT(rd.detail_id),
+           COALESCE(SUM(rd.length_km), 0),
+           ROUND(COALESCE(SUM(rd.length_km), 0) / (ns.end_chainage - ns.start_chainage) * 100, 2),
+           GREATEST(ns.updated_at, COALESCE(MAX(rd.updated_at), ns.updated_at))
+    FROM nh_segments ns
+    LEFT JOIN nh_road_details rd ON ns.segment_id = rd.segment_id
+    WHERE ns.segment_id = p_segment_id
+    GROUP BY ns.segment_id, ns.start_chainage, ns.end_chainage, ns.updated_at
+    ON DUPLICATE KEY UPDATE
+        detail_count = VALUES(detail_count),
+        configured_length = VALUES(configured_length),
+        coverage_pct = VALUES(coverage_pct),
+        last_modified_at = GREATEST(COALESCE(last_modified_at, VALUES(last_modified_at)),
+                                    VALUES(last_modified_at));
+
+    DELETE FROM mv_segment_stats
+    WHERE segment_id = p_segment_id
+      AND NOT EXISTS (SELECT 1 FROM nh_segments WHERE segment_id = p_segment_id);
+END //
+
+-- Apply a detail count / length delta to one segment's aggregates
+DROP PROCEDURE IF EXISTS sp_mv_segment_stats_delta //
+CREATE PROCEDURE sp_mv_segment_stats_delta(IN p_segment_id INT, IN p_count INT,
+                                           IN p_length DECIMAL(10, 3))
+BEGIN
+    DECLARE v_segment_length DECIMAL(10, 3);
+
+    SELECT end_chainage - start_chainage INTO v_segment_length
+    FROM nh_segments WHERE segment_id = p_segment_id;
+
+    -- Single-table UPDATE: coverage_pct sees the new configured_length
+    UPDATE mv_segment_stats
+    SET detail_count = detail_count + p_count,
+        configured_length = configured_length + p_length,
+        coverage_pct = ROUND(configured_length / v_segment_length * 100, 2),
+        last_modified_at = NOW()
+    WHERE segment_id = p_segment_id;
+
+    -- No row yet (segment created before the table existed): compute it
+    IF ROW_COUNT() = 0 THEN
+        CALL sp_mv_refresh_segment_stats(p_segment_id);
+    END IF;
+END //
+
+-- Apply a created-rows delta to one user's counters
+DROP PROCEDURE IF EXISTS sp_mv_user_activity_delta //
+CREATE PROCEDURE sp_mv_user_activity_delta(IN p_user_id INT, IN p_segments INT,
+                                           IN p_details INT, IN p_created_at TIMESTAMP)
+BEGIN
+    IF p_user_id IS NOT NULL THEN
+        INSERT INTO mv_user_activity
+            (user_id, segments_created, details_created, last_activity_at)
+        VALUES (p_user_id, p_segments, p_details, p_created_at)
+        ON DUPLICATE KEY UPDATE
+            segments_created = segments_created + VALUES(segments_created),
+            details_created = details_created + VALUES(details_created),
+            last_activity_at = GREATEST(COALESCE(last_activity_at, VALUES(last_activity_at)),
+                                        COALESCE(VALUES(last_activity_at), last_activity_at));
+    END IF;
+END //
+
+DROP PROCEDURE IF EXISTS sp_mv_rebuild_all //
+CREATE PROCEDURE sp_mv_rebuild_all()
+BEGIN
+    START TRANSACTION;
+
+    DELETE FROM mv_nh_config_summary;
+    INSERT INTO mv_nh_config_summary
+        (nh_id, config_id, total_length, number_of_sections,
+         min_section_length, max_section_length)
+    SELECT ns.nh_id, rd.config_id,
+           SUM(rd.end_chainage - rd.start_chainage),
+           COUNT(rd.detail_id),
+           MIN(rd.end_chainage - rd.start_chainage),
+           MAX(rd.end_chainage - rd.start_chainage)
+    FROM nh_road_details rd
+    JOIN nh_segments ns ON rd.segment_id = ns.segment_id
+    GROUP BY ns.nh_id, rd.config_id;
+
+    DELETE FROM mv_division_nh_summary;
+    INSERT INTO mv_division_nh_summary
+        (division_id, nh_id, segment_count, total_length, min_chainage, max_chainage)
+    SELECT division_office_id, nh_id,
+           COUNT(segment_id),
+           SUM(end_chainage - start_chainage),
+           MIN(start_chainage),
+           MAX(end_chainage)
+    FROM nh_segments
+    GROUP BY division_office_id, nh_id;
+
+    DELETE FROM mv_nh_complete_overview;
+    INSERT INTO mv_nh_complete_overview
+        (nh_id, division_id, segment_id, segment_name, segment_start, segment_end,
+         detail_id, config_id, config_start, config_end, remarks)
+    SELECT ns.nh_id, ns.division_office_id, ns.segment_id, ns.segment_name,
+           ns.start_chainage, ns.end_chainage,
+           rd.detail_id, rd.config_id, rd.start_chainage, rd.end_chainage, rd.remarks
+    FROM nh_segments ns
+    LEFT JOIN nh_road_details rd ON ns.segment_id = rd.segment_id;
+
+    DELETE FROM mv_segment_stats;
+    INSERT INTO mv_segment_stats
+        (segment_id, detail_count, configured_length, coverage_pct, last_modified_at)
+    SELECT ns.segment_id,
+           COUNT(rd.detail_id),
+           COALESCE(SUM(rd.length_km), 0),
+           ROUND(COALESCE(SUM(rd.length_km), 0) / (ns.end_chainage - ns.start_chainage) * 100, 2),
+           GREATEST(ns.updated_at, COALESCE(MAX(rd.updated_at), ns.updated_at))
+    FROM nh_segments ns
+    LEFT JOIN nh_road_details rd ON ns.segment_id = rd.segment_id
+    GROUP BY ns.segment_id, ns.start_chainage, ns.end_chainage, ns.updated_at;
+
+    DELETE FROM mv_user_activity;
+    INSERT INTO mv_user_activity
+        (user_id, segments_created, details_created, last_activity_at)
+    SELECT created_by, SUM(segments), SUM(details), MAX(created_at)
+    FROM (
+        SELECT created_by, COUNT(*) AS segments, 0 AS details, MAX(created_at) AS created_at
+        FROM nh_segments WHERE created_by IS NOT NULL GROUP BY created_by
+        UNION ALL
+        SELECT created_by, 0, COUNT(*), MAX(created_at)
+        FROM nh_road_details WHERE created_by IS NOT NULL GROUP BY created_by
+    ) created
+    GROUP BY created_by;
+
+    INSERT INTO mv_summary_state (summary_name, last_rebuild_at)
+    VALUES ('reports', NOW())
+    ON DUPLICATE KEY UPDATE last_rebuild_at = NOW();
+
+    COMMIT;
+END //
+
+-- ============================================================================
+-- READ PROCEDURES
+-- Replace the validation_queries.sql versions with ones reading the summaries
+-- ============================================================================
+
+DROP PROCEDURE IF EXISTS sp_get_division_workload //
+CREATE PROCEDURE sp_get_division_workload(IN p_division_office_id INT)
+BEGIN
+    SELECT 
+        nm.nh_number,
+        ns.segment_name,
+        ROUND(ns.end_chainage - ns.start_chainage, 3) AS segment_length_km,
+        COALESCE(s.detail_count, 0) AS num_configurations,
+        ROUND(s.configured_length, 3) AS configured_length_km,
+        s.coverage_pct,
+        ns.status
+    FROM nh_segments ns
+    JOIN nh_master nm ON ns.nh_id = nm.nh_id
+    LEFT JOIN mv_segment_stats s ON ns.segment_id = s.segment_id
+    WHERE ns.division_office_id = p_division_office_id
+    ORDER BY nm.nh_number, ns.start_chainage;
+END //
+
+-- ============================================================================
+-- DELTA TRIGGERS FOR NH_ROAD_DETAILS
+-- ============================================================================
+
+DROP TRIGGER IF EXISTS trg_mv_nh_road_details_insert //
+CREATE TRIGGER trg_mv_nh_road_details_insert
+AFTER INSERT ON nh_road_details
+FOR EACH ROW
+BEGIN
+    DECLARE v_nh_id INT;
+    DECLARE v_length DECIMAL(10, 3);
+
+    SELECT nh_id INTO v_nh_id FROM nh_segments WHERE segment_id = NEW.segment_id;
+    SET v_length = NEW.end_chainage - NEW.start_chainage;
+
+    -- Additive delta: no need to touch other details
+    INSERT INTO mv_nh_config_summary
+        (nh_id, config_id, total_length, number_of_sections,
+         min_section_length, max_section_length)
+    VALUES (v_nh_id, NEW.config_id, v_length, 1, v_length, v_length)
+    ON DUPLICATE KEY UPDATE
+        total_length = total_length + VALUES(total_length),
+        number_of_sections = number_of_sections + 1,
+        min_section_length = LEAST(min_section_length, VALUES(min_section_length)),
+        max_section_length = GREATEST(max_section_length, VALUES(max_section_length));
+
+    -- Replace the segment's "no details" placeholder row, if any
+    DELETE FROM mv_nh_complete_overview
+    WHERE segment_id = NEW.segment_id AND detail_id IS NULL;
+
+    INSERT INTO mv_nh_complete_overview
+        (nh_id, division_id, segment_id, segment_name, segment_start, segment_end,
+         detail_id, config_id, config_start, config_end, remarks)
+    SELECT ns.nh_id, ns.division_office_id, ns.segment_id, ns.segment_name,
+           ns.start_chainage, ns.end_chainage,
+           NEW.detail_id, NEW.config_id, NEW.start_chainage, NEW.end_chainage, NEW.remarks
+    FROM nh_segments ns
+    WHERE ns.segment_id = NEW.segment_id;
+
+    CALL sp_mv_segment_stats_delta(NEW.segment_id, 1, v_length);
+    CALL sp_mv_user_activity_delta(NEW.created_by, 0, 1, NEW.created_at);
+END //
+
+DROP TRIGGER IF EXISTS trg_mv_nh_road_details_update //
+CREATE TRIGGER trg_mv_nh_road_details_update
+AFTER UPDATE ON nh_road_details
+FOR EACH ROW
+BEGIN
+    DECLARE v_old_nh_id INT;
+    DECLARE v_new_nh_id INT;
+
+    SELECT nh_id INTO v_old_nh_id FROM nh_segments WHERE segment_id = OLD.segment_id;
+    SELECT nh_id INTO v_new_nh_id FROM nh_segments WHERE segment_id = NEW.segment_id;
+
+    CALL sp_mv_refresh_nh_config(v_old_nh_id, OLD.config_id);
+    IF v_new_nh_id <> v_old_nh_id OR NEW.config_id <> OLD.config_id THEN
+        CALL sp_mv_refresh_nh_config(v_new_nh_id, NEW.config_id);
+    END IF;
+
+    IF NEW.segment_id = OLD.segment_id THEN
+        UPDATE mv_nh_complete_overview
+        SET config_id = NEW.config_id,
+            config_start = NEW.start_chainage,
+            config_end = NEW.end_chainage,
+            remarks = NEW.remarks
+        WHERE detail_id = NEW.detail_id;
+        CALL sp_mv_segment_stats_delta(NEW.segment_id, 0,
+            (NEW.end_chainage - NEW.start_chainage) - (OLD.end_chainage - OLD.start_chainage));
+    ELSE
+        CALL sp_mv_refresh_overview_segment(OLD.segment_id);
+        CALL sp_mv_refresh_overview_segment(NEW.segment_id);
+        CALL sp_mv_segment_stats_delta(OLD.segment_id, -1, OLD.start_chainage - OLD.end_chainage);
+        CALL sp_mv_segment_stats_delta(NEW.segment_id, 1, NEW.end_chainage - NEW.start_chainage);
+    END IF;
+
+    IF NOT (NEW.created_by <=> OLD.created_by) THEN
+        CALL sp_mv_user_activity_delta(OLD.created_by, 0, -1, NULL);
+        CALL sp_mv_user_activity_delta(NEW.created_by, 0, 1, NEW.created_at);
+    END IF;
+END //
+
+DROP TRIGGER IF EXISTS trg_mv_nh_road_details_delete //
+CREATE TRIGGER trg_mv_nh_road_details_delete
+AFTER DELETE ON nh_road_details
+FOR EACH ROW
+BEGIN
+    DECLARE v_nh_id INT;
+
+    SELECT nh_id INTO v_nh_id FROM nh_segments WHERE segment_id = OLD.segment_id;
+
+    IF v_nh_id IS NOT NULL THEN
+        CALL sp_mv_refresh_nh_config(v_nh_id, OLD.config_id);
+    END IF;
+
+    DELETE FROM mv_nh_complete_overview WHERE detail_id = OLD.detail_id;
+
+    -- Last detail removed: restore the segment's placeholder row
+    IF v_nh_id IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM mv_nh_complete_overview WHERE segment_id = OLD.segment_id
+    ) THEN
+        CALL sp_mv_refresh_overview_segment(OLD.segment_id);
+    END IF;
+
+    IF v_nh_id IS NOT NULL THEN
+        CALL sp_mv_segment_stats_delta(OLD.segment_id, -1, OLD.start_chainage - OLD.end_chainage);
+    END IF;
+
+    CALL sp_mv_user_activity_delta(OLD.created_by, 0, -1, NULL);
+END //
+
+-- ============================================================================
+-- DELTA TRIGGERS FOR NH_SEGMENTS
+-- ============================================================================
+
+DROP TRIGGER IF EXISTS trg_mv_nh_segments_insert //
+CREATE TRIGGER trg_mv_nh_segments_insert
+AFTER INSERT ON nh_segments
+FOR EACH ROW
+BEGIN
+    INSERT INTO mv_division_nh_summary
+        (division_id, nh_id, segment_count, total_length, min_chainage, max_chainage)
+    VALUES (NEW.division_office_id, NEW.nh_id, 1,
+            NEW.end_chainage - NEW.start_chainage, NEW.start_chainage, NEW.end_chainage)
+    ON DUPLICATE KEY UPDATE
+        segment_count = segment_count + 1,
+        total_length = total_length + VALUES(total_length),
+        min_chainage = LEAST(min_chainage, VALUES(min_chainage)),
+        max_chainage = GREATEST(max_chainage, VALUES(max_chainage));
+
+    INSERT INTO mv_nh_complete_overview
+        (nh_id, division_id, segment_id, segment_name, segment_start, segment_end)
+    VALUES (NEW.nh_id, NEW.division_office_id, NEW.segment_id, NEW.segment_name,
+            NEW.start_chainage, NEW.end_chainage);
+
+    INSERT INTO mv_segment_stats
+        (segment_id, detail_count, configured_length, coverage_pct, last_modified_at)
+    VALUES (NEW.segment_id, 0, 0, 0, NOW());
+
+    CALL sp_mv_user_activity_delta(NEW.created_by, 1, 0, NEW.created_at);
+END //
+
+DROP TRIGGER IF EXISTS trg_mv_nh_segments_update //
+CREATE TRIGGER trg_mv_nh_segments_update
+AFTER UPDATE ON nh_segments
+FOR EACH ROW
+BEGIN
+    CALL sp_mv_refresh_division_nh(OLD.division_office_id, OLD.nh_id);
+    IF NEW.division_office_id <> OLD.division_office_id OR NEW.nh_id <> OLD.nh_id THEN
+        CALL sp_mv_refresh_division_nh(NEW.division_office_id, NEW.nh_id);
+    END IF;
+
+    IF NEW.nh_id <> OLD.nh_id THEN
+        CALL sp_mv_refresh_nh(OLD.nh_id);
+        CALL sp_mv_refresh_nh(NEW.nh_id);
+    END IF;
+
+    UPDATE mv_nh_complete_overview
+    SET nh_id = NEW.nh_id,
+        division_id = NEW.division_office_id,
+        segment_name = NEW.segment_name,
+        segment_start = NEW.start_chainage,
+        segment_end = NEW.end_chainage
+    WHERE segment_id = NEW.segment_id;
+
+    UPDATE mv_segment_stats
+    SET coverage_pct = ROUND(configured_length / (NEW.end_chainage - NEW.start_chainage) * 100, 2),
+        last_modified_at = NOW()
+    WHERE segment_id = NEW.segment_id;
+
+    IF NOT (NEW.created_by <=> OLD.created_by) THEN
+        CALL sp_mv_user_activity_delta(OLD.created_by, -1, 0, NULL);
+        CALL sp_mv_user_activity_delta(NEW.created_by, 1, 0, NEW.created_at);
+    END IF;
+END //
+
+DROP TRIGGER IF EXISTS trg_mv_nh_segments_delete //
+CREATE TRIGGER trg_mv_nh_segments_delete
+AFTER DELETE ON nh_segments
+FOR EACH ROW
+BEGIN
+    CALL sp_mv_refresh_division_nh(OLD.division_office_id, OLD.nh_id);
+    -- Details removed by ON DELETE CASCADE do not fire their own triggers
+    CALL sp_mv_refresh_nh(OLD.nh_id);
+    DELETE FROM mv_nh_complete_overview WHERE segment_id = OLD.segment_id;
+    DELETE FROM mv_segment_stats WHERE segment_id = OLD.segment_id;
+    CALL sp_mv_user_activity_delta(OLD.created_by, -1, 0, NULL);
+END //
+
+-- The segment's details are deleted by ON DELETE CASCADE without firing
+-- their triggers: take them off their creators' counters while they still exist
+DROP TRIGGER IF EXISTS trg_mv_nh_segments_before_delete //
+CREATE TRIGGER trg_mv_nh_segments_before_delete
+BEFORE DELETE ON nh_segments
+FOR EACH ROW
+BEGIN
+    UPDATE mv_user_activity ua
+    JOIN (
+        SELECT created_by, COUNT(*) AS details
+        FROM nh_road_details
+        WHERE segment_id = OLD.segment_id AND created_by IS NOT NULL
+        GROUP BY created_by
+    ) rd ON ua.user_id = rd.created_by
+    SET ua.details_created = ua.details_created - rd.details;
+END //
+
+DELIMITER ;
+
+-- ============================================================================
+-- INITIAL LOAD
+-- ============================================================================
+CALL sp_mv_rebuild_all();
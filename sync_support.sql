@@ -0,0 +1,50 @@
+-- Delta sync support for NH Management System (/api/sync)
+-- Run after database_schema.sql and triggers.sql:
+--   mysql -u root -p nh_management < sync_support.sql
+--
+-- Segment and road detail changes are already in audit_log. Reference rows
+-- (NHs, divisions, configurations) are synced by updated_at, and their
+-- deletes are recorded here so clients receive tombstones for them.
+
+-- ============================================================================
+-- UPDATED_AT ACCESS PATHS
+-- Incremental syncs read reference rows with updated_at >= <last sync>
+-- ============================================================================
+CREATE INDEX idx_nh_master_updated ON nh_master(updated_at);
+CREATE INDEX idx_divisions_updated ON divisions(updated_at);
+CREATE INDEX idx_configurations_updated ON road_configurations(updated_at);
+
+-- ============================================================================
+-- TOMBSTONES FOR REFERENCE ROWS
+-- ============================================================================
+
+DELIMITER //
+
+CREATE TRIGGER trg_audit_nh_master_delete
+BEFORE DELETE ON nh_master
+FOR EACH ROW
+BEGIN
+    INSERT INTO audit_log (table_name, record_id, action, old_values)
+    VALUES ('nh_master', OLD.nh_id, 'DELETE',
+            JSON_OBJECT('nh_number', OLD.nh_number, 'nh_name', OLD.nh_name));
+END //
+
+CREATE TRIGGER trg_audit_divisions_delete
+BEFORE DELETE ON divisions
+FOR EACH ROW
+BEGIN
+    INSERT INTO audit_log (table_name, record_id, action, old_values)
+    VALUES ('divisions', OLD.division_id, 'DELETE',
+            JSON_OBJECT('division_name', OLD.division_name, 'office_name', OLD.office_name));
+END //
+
+CREATE TRIGGER trg_audit_road_configurations_delete
+BEFORE DELETE ON road_configurations
+FOR EACH ROW
+BEGIN
+    INSERT INTO audit_log (table_name, record_id, action, old_values)
+    VALUES ('road_configurations', OLD.config_id, 'DELETE',
+            JSON_OBJECT('config_name', OLD.config_name, 'config_code', OLD.config_code));
+END //
+
+DELIMITER ;
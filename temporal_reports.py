@@ -0,0 +1,245 @@
+"""
+National Highways Management System - As-of Reports
+Answers the standard reports for any past point in time. Checkpoints (full
+columnar snapshots stamped with the database time they were taken) are
+written periodically; the state at time T is the latest checkpoint taken at
+or before T with the audit_log entries created up to T replayed on top.
+
+Checkpoints are scheduled by elapsed time and by the number of audit entries
+since the previous one, so a reconstruction never replays more than a
+bounded number of events. Only segments and road details are audited: NH,
+division and configuration names are those stored in the checkpoint.
+"""
+
+from typing import Optional, List, Dict
+from collections import OrderedDict
+from datetime import datetime
+import os
+import shutil
+import threading
+
+from nh_management import NHDatabase
+from columnar_store import (ColumnarStore, ColumnarSnapshot, ColumnarReportManager,
+                            AUDITED_TABLES, REPLAY_LOOKBACK,
+                            write_snapshot, read_snapshot_meta, read_snapshot)
+from audit_archive import AuditArchive
+
+
+class HistoricalReportManager(ColumnarReportManager):
+    """Report manager over one reconstructed, fixed snapshot"""
+
+    def __init__(self, db: NHDatabase, snapshot: ColumnarSnapshot,
+                 as_of: datetime, checkpoint: Dict):
+        super().__init__(db, store=None)
+        self.snapshot = snapshot
+        self.as_of = as_of
+        self.checkpoint = checkpoint
+
+    def _columns(self, stream: bool = False) -> Optional[ColumnarSnapshot]:
+        # Past states exist only as snapshots; exports iterate the result list
+        return self.snapshot
+
+    def get_summary_status(self, report: str) -> Dict:
+        return {'source': 'as_of', 'as_of': self.as_of.isoformat(),
+                'checkpoint_as_of': self.checkpoint['as_of'], 'log_id': self.snapshot.log_id}
+
+
+class CheckpointStore:
+    """Writes checkpoints of the columnar snapshot and reconstructs past states"""
+
+    def __init__(self, db: NHDatabase, store: ColumnarStore, directory: Optional[str] = None,
+                 interval: float = 900, max_events: int = 5000, max_age: float = 86400,
+                 keep: Optional[int] = None, cache_size: int = 8, pool: Optional[str] = None,
+                 audit_archive: Optional[AuditArchive] = None):
+        """
+        Args:
+            db: Database handle
+            store: Columnar store checkpoints are taken from
+            directory: Where checkpoints are stored (default: cache/checkpoints)
+            interval: Seconds between checks whether a checkpoint is due
+            max_events: Audit entries after the last checkpoint that make one due
+            max_age: Seconds after the last checkpoint that make one due
+                     (if anything changed)
+            keep: Number of checkpoints retained (None keeps all; as-of
+                  queries before the oldest retained one are not possible)
+            cache_size: Reconstructed states kept in memory
+            pool: Database sub-pool the checkpoint thread draws connections from
+            audit_archive: Replay from archived audit_log months as well as the
+                           table (needed for checkpoints older than the hot window)
+        """
+        self.db = db
+        self.store = store
+        self.directory = directory or os.path.join('cache', 'checkpoints')
+        self.interval = interval
+        self.max_events = max_events
+        self.max_age = max_age
+        self.keep = keep
+        self.cache_size = cache_size
+        self.pool = pool
+        self.audit_archive = audit_archive
+
+        self._cache = OrderedDict()  # (checkpoint name, as_of) -> snapshot
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_checkpoint_error = None
+
+    # ------------------------------------------------------------------
+    # Checkpoints
+    # ------------------------------------------------------------------
+
+    def list_checkpoints(self) -> List[Dict]:
+        """Checkpoints on disk, oldest first (meta plus 'name')"""
+        checkpoints = []
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return []
+        for entry in entries:
+            if not entry.is_dir() or not entry.name.startswith('cp-') or entry.name.endswith('.tmp'):
+                continue
+            try:
+                meta = read_snapshot_meta(entry.path)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable checkpoint {entry.name}: {e}")
+                continue
+            if meta is not None and 'as_of' in meta:
+                checkpoints.append(dict(meta, name=entry.name))
+        checkpoints.sort(key=lambda cp: (cp['as_of'], cp['log_id']))
+        return checkpoints
+
+    def create_checkpoint(self) -> Optional[Dict]:
+        """Write the current columnar snapshot as a checkpoint"""
+        snapshot = self.store.get()
+        if snapshot is None:
+            return None
+        # Taken after the snapshot: everything it contains happened before as_of,
+        # and anything it misses is replayed from audit_log
+        now = self.db.execute_query("SELECT NOW() AS now", raise_on_error=True)[0]['now']
+        as_of = now.isoformat()
+        name = f"cp-{now.strftime('%Y%m%dT%H%M%S')}-{snapshot.log_id}"
+        path = os.path.join(self.directory, name)
+        if os.path.exists(path):
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        write_snapshot(snapshot, path, extra_meta={'as_of': as_of})
+        self._prune()
+        return {'name': name, 'as_of': as_of, 'log_id': snapshot.log_id}
+
+    def _prune(self):
+        if not self.keep:
+            return
+        for checkpoint in self.list_checkpoints()[:-self.keep]:
+            shutil.rmtree(os.path.join(self.directory, checkpoint['name']), ignore_errors=True)
+
+    def checkpoint_due(self) -> bool:
+        """Whether enough time or enough changes have passed since the last checkpoint"""
+        checkpoints = self.list_checkpoints()
+        if not checkpoints:
+            return True
+        last = checkpoints[-1]
+        rows = self.db.execute_query("""
+            SELECT COUNT(*) AS events, NOW() AS now
+            FROM audit_log
+            WHERE log_id > %s AND table_name IN ('nh_segments', 'nh_road_details')
+        """, (last['log_id'],), raise_on_error=True)
+        events = rows[0]['events']
+        age = (rows[0]['now'] - datetime.fromisoformat(last['as_of'])).total_seconds()
+        return events >= self.max_events or (events > 0 and age >= self.max_age)
+
+    # ------------------------------------------------------------------
+    # Reconstruction
+    # ------------------------------------------------------------------
+
+    def snapshot_at(self, as_of: datetime):
+        """
+        Reconstruct the network as it was at a point in time
+
+        Args:
+            as_of: Point in time (database server time)
+
+        Returns:
+            (snapshot, checkpoint meta)
+
+        Raises:
+            ValueError: as_of is before the oldest checkpoint
+        """
+        base = None
+        for checkpoint in self.list_checkpoints():
+            if datetime.fromisoformat(checkpoint['as_of']) <= as_of:
+                base = checkpoint
+        if base is None:
+            raise ValueError("No history is available before the oldest checkpoint")
+
+        key = (base['name'], as_of)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key], base
+
+        checkpoint = read_snapshot(os.path.join(self.directory, base['name']))
+        if checkpoint is None:
+            raise ValueError(f"Checkpoint {base['name']} cannot be read")
+        after_log_id = checkpoint.log_id - REPLAY_LOOKBACK
+        if self.audit_archive is not None:
+            events = self.audit_archive.query(after_log_id=after_log_id, until=as_of,
+                                              table_names=AUDITED_TABLES)
+        else:
+            events = self.store.load_events(after_log_id, until=as_of)
+        events = [e for e in events if e['log_id'] not in checkpoint.recent_log_ids]
+        snapshot = self.store.apply_events(checkpoint, events) if events else checkpoint
+
+        # A state that is not yet in the past can still change
+        now = self.db.execute_query("SELECT NOW() AS now", raise_on_error=True)[0]['now']
+        if as_of >= now:
+            return snapshot, base
+        with self._lock:
+            self._cache[key] = snapshot
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return snapshot, base
+
+    def reports_at(self, as_of: datetime) -> HistoricalReportManager:
+        """Report manager answering from the state at as_of"""
+        snapshot, checkpoint = self.snapshot_at(as_of)
+        return HistoricalReportManager(self.db, snapshot, as_of, checkpoint)
+
+    # ------------------------------------------------------------------
+    # Scheduling
+    # ------------------------------------------------------------------
+
+    def status(self) -> Dict:
+        checkpoints = self.list_checkpoints()
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'checkpoints': len(checkpoints),
+            'oldest_as_of': checkpoints[0]['as_of'] if checkpoints else None,
+            'latest_as_of': checkpoints[-1]['as_of'] if checkpoints else None,
+            'last_checkpoint_error': self.last_checkpoint_error
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.db.use_pool(self.pool):
+                    if self.checkpoint_due():
+                        self.create_checkpoint()
+                self.last_checkpoint_error = None
+            except Exception as e:
+                self.last_checkpoint_error = str(e)
+                print(f"Error creating report checkpoint: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start the background checkpoint thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='report-checkpoints', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background checkpoint thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
@@ -0,0 +1,40 @@
+"""
+Shared fixtures for the unit tests
+
+The components under test take an NHDatabase; FakeDatabase stands in for it
+with scripted query results, so the tests need no MySQL server.
+"""
+
+import pytest
+
+
+class FakeDatabase:
+    """Records change listeners and answers queries from a handler"""
+
+    def __init__(self, handler=None):
+        """
+        Args:
+            handler: Callable (query, params) -> rows; None fails every query
+        """
+        self.handler = handler
+        self.listeners = []
+        self.queries = []
+
+    def add_change_listener(self, listener):
+        self.listeners.append(listener)
+
+    def notify_change(self, table_name, action, record_id=None, **values):
+        for listener in self.listeners:
+            listener(table_name, action, record_id, values)
+
+    def execute_query(self, query, params=None, fetch=True, raise_on_error=False):
+        self.queries.append((query, params))
+        if self.handler is None:
+            raise AssertionError(f"Unexpected query: {query}")
+        return self.handler(query, params or ())
+
+
+@pytest.fixture
+def fake_db():
+    """Factory for FakeDatabase instances"""
+    return FakeDatabase
@@ -0,0 +1,156 @@
+"""Unit tests for bitmap_index (run-length bitmaps, expressions, patching)"""
+
+import re
+
+import numpy as np
+import pytest
+
+from bitmap_index import BitmapIndex, RunBitmap, _ExpressionParser
+
+
+def _bits(text):
+    return np.array([c == '1' for c in text], dtype=bool)
+
+
+def _text(bits):
+    return ''.join('1' if b else '0' for b in bits)
+
+
+@pytest.mark.parametrize('text', ['', '0000', '1111', '1001', '0110110', '1010101'])
+def test_run_bitmap_round_trip(text):
+    bitmap = RunBitmap.from_bool(_bits(text))
+    assert _text(bitmap.to_bool(len(text))) == text
+    assert bitmap.count == text.count('1')
+
+
+def test_run_bitmap_runs_are_half_open():
+    assert RunBitmap.from_bool(_bits('0111001')).runs.tolist() == [[1, 4], [6, 7]]
+
+
+def test_run_bitmap_to_bool_clips_runs_to_n_bins():
+    bitmap = RunBitmap(np.array([[2, 10]], dtype=np.int32))
+    assert _text(bitmap.to_bool(5)) == '00111'
+
+
+CONFIG_BITS = {
+    'A': '11110000',
+    'B': '00111100',
+    'C': '00000011',
+}
+UNIVERSE = '11111110'  # last bin is a gap between segments
+
+
+def _evaluate(expression):
+    def resolve(token):
+        if token.upper() not in CONFIG_BITS:
+            raise ValueError(f"Unknown configuration '{token}'")
+        return _bits(CONFIG_BITS[token.upper()])
+    return _text(_ExpressionParser(expression, resolve, _bits(UNIVERSE)).parse())
+
+
+@pytest.mark.parametrize('expression, expected', [
+    ('A', '11110000'),
+    ('A AND B', '00110000'),
+    ('A OR C', '11110011'),
+    ('a and not b', '11000000'),
+    # AND binds tighter than OR
+    ('A OR B AND C', '11110000'),
+    ('(A OR B) AND NOT A', '00001100'),
+    ('NOT NOT B', '00111100'),
+])
+def test_expression_evaluation(expression, expected):
+    assert _evaluate(expression) == expected
+
+
+def test_not_is_taken_within_the_universe():
+    # The gap bin is never returned, even though no configuration covers it
+    assert _evaluate('NOT (A OR B)') == '00000010'
+
+
+@pytest.mark.parametrize('expression, message', [
+    ('', 'empty'),
+    ('A AND', 'end of expression'),
+    ('(A OR B', 'end of expression'),
+    ('A B', "Unexpected token 'B'"),
+    ('A OR ) B', "Unexpected token ')'"),
+    ('A & B', 'Unexpected character'),
+    ('D', 'Unknown configuration'),
+])
+def test_expression_errors(expression, message):
+    with pytest.raises(ValueError, match=re.escape(message)):
+        _evaluate(expression)
+
+
+class _Network:
+    """One NH (id 7, 'NH1') with segment 10 at 0-2 km and editable details"""
+
+    def __init__(self):
+        self.details = [{'detail_id': 1, 'segment_id': 10, 'config_id': 1,
+                         'start_chainage': 0, 'end_chainage': 1}]
+
+    def __call__(self, query, params):
+        if 'FROM nh_master' in query:
+            return [{'nh_id': 7}] if params == ('NH1',) else []
+        if 'MAX(log_id)' in query:
+            return [{'log_id': 100}]
+        if 'FROM nh_segments WHERE nh_id' in query:
+            return [{'segment_id': 10, 'start_chainage': 0, 'end_chainage': 2}]
+        if 'FROM nh_road_details' in query:
+            return list(self.details)
+        if 'COUNT(*) AS changes' in query:
+            return [{'changes': 0}]
+        if 'FROM road_configurations' in query:
+            return [{'config_id': 1, 'config_code': '4L', 'config_name': '4 Lane'}]
+        raise AssertionError(f"Unexpected query: {query}")
+
+
+@pytest.fixture
+def index(fake_db, tmp_path):
+    network = _Network()
+    db = fake_db(network)
+    return BitmapIndex(db, resolution_m=100, directory=str(tmp_path)), db, network
+
+
+def test_query_returns_intervals_in_km(index):
+    bitmap_index, _, _ = index
+    result = bitmap_index.query('NH1', '4L')
+    assert result['intervals'] == [[0.0, 1.0]]
+    assert result['total_length'] == 1.0
+    assert bitmap_index.query('NH1', 'NOT 4L')['intervals'] == [[1.0, 2.0]]
+    assert bitmap_index.query('NH2', '4L') is None
+
+
+def test_detail_change_is_patched_on_next_query_without_io_in_the_listener(index, tmp_path):
+    bitmap_index, db, network = index
+    bitmap_index.query('NH1', '4L')
+    saved_files = sorted(p.name for p in tmp_path.iterdir())
+
+    network.details.append({'detail_id': 2, 'segment_id': 10, 'config_id': 1,
+                            'start_chainage': 1.5, 'end_chainage': 2})
+    queries = len(db.queries)
+    db.notify_change('nh_road_details', 'INSERT', 2, segment_id=10)
+    assert len(db.queries) == queries
+    assert sorted(p.name for p in tmp_path.iterdir()) == saved_files
+
+    assert bitmap_index.query('NH1', '4L')['intervals'] == [[0.0, 1.0], [1.5, 2.0]]
+    assert bitmap_index.status()['unsaved'] == 1
+    bitmap_index.save_dirty()
+    assert bitmap_index.status()['unsaved'] == 0
+    # A patch keeps the mark of the last full build
+    assert bitmap_index.get('NH1').log_id == 100
+
+
+def test_segment_change_rebuilds_only_its_nh(index, tmp_path):
+    bitmap_index, db, _ = index
+    bitmap_index.query('NH1', '4L')
+    other = tmp_path / 'NH9.npz'
+    other.write_bytes(b'')
+
+    db.notify_change('nh_segments', 'INSERT', 11, nh_id=8)  # an NH never loaded here
+    assert bitmap_index.status()['pending'] == 0
+    db.notify_change('nh_segments', 'UPDATE', 10, status='active')
+    assert bitmap_index.status()['pending'] == 1
+
+    bitmap_index.query('NH1', '4L')
+    assert other.exists()
+    assert (tmp_path / 'NH1.npz').exists()
@@ -0,0 +1,49 @@
+"""Unit tests for change_feed (compact events and SSE formatting)"""
+
+import json
+from datetime import datetime
+
+from change_feed import compact_event, format_sse
+
+
+def _entry(action, old=None, new=None):
+    return {'log_id': 42, 'table_name': 'nh_segments', 'record_id': 7, 'action': action,
+            'old_values': old, 'new_values': new,
+            'created_at': datetime(2026, 3, 1, 10, 42, 7)}
+
+
+def test_insert_carries_all_fields():
+    event = compact_event(_entry('INSERT', new={'segment_name': 'S7', 'status': 'active'}))
+    assert event == {'id': 42, 'table': 'nh_segments', 'record_id': 7, 'action': 'INSERT',
+                     'changes': {'segment_name': 'S7', 'status': 'active'},
+                     'at': '2026-03-01T10:42:07'}
+
+
+def test_update_carries_only_changed_fields():
+    event = compact_event(_entry('UPDATE',
+                                 old='{"segment_name": "S7", "status": "active"}',
+                                 new=b'{"segment_name": "S7", "status": "closed"}'))
+    assert event['changes'] == {'status': 'closed'}
+
+
+def test_delete_carries_no_fields():
+    event = compact_event(_entry('DELETE', old={'segment_name': 'S7'}))
+    assert event['changes'] == {}
+
+
+def test_format_sse_event():
+    message = format_sse({'id': 42, 'action': 'INSERT'}, event_type='change')
+    assert message == 'id: 42\nevent: change\ndata: {"id":42,"action":"INSERT"}\n\n'
+
+
+def test_format_sse_comment_and_retry():
+    assert format_sse(comment='keep-alive') == ': keep-alive\n\n'
+    assert format_sse(comment='connected', retry_ms=3000) == ': connected\nretry: 3000\n\n'
+
+
+def test_format_sse_data_is_one_line():
+    event = {'changes': {'remarks': 'line one\nline two'}, 'at': datetime(2026, 3, 1)}
+    lines = format_sse(event).split('\n')
+    assert lines[1:] == ['', '']
+    assert json.loads(lines[0][len('data: '):]) == {
+        'changes': {'remarks': 'line one\nline two'}, 'at': '2026-03-01 00:00:00'}
@@ -0,0 +1,131 @@
+"""Unit tests for columnar_store (string dictionary and audit event replay)"""
+
+import json
+
+import numpy as np
+import pytest
+
+from columnar_store import (TABLES, ColumnarReportManager, ColumnarSnapshot, ColumnarStore,
+                            StringDictionary, _encode_rows)
+
+
+def test_string_dictionary_round_trip():
+    strings = StringDictionary()
+    codes = strings.encode(['4L', None, '2L', '4L'])
+    assert codes.tolist() == [0, -1, 1, 0]
+    assert strings.decode(codes) == ['4L', None, '2L', '4L']
+    copy = strings.copy()
+    copy.encode(['6L'])
+    assert strings.values == ['4L', '2L']
+
+
+def _segment(segment_id, start=0.0, end=10.0):
+    return {'segment_id': segment_id, 'nh_id': 1, 'division_office_id': 1,
+            'start_chainage': start, 'end_chainage': end,
+            'segment_name': f"S{segment_id}", 'status': 'active'}
+
+
+def _detail(segment_id, config_id, start, end):
+    return {'segment_id': segment_id, 'config_id': config_id,
+            'start_chainage': start, 'end_chainage': end, 'remarks': None}
+
+
+def _event(log_id, table, record_id, action, values=None):
+    return {'log_id': log_id, 'table_name': table, 'record_id': record_id,
+            'action': action, 'new_values': values}
+
+
+@pytest.fixture
+def store(fake_db, tmp_path):
+    return ColumnarStore(fake_db(), directory=str(tmp_path))
+
+
+@pytest.fixture
+def base():
+    """Segments 1 and 2, details 10 (segment 1) and 20 (segment 2)"""
+    strings = StringDictionary()
+    tables = {table: _encode_rows([], table, strings) for table in TABLES}
+    tables['nh'] = _encode_rows([{'nh_id': 1, 'nh_number': 'NH44', 'nh_name': 'NH 44'}],
+                                'nh', strings)
+    tables['configs'] = _encode_rows([{'config_id': 1, 'config_name': '4 Lane',
+                                       'config_code': '4L', 'display_order': 1}],
+                                     'configs', strings)
+    tables['segments'] = _encode_rows([_segment(1), _segment(2, 10.0, 20.0)], 'segments', strings)
+    tables['details'] = _encode_rows([dict(_detail(1, 1, 0.0, 2.0), detail_id=10),
+                                      dict(_detail(2, 1, 12.0, 15.5), detail_id=20)],
+                                     'details', strings)
+    return ColumnarSnapshot(tables, strings, 100, [], 'dims', 'built')
+
+
+def _ids(snapshot, table):
+    key = 'segment_id' if table == 'segments' else 'detail_id'
+    return sorted(snapshot.column(table, key).tolist())
+
+
+def test_apply_events_inserts_updates_and_deletes(store, base):
+    snapshot = store.apply_events(base, [
+        _event(101, 'nh_road_details', 30, 'INSERT', _detail(1, 1, 5.0, 6.0)),
+        _event(102, 'nh_road_details', 10, 'UPDATE', _detail(1, 1, 0.0, 3.0)),
+        _event(103, 'nh_road_details', 20, 'DELETE'),
+    ])
+    assert _ids(snapshot, 'details') == [10, 30]
+    position = snapshot.column('details', 'detail_id').tolist().index(10)
+    assert snapshot.column('details', 'end_m')[position] == 3000
+    assert snapshot.log_id == 103
+    assert {101, 102, 103} <= snapshot.recent_log_ids
+    # The base snapshot is not modified
+    assert _ids(base, 'details') == [10, 20]
+
+
+def test_last_image_per_record_wins(store, base):
+    snapshot = store.apply_events(base, [
+        _event(101, 'nh_road_details', 30, 'INSERT', _detail(1, 1, 5.0, 6.0)),
+        _event(102, 'nh_road_details', 30, 'DELETE'),
+        _event(103, 'nh_road_details', 10, 'DELETE'),
+        _event(104, 'nh_road_details', 10, 'INSERT', _detail(1, 1, 0.0, 1.0)),
+    ])
+    assert _ids(snapshot, 'details') == [10, 20]
+
+
+def test_segment_delete_cascades_to_existing_details(store, base):
+    snapshot = store.apply_events(base, [_event(101, 'nh_segments', 2, 'DELETE')])
+    assert _ids(snapshot, 'segments') == [1]
+    assert _ids(snapshot, 'details') == [10]
+
+
+def test_segment_delete_cascades_to_details_added_in_the_same_batch(store, base):
+    snapshot = store.apply_events(base, [
+        _event(101, 'nh_road_details', 30, 'INSERT', _detail(2, 1, 16.0, 18.0)),
+        _event(102, 'nh_segments', 2, 'DELETE'),
+    ])
+    assert _ids(snapshot, 'segments') == [1]
+    assert _ids(snapshot, 'details') == [10]
+    assert (snapshot.joins()['det_seg'] >= 0).all()
+
+
+def test_json_encoded_values_are_accepted(store, base):
+    snapshot = store.apply_events(base, [
+        _event(101, 'nh_segments', 3, 'INSERT', json.dumps(_segment(3, 20.0, 25.0)))])
+    assert _ids(snapshot, 'segments') == [1, 2, 3]
+    assert snapshot.decode('segments', 'segment_name')[-1] == 'S3'
+
+
+def test_joins_resolve_foreign_keys(base):
+    joins = base.joins()
+    assert joins['det_seg'].tolist() == [0, 1]
+    assert joins['det_nh'].tolist() == [0, 0]
+    assert joins['det_cfg'].tolist() == [0, 0]
+    assert np.array_equal(joins['seg_div'], np.array([-1, -1]))
+
+
+def test_config_statistics_skip_details_without_a_segment(fake_db, store, base, monkeypatch):
+    tables = dict(base.tables)
+    tables['details'] = _encode_rows([dict(_detail(1, 1, 0.0, 2.0), detail_id=10),
+                                      dict(_detail(9, 1, 0.0, 5.0), detail_id=90)],
+                                     'details', base.strings)
+    snapshot = ColumnarSnapshot(tables, base.strings, 100, [], 'dims', 'built')
+    monkeypatch.setattr(store, 'get', lambda: snapshot)
+
+    rows = ColumnarReportManager(fake_db(), store).get_config_statistics()
+    assert rows[0]['num_sections'] == 1
+    assert float(rows[0]['total_length']) == 2.0
@@ -0,0 +1,99 @@
+"""Unit tests for coverage_analytics (interval union and coverage rows)"""
+
+import numpy as np
+
+from coverage_analytics import CoverageAnalytics, CoverageDataset, union_runs
+
+
+def _runs(group, start, end):
+    result = union_runs(np.array(group, dtype=np.int64), np.array(start, dtype=np.int64),
+                        np.array(end, dtype=np.int64))
+    return [tuple(int(v) for v in run) for run in zip(*result)]
+
+
+def test_union_runs_empty():
+    assert _runs([], [], []) == []
+
+
+def test_union_runs_merges_overlapping_and_touching_intervals():
+    assert _runs([0, 0, 0, 0], [0, 50, 100, 300], [60, 100, 150, 400]) == [
+        (0, 0, 150), (0, 300, 400)]
+
+
+def test_union_runs_keeps_contained_intervals_in_one_run():
+    assert _runs([0, 0, 0], [0, 10, 20], [100, 30, 40]) == [(0, 0, 100)]
+
+
+def test_union_runs_never_merges_across_groups():
+    # Group 1 starts where group 0 ends; they must stay separate runs
+    assert _runs([1, 0, 1, 0], [100, 0, 150, 50], [200, 100, 250, 80]) == [
+        (0, 0, 100), (1, 100, 250)]
+
+
+def test_union_runs_is_independent_of_input_order():
+    group = [2, 0, 1, 0, 2]
+    start = [5, 30, 0, 0, 0]
+    end = [9, 40, 3, 10, 6]
+    expected = _runs(group, start, end)
+    order = [4, 2, 0, 3, 1]
+    assert _runs([group[i] for i in order], [start[i] for i in order],
+                 [end[i] for i in order]) == expected
+    assert expected == [(0, 0, 10), (0, 30, 40), (1, 0, 3), (2, 0, 9)]
+
+
+def _segment(segment_id, start, end):
+    return {'segment_id': segment_id, 'segment_name': f"S{segment_id}", 'nh_number': 'NH44',
+            'division_office_id': 1, 'division_name': 'North', 'office_name': 'North Office',
+            'status': 'active', 'start_chainage': start, 'end_chainage': end}
+
+
+def _detail(segment_id, config_id, start, end):
+    return {'segment_id': segment_id, 'config_id': config_id,
+            'start_chainage': start, 'end_chainage': end}
+
+
+CONFIGS = [{'config_id': 1, 'config_name': '4 Lane', 'config_code': '4L'},
+           {'config_id': 2, 'config_name': '2 Lane', 'config_code': '2L'}]
+
+
+def _compute(fake_db, segments, details):
+    analytics = CoverageAnalytics(fake_db())
+    return analytics._compute(CoverageDataset(segments, details, CONFIGS))
+
+
+def test_coverage_measures_union_gaps_and_overlap(fake_db):
+    rows = _compute(fake_db, [_segment(1, 10.0, 20.0)], [
+        _detail(1, 1, 10.0, 13.0),
+        _detail(1, 2, 12.0, 14.5),
+        _detail(1, 1, 17.0, 18.0)
+    ])
+    row = rows[0]
+    assert row['segment_length'] == 10.0
+    assert row['covered_length'] == 5.5
+    assert row['uncovered_length'] == 4.5
+    assert row['overlap_length'] == 1.0
+    assert row['coverage_percentage'] == 55.0
+    assert row['uncovered_intervals'] == [[14.5, 17.0], [18.0, 20.0]]
+    assert row['config_lengths'] == {'4 Lane': 4.0, '2 Lane': 2.5}
+
+
+def test_coverage_clips_details_to_their_segment(fake_db):
+    rows = _compute(fake_db, [_segment(1, 0.0, 5.0)], [_detail(1, 1, 4.0, 9.0)])
+    assert rows[0]['covered_length'] == 1.0
+    assert rows[0]['uncovered_intervals'] == [[0.0, 4.0]]
+
+
+def test_coverage_reports_whole_segment_gap_when_empty(fake_db):
+    rows = _compute(fake_db, [_segment(1, 0.0, 2.0), _segment(2, 2.0, 3.0)],
+                    [_detail(2, 2, 2.0, 3.0)])
+    assert rows[0]['covered_length'] == 0.0
+    assert rows[0]['uncovered_intervals'] == [[0.0, 2.0]]
+    assert rows[0]['config_lengths'] == {}
+    assert rows[1]['coverage_percentage'] == 100.0
+    assert rows[1]['uncovered_intervals'] == []
+
+
+def test_coverage_ignores_details_of_unknown_segments_and_configs(fake_db):
+    rows = _compute(fake_db, [_segment(1, 0.0, 1.0)],
+                    [_detail(9, 1, 0.0, 1.0), _detail(1, 99, 0.0, 1.0)])
+    assert rows[0]['covered_length'] == 0.0
@@ -0,0 +1,92 @@
+"""Unit tests for delta_sync (sync tokens and incremental responses)"""
+
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from delta_sync import SYNC_KINDS, SyncManager, decode_token, encode_token
+
+
+NOW = datetime(2026, 3, 1, 12, 0, 0)
+
+
+def test_token_round_trip():
+    token = encode_token(4182, datetime(2026, 3, 1, 10, 42, 7, 125000))
+    assert '=' not in token
+    assert decode_token(token) == {'log_id': 4182,
+                                   'updated_since': datetime(2026, 3, 1, 10, 42, 7, 125000)}
+
+
+def _raw_token(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+
+@pytest.mark.parametrize('token', [
+    'not a token',
+    '',
+    _raw_token({'v': 2, 'log_id': 1, 'updated_since': NOW.isoformat()}),
+    _raw_token({'v': 1, 'updated_since': NOW.isoformat()}),
+    _raw_token({'v': 1, 'log_id': 1, 'updated_since': 'yesterday'}),
+    _raw_token([1, 2]),
+])
+def test_invalid_tokens(token):
+    with pytest.raises(ValueError, match='Invalid sync token'):
+        decode_token(token)
+
+
+class _Database:
+    """audit_log with entries 10-12 and current rows for segment 1 and detail 5"""
+
+    def __init__(self, oldest_log_id=1):
+        self.oldest_log_id = oldest_log_id
+        self.entries = [
+            {'log_id': 10, 'table_name': 'nh_segments', 'record_id': 1,
+             'created_at': NOW - timedelta(minutes=5)},
+            {'log_id': 11, 'table_name': 'nh_road_details', 'record_id': 6,
+             'created_at': NOW - timedelta(minutes=1)},
+            # Within the settle window: sent now, and again next time
+            {'log_id': 12, 'table_name': 'nh_road_details', 'record_id': 5,
+             'created_at': NOW - timedelta(seconds=2)},
+        ]
+
+    def __call__(self, query, params):
+        if 'NOW() AS now' in query:
+            return [{'now': NOW, 'oldest_log_id': self.oldest_log_id}]
+        if 'FROM audit_log' in query and 'MAX(log_id)' in query:
+            return [{'log_id': 11}]
+        if 'FROM audit_log' in query:
+            return [e for e in self.entries if e['log_id'] > params[0]]
+        if 'updated_at >= %s' in query:
+            return []
+        if 'IN (' in query:
+            # Segment 1 and detail 5 still exist; detail 6 was deleted
+            for kind, existing in (('segments', {1}), ('details', {5})):
+                table, id_column = SYNC_KINDS[kind][:2]
+                if f"FROM {table}" in query:
+                    return [{id_column: i} for i in params if i in existing]
+            return []
+        return []
+
+
+def test_incremental_sync_returns_changes_and_tombstones(fake_db):
+    db = fake_db(_Database())
+    result = SyncManager(db, settle_seconds=5).sync(encode_token(9, NOW - timedelta(hours=1)))
+
+    assert result['full'] is False
+    assert result['segments'] == [{'segment_id': 1}]
+    assert result['details'] == [{'detail_id': 5}]
+    assert result['deleted']['details'] == [6]
+    assert result['deleted']['segments'] == []
+    # The token stops before the unsettled entry, so it is sent again
+    assert decode_token(result['token']) == {'log_id': 11,
+                                             'updated_since': NOW - timedelta(seconds=5)}
+
+
+def test_token_older_than_audit_log_falls_back_to_full_sync(fake_db):
+    db = fake_db(_Database(oldest_log_id=50))
+    result = SyncManager(db, settle_seconds=5).sync(encode_token(9, NOW - timedelta(hours=1)))
+    assert result['full'] is True
+    assert decode_token(result['token'])['log_id'] == 11
+    assert all(result['deleted'][kind] == [] for kind in SYNC_KINDS)
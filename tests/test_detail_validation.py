@@ -0,0 +1,121 @@
+"""Unit tests for detail_validation (interval sets and cached validation)"""
+
+import pytest
+
+from detail_validation import OVERLAP_MESSAGE, DetailValidator, SegmentIntervals
+
+
+@pytest.fixture
+def segment():
+    segment = SegmentIntervals(5, 0.0, 10.0, 'S5')
+    for start, end, detail_id in [(6.0, 8.0, 3), (1.0, 2.0, 1), (2.0, 4.0, 2)]:
+        segment.add(start, end, detail_id)
+    return segment
+
+
+def test_intervals_are_kept_sorted(segment):
+    assert [interval[2] for interval in segment.intervals] == [1, 2, 3]
+
+
+@pytest.mark.parametrize('start, end, overlapping', [
+    (0.0, 1.0, None),    # ends where detail 1 starts
+    (4.0, 6.0, None),    # fills the gap exactly
+    (8.0, 10.0, None),
+    (0.5, 1.5, 1),
+    (3.9, 4.5, 2),
+    (4.5, 9.0, 3),
+    (7.0, 7.5, 3),       # inside detail 3
+    (0.0, 10.0, 1),      # covers everything
+])
+def test_find_overlap(segment, start, end, overlapping):
+    found = segment.find_overlap(start, end)
+    assert (found[2] if found else None) == overlapping
+
+
+def test_find_overlap_ignores_the_detail_being_updated(segment):
+    assert segment.find_overlap(2.5, 3.5, exclude_detail_id=2) is None
+    assert segment.find_overlap(1.5, 3.5, exclude_detail_id=2)[2] == 1
+
+
+def test_remove(segment):
+    assert segment.remove(2)
+    assert not segment.remove(2)
+    assert segment.find_overlap(2.0, 4.0) is None
+
+
+def _segment_rows(query, params):
+    return [
+        {'segment_start': 0, 'segment_end': 10, 'segment_name': 'S5',
+         'detail_id': 1, 'start_chainage': 1, 'end_chainage': 2},
+        {'segment_start': 0, 'segment_end': 10, 'segment_name': 'S5',
+         'detail_id': None, 'start_chainage': None, 'end_chainage': None},
+    ] if params == (5,) else []
+
+
+@pytest.fixture
+def validator(fake_db):
+    db = fake_db(_segment_rows)
+    return DetailValidator(db), db
+
+
+def test_validate_returns_the_segment_it_used(validator):
+    detail_validator, _ = validator
+    error, segment = detail_validator.validate(5, 3.0, 4.0)
+    assert error is None
+    assert (segment.start, segment.end) == (0.0, 10.0)
+
+
+@pytest.mark.parametrize('start, end, error', [
+    (9.0, 11.0, 400),
+    (4.0, 3.0, 400),
+    (1.5, 3.0, 400),
+])
+def test_validate_rejects(validator, start, end, error):
+    detail_validator, _ = validator
+    (message, status), _ = detail_validator.validate(5, start, end)
+    assert status == error
+
+
+def test_validate_unknown_segment(validator):
+    detail_validator, _ = validator
+    assert detail_validator.validate(6, 1.0, 2.0) == (("Segment not found", 404), None)
+
+
+def test_cache_is_keyed_by_int_segment_id(validator):
+    detail_validator, db = validator
+    detail_validator.validate('5', 3.0, 4.0)
+    detail_validator.validate(5, 3.0, 4.0)
+    assert len(db.queries) == 1
+
+
+def test_change_notifications_patch_the_cached_segment(validator):
+    detail_validator, db = validator
+    detail_validator.validate(5, 3.0, 4.0)
+
+    db.notify_change('nh_road_details', 'INSERT', 7, segment_id='5',
+                     start_chainage=3.0, end_chainage=4.0)
+    (message, _), _ = detail_validator.validate(5, 3.5, 3.8)
+    assert message == OVERLAP_MESSAGE
+
+    db.notify_change('nh_road_details', 'DELETE', 7)
+    assert detail_validator.validate(5, 3.5, 3.8)[0] is None
+    assert len(db.queries) == 1
+
+    db.notify_change('nh_segments', 'UPDATE', 5)
+    detail_validator.validate(5, 3.5, 3.8)
+    assert len(db.queries) == 2
+
+
+def test_load_overlapping_a_write_is_not_cached(fake_db):
+    def rows(query, params):
+        # A detail is written while the segment is being loaded
+        if len(db.queries) == 1:
+            db.notify_change('nh_road_details', 'INSERT', 9, segment_id=5,
+                             start_chainage=4.0, end_chainage=5.0)
+        return _segment_rows(query, params)
+
+    db = fake_db(rows)
+    detail_validator = DetailValidator(db)
+    assert detail_validator.validate(5, 3.0, 4.0)[0] is None
+    detail_validator.validate(5, 3.0, 4.0)
+    assert len(db.queries) == 2
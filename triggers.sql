@@ -125,6 +125,8 @@ END //
 
 -- ============================================================================
 -- AUDIT TRIGGERS
+-- Skipped on connections that set @nh_app_audit: with AUDIT_MODE=batched the
+-- application writes these audit entries itself (audit_writer.py)
 -- ============================================================================
 
 -- Audit trigger for NH_SEGMENTS insert
@@ -132,21 +134,23 @@ CREATE TRIGGER trg_audit_nh_segments_insert
 AFTER INSERT ON nh_segments
 FOR EACH ROW
 BEGIN
-    INSERT INTO audit_log (user_id, table_name, record_id, action, new_values)
-    VALUES (
-        NEW.created_by,
-        'nh_segments',
-        NEW.segment_id,
-        'INSERT',
-        JSON_OBJECT(
-            'nh_id', NEW.nh_id,
-            'division_office_id', NEW.division_office_id,
-            'start_chainage', NEW.start_chainage,
-            'end_chainage', NEW.end_chainage,
-            'segment_name', NEW.segment_name,
-            'status', NEW.status
-        )
-    );
+    IF @nh_app_audit IS NULL THEN
+        INSERT INTO audit_log (user_id, table_name, record_id, action, new_values)
+        VALUES (
+            NEW.created_by,
+            'nh_segments',
+            NEW.segment_id,
+            'INSERT',
+            JSON_OBJECT(
+                'nh_id', NEW.nh_id,
+                'division_office_id', NEW.division_office_id,
+                'start_chainage', NEW.start_chainage,
+                'end_chainage', NEW.end_chainage,
+                'segment_name', NEW.segment_name,
+                'status', NEW.status
+            )
+        );
+    END IF;
 END //
 
 -- Audit trigger for NH_SEGMENTS update
@@ -154,29 +158,31 @@ CREATE TRIGGER trg_audit_nh_segments_update
 AFTER UPDATE ON nh_segments
 FOR EACH ROW
 BEGIN
-    INSERT INTO audit_log (user_id, table_name, record_id, action, old_values, new_values)
-    VALUES (
-        NEW.created_by,
-        'nh_segments',
-        NEW.segment_id,
-        'UPDATE',
-        JSON_OBJECT(
-            'nh_id', OLD.nh_id,
-            'division_office_id', OLD.division_office_id,
-            'start_chainage', OLD.start_chainage,
-            'end_chainage', OLD.end_chainage,
-            'segment_name', OLD.segment_name,
-            'status', OLD.status
-        ),
-        JSON_OBJECT(
-            'nh_id', NEW.nh_id,
-            'division_office_id', NEW.division_office_id,
-            'start_chainage', NEW.start_chainage,
-            'end_chainage', NEW.end_chainage,
-            'segment_name', NEW.segment_name,
-            'status', NEW.status
-        )
-    );
+    IF @nh_app_audit IS NULL THEN
+        INSERT INTO audit_log (user_id, table_name, record_id, action, old_values, new_values)
+        VALUES (
+            NEW.created_by,
+            'nh_segments',
+            NEW.segment_id,
+            'UPDATE',
+            JSON_OBJECT(
+                'nh_id', OLD.nh_id,
+                'division_office_id', OLD.division_office_id,
+                'start_chainage', OLD.start_chainage,
+                'end_chainage', OLD.end_chainage,
+                'segment_name', OLD.segment_name,
+                'status', OLD.status
+            ),
+            JSON_OBJECT(
+                'nh_id', NEW.nh_id,
+                'division_office_id', NEW.division_office_id,
+                'start_chainage', NEW.start_chainage,
+                'end_chainage', NEW.end_chainage,
+                'segment_name', NEW.segment_name,
+                'status', NEW.status
+            )
+        );
+    END IF;
 END //
 
 -- Audit trigger for NH_SEGMENTS delete
@@ -184,21 +190,23 @@ CREATE TRIGGER trg_audit_nh_segments_delete
 BEFORE DELETE ON nh_segments
 FOR EACH ROW
 BEGIN
-    INSERT INTO audit_log (user_id, table_name, record_id, action, old_values)
-    VALUES (
-        OLD.created_by,
-        'nh_segments',
-        OLD.segment_id,
-        'DELETE',
-        JSON_OBJECT(
-            'nh_id', OLD.nh_id,
-            'division_office_id', OLD.division_office_id,
-            'start_chainage', OLD.start_chainage,
-            'end_chainage', OLD.end_chainage,
-            'segment_name', OLD.segment_name,
-            'status', OLD.status
-        )
-    );
+    IF @nh_app_audit IS NULL THEN
+        INSERT INTO audit_log (user_id, table_name, record_id, action, old_values)
+        VALUES (
+            OLD.created_by,
+            'nh_segments',
+            OLD.segment_id,
+            'DELETE',
+            JSON_OBJECT(
+                'nh_id', OLD.nh_id,
+                'division_office_id', OLD.division_office_id,
+                'start_chainage', OLD.start_chainage,
+                'end_chainage', OLD.end_chainage,
+                'segment_name', OLD.segment_name,
+                'status', OLD.status
+            )
+        );
+    END IF;
 END //
 
 -- Audit trigger for NH_ROAD_DETAILS insert
@@ -206,20 +214,22 @@ CREATE TRIGGER trg_audit_nh_road_details_insert
 AFTER INSERT ON nh_road_details
 FOR EACH ROW
 BEGIN
-    INSERT INTO audit_log (user_id, table_name, record_id, action, new_values)
-    VALUES (
-        NEW.created_by,
-        'nh_road_details',
-        NEW.detail_id,
-        'INSERT',
-        JSON_OBJECT(
-            'segment_id', NEW.segment_id,
-            'config_id', NEW.config_id,
-            'start_chainage', NEW.start_chainage,
-            'end_chainage', NEW.end_chainage,
-            'remarks', NEW.remarks
-        )
-    );
+    IF @nh_app_audit IS NULL THEN
+        INSERT INTO audit_log (user_id, table_name, record_id, action, new_values)
+        VALUES (
+            NEW.created_by,
+            'nh_road_details',
+            NEW.detail_id,
+            'INSERT',
+            JSON_OBJECT(
+                'segment_id', NEW.segment_id,
+                'config_id', NEW.config_id,
+                'start_chainage', NEW.start_chainage,
+                'end_chainage', NEW.end_chainage,
+                'remarks', NEW.remarks
+            )
+        );
+    END IF;
 END //
 
 -- Audit trigger for NH_ROAD_DETAILS update
@@ -227,27 +237,29 @@ CREATE TRIGGER trg_audit_nh_road_details_update
 AFTER UPDATE ON nh_road_details
 FOR EACH ROW
 BEGIN
-    INSERT INTO audit_log (user_id, table_name, record_id, action, old_values, new_values)
-    VALUES (
-        NEW.created_by,
-        'nh_road_details',
-        NEW.detail_id,
-        'UPDATE',
-        JSON_OBJECT(
-            'segment_id', OLD.segment_id,
-            'config_id', OLD.config_id,
-            'start_chainage', OLD.start_chainage,
-            'end_chainage', OLD.end_chainage,
-            'remarks', OLD.remarks
-        ),
-        JSON_OBJECT(
-            'segment_id', NEW.segment_id,
-            'config_id', NEW.config_id,
-            'start_chainage', NEW.start_chainage,
-            'end_chainage', NEW.end_chainage,
-            'remarks', NEW.remarks
-        )
-    );
+    IF @nh_app_audit IS NULL THEN
+        INSERT INTO audit_log (user_id, table_name, record_id, action, old_values, new_values)
+        VALUES (
+            NEW.created_by,
+            'nh_road_details',
+            NEW.detail_id,
+            'UPDATE',
+            JSON_OBJECT(
+                'segment_id', OLD.segment_id,
+                'config_id', OLD.config_id,
+                'start_chainage', OLD.start_chainage,
+                'end_chainage', OLD.end_chainage,
+                'remarks', OLD.remarks
+            ),
+            JSON_OBJECT(
+                'segment_id', NEW.segment_id,
+                'config_id', NEW.config_id,
+                'start_chainage', NEW.start_chainage,
+                'end_chainage', NEW.end_chainage,
+                'remarks', NEW.remarks
+            )
+        );
+    END IF;
 END //
 
 -- Audit trigger for NH_ROAD_DETAILS delete
@@ -255,20 +267,22 @@ CREATE TRIGGER trg_audit_nh_road_details_delete
 BEFORE DELETE ON nh_road_details
 FOR EACH ROW
 BEGIN
-    INSERT INTO audit_log (user_id, table_name, record_id, action, old_values)
-    VALUES (
-        OLD.created_by,
-        'nh_road_details',
-        OLD.detail_id,
-        'DELETE',
-        JSON_OBJECT(
-            'segment_id', OLD.segment_id,
-            'config_id', OLD.config_id,
-            'start_chainage', OLD.start_chainage,
-            'end_chainage', OLD.end_chainage,
-            'remarks', OLD.remarks
-        )
-    );
+    IF @nh_app_audit IS NULL THEN
+        INSERT INTO audit_log (user_id, table_name, record_id, action, old_values)
+        VALUES (
+            OLD.created_by,
+            'nh_road_details',
+            OLD.detail_id,
+            'DELETE',
+            JSON_OBJECT(
+                'segment_id', OLD.segment_id,
+                'config_id', OLD.config_id,
+                'start_chainage', OLD.start_chainage,
+                'end_chainage', OLD.end_chainage,
+                'remarks', OLD.remarks
+            )
+        );
+    END IF;
 END //
 
 -- ============================================================================
@@ -197,15 +197,18 @@ SELECT
     u.role,
     d.division_name,
     d.office_name,
-    COUNT(DISTINCT ns.segment_id) AS segments_created,
-    COUNT(DISTINCT rd.detail_id) AS details_created,
+    -- Counted per user through the created_by indexes: joining both tables
+    -- at once would multiply each user's segments by their details
+    (SELECT COUNT(*) FROM nh_segments ns WHERE ns.created_by = u.user_id) AS segments_created,
+    (SELECT COUNT(*) FROM nh_road_details rd WHERE rd.created_by = u.user_id) AS details_created,
+    NULLIF(GREATEST(
+        COALESCE((SELECT MAX(ns.created_at) FROM nh_segments ns WHERE ns.created_by = u.user_id), '1970-01-01'),
+        COALESCE((SELECT MAX(rd.created_at) FROM nh_road_details rd WHERE rd.created_by = u.user_id), '1970-01-01')
+    ), '1970-01-01') AS last_activity_at,
     u.last_login,
     u.is_active
 FROM users u
 LEFT JOIN divisions d ON u.division_office_id = d.division_id
-LEFT JOIN nh_segments ns ON u.user_id = ns.created_by
-LEFT JOIN nh_road_details rd ON u.user_id = rd.created_by
-GROUP BY u.user_id, u.username, u.full_name, u.role, d.division_name, d.office_name, u.last_login, u.is_active
 ORDER BY u.role, d.division_name, d.office_name;
 
 -- ============================================================================
@@ -0,0 +1,196 @@
+"""
+National Highways Management System - Warm Restart Cache
+Saves the in-process caches (read model, per-NH chainage indexes, report
+snapshots) to a local snapshot file at intervals and on shutdown, and loads
+them back on startup so a restarted server does not begin cold
+(WARM_CACHE=True).
+
+Every saved state carries the change mark it reflects: the audit_log
+high-water log_id plus the row count and latest updated_at of the reference
+tables. On startup each component compares its mark with the database's
+current one and keeps the saved state only if it is still exact (or, for the
+read model, if the audit entries written since are still in audit_log to
+catch up from); otherwise it loads cold as before.
+
+The snapshot is a pickle (rows hold Decimal and datetime values): keep it in
+a directory only this application can write to.
+"""
+
+from typing import Optional, Dict
+from datetime import datetime
+import os
+import pickle
+import threading
+
+from nh_management import NHDatabase
+
+
+SNAPSHOT_VERSION = 1
+
+# Reference tables whose edits are not all in audit_log
+MARK_TABLES = ('nh_master', 'divisions', 'road_configurations')
+
+
+def change_mark(db: NHDatabase) -> Dict:
+    """
+    Current change mark of the database
+
+    Returns:
+        {'log_id': audit_log high-water mark, 'oldest_log_id': oldest entry
+        still in audit_log, 'references': {table: (row count, latest updated_at)}}
+    """
+    rows = db.execute_query("""
+        SELECT COALESCE(MAX(log_id), 0) AS log_id, MIN(log_id) AS oldest_log_id FROM audit_log
+    """, raise_on_error=True)
+    mark = {'log_id': int(rows[0]['log_id']), 'oldest_log_id': rows[0]['oldest_log_id']}
+    rows = db.execute_query(" UNION ALL ".join(
+        f"SELECT '{table}' AS table_name, COUNT(*) AS row_count, MAX(updated_at) AS updated_at "
+        f"FROM {table}" for table in MARK_TABLES), raise_on_error=True)
+    mark['references'] = {row['table_name']: (row['row_count'], row['updated_at']) for row in rows}
+    return mark
+
+
+def unchanged_since(mark: Optional[Dict], current: Dict) -> bool:
+    """Whether nothing has been written since a mark was taken"""
+    return (mark is not None and mark['log_id'] == current['log_id']
+            and mark['references'] == current['references'])
+
+
+class WarmCache:
+    """Periodic on-disk snapshot of registered cache components"""
+
+    def __init__(self, db: NHDatabase, path: str, interval: float = 300,
+                 pool: Optional[str] = None):
+        """
+        Args:
+            db: Database handle
+            path: Snapshot file
+            interval: Seconds between saves
+            pool: Database sub-pool used for the change mark
+
+        Components implement export_state() -> Optional[state] and
+        import_state(state, current_mark) -> bool (True if the saved state was
+        kept).
+        """
+        self.db = db
+        self.path = path
+        self.interval = interval
+        self.pool = pool
+
+        self._components = {}  # name -> component
+        self._saved = None  # name -> state, from the snapshot file
+        self._current = None  # Change mark when the snapshot file was read
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.restored = {}  # name -> True (warm) / False (cold)
+        self.saved_at = None
+        self.last_save_error = None
+
+    def _identity(self) -> str:
+        return f"{self.db.host}:{self.db.port}/{self.db.database}"
+
+    def _read(self) -> Dict:
+        """Component states from the snapshot file ({} if missing, foreign or outdated)"""
+        try:
+            with open(self.path, 'rb') as f:
+                snapshot = pickle.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Ignoring unreadable cache snapshot {self.path}: {e}")
+            return {}
+        if (not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION
+                or snapshot.get('database') != self._identity()):
+            return {}
+        return snapshot.get('components') or {}
+
+    def register(self, name: str, component) -> bool:
+        """
+        Add a component and restore its saved state
+
+        Call before the component starts its own loading.
+
+        Returns:
+            True if the saved state was restored, False if it loads cold
+        """
+        with self._lock:
+            self._components[name] = component
+        restored = False
+        try:
+            with self.db.use_pool(self.pool):
+                if self._saved is None:
+                    self._saved = self._read()
+                    self._current = change_mark(self.db)
+                state = self._saved.pop(name, None)
+                if state is not None:
+                    restored = bool(component.import_state(state, self._current))
+        except Exception as e:
+            print(f"Error restoring {name} from the cache snapshot: {e}")
+        self.restored[name] = restored
+        return restored
+
+    def save(self):
+        """Write the registered components' states to the snapshot file"""
+        with self._lock:
+            components = dict(self._components)
+        states = {}
+        for name, component in components.items():
+            state = component.export_state()
+            if state is not None:
+                states[name] = state
+
+        snapshot = {'version': SNAPSHOT_VERSION, 'database': self._identity(),
+                    'saved_at': datetime.now().isoformat(), 'components': states}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.saved_at = snapshot['saved_at']
+
+    # ------------------------------------------------------------------
+    # Background saving
+    # ------------------------------------------------------------------
+
+    def status(self) -> Dict:
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'path': self.path,
+            'restored': dict(self.restored),
+            'saved_at': self.saved_at,
+            'last_save_error': self.last_save_error
+        }
+
+    def _save_logged(self):
+        try:
+            self.save()
+            self.last_save_error = None
+        except Exception as e:
+            self.last_save_error = str(e)
+            print(f"Error saving cache snapshot: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._save_logged()
+
+    def start(self):
+        """Start saving the snapshot every interval seconds"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='warm-cache', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the save thread and write a final snapshot"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._save_logged()